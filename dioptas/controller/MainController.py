@@ -27,6 +27,7 @@ from qtpy import QtWidgets, QtCore
 
 from ..widgets.MainWidget import MainWidget
 from ..model.DioptasModel import DioptasModel
+from ..model.util.IntegrationMethodTuner import integration_method_tuner
 from ..widgets.UtilityWidgets import save_file_dialog, open_file_dialog
 
 from . import CalibrationController
@@ -230,6 +231,7 @@ class MainController(object):
         self.model.save(os.path.join(self.settings_directory, 'config.dio'))
 
     def load_default_settings(self):
+        integration_method_tuner.load(os.path.join(self.settings_directory, 'integration_methods.json'))
         config_path = os.path.join(self.settings_directory, 'config.dio')
         if os.path.isfile(config_path):
             self.show_window()
@@ -271,6 +273,8 @@ class MainController(object):
         if self.use_settings:
             self.save_default_settings()
             self.save_directories()
+        for configuration in self.model.configurations:  # autosaved patterns still written in the background
+            configuration.pattern_model.pattern_writer.flush()
         QtWidgets.QApplication.closeAllWindows()
         ev.accept()
 
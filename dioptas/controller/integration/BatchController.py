@@ -3,7 +3,6 @@ import os
 from functools import partial
 
 import numpy as np
-import h5py
 from PIL import Image
 from qtpy import QtWidgets, QtCore, QtGui
 from pyqtgraph import makeQImage
@@ -13,6 +12,8 @@ from ...widgets.UtilityWidgets import open_file_dialog, open_files_dialog, save_
 from ...widgets.integration import IntegrationWidget
 from ...model.DioptasModel import DioptasModel
 from ...model.util.HelperModule import get_partial_index, get_partial_value
+from ...model.util.ProcessedDataWriter import open_proc_data
+from ...model.util.FrameReductions import total_counts, max_pixel, SaturatedPixels, RoiSum, PeakIntegral
 
 
 class BatchController(object):
@@ -38,9 +39,14 @@ class BatchController(object):
 
         self.create_signals()
         self.create_mouse_behavior()
+        self.update_reductions_widget()
 
         self.min_val = {'lin': 0, 'sqrt': 0.1, 'log': 0.1, 'current': 0}
-        self.size_threshold = 500000
+
+        # polls the image files for new images in live mode
+        self.live_timer = QtCore.QTimer(self.widget)
+        self.live_timer.setInterval(1000)
+        self.live_timer.timeout.connect(self.update_live)
 
     def create_signals(self):
         """
@@ -49,6 +55,7 @@ class BatchController(object):
         self.widget.batch_widget.load_btn.clicked.connect(self.load_data)
         self.widget.batch_widget.save_btn.clicked.connect(self.save_data)
         self.widget.batch_widget.integrate_btn.clicked.connect(self.integrate)
+        self.widget.batch_widget.live_btn.clicked.connect(self.toggle_live)
         self.widget.batch_widget.waterfall_btn.clicked.connect(self.waterfall_mode)
         self.widget.batch_widget.phases_btn.clicked.connect(self.toggle_show_phases)
         self.widget.batch_widget.view_3d_btn.clicked.connect(self.change_view)
@@ -60,6 +67,17 @@ class BatchController(object):
         self.widget.batch_widget.background_btn.clicked.connect(self.subtract_background)
         self.widget.batch_widget.calc_bkg_btn.clicked.connect(self.extract_background)
         self.widget.batch_widget.autoscale_btn.clicked.connect(self.img_autoscale_btn_clicked)
+        self.widget.batch_widget.reduction_cb.currentIndexChanged.connect(self.plot_reduction)
+
+        # per-frame reductions
+        reductions_widget = self.widget.batch_widget.reductions_widget
+        self.widget.batch_widget.reductions_btn.clicked.connect(reductions_widget.raise_widget)
+        for cb in reductions_widget.checkboxes:
+            cb.toggled.connect(self.update_reductions)
+        for txt in reductions_widget.text_fields:
+            txt.editingFinished.connect(self.update_reductions)
+        for sb in reductions_widget.roi_sbs:
+            sb.valueChanged.connect(self.update_reductions)
 
         # set unit of x axis
         self.widget.batch_widget.tth_btn.clicked.connect(self.set_unit_tth)
@@ -109,7 +127,13 @@ class BatchController(object):
 
         self.widget.pattern_widget.mouse_left_clicked.connect(self.pattern_left_click)
 
-        # 3D
+        # 3D, the surface view is created on first use
+        self.widget.batch_widget.surf_view_created.connect(self.create_3d_mouse_behavior)
+
+    def create_3d_mouse_behavior(self):
+        """
+        Connects the mouse and key events of the 3D surface view
+        """
         self.widget.batch_widget.surf_pg_layout.wheelEvent = self.wheel_event_3d
         self.widget.batch_widget.surf_pg_layout.keyPressEvent = self.key_pressed_3d
 
@@ -542,7 +566,7 @@ class BatchController(object):
         if self.widget.batch_widget.view_f_btn.isChecked():
             self.widget.batch_widget.file_view_widget.show()
             self.widget.batch_widget.img_pg_layout.hide()
-            self.widget.batch_widget.surf_view.hide()
+            self.widget.batch_widget.hide_surf_view()
             self.widget.batch_widget.left_control_widget.hide()
             n_img_all = self.model.batch_model.n_img_all
             if n_img_all is not None:
@@ -579,7 +603,7 @@ class BatchController(object):
             self.widget.batch_widget.file_view_widget.hide()
             self.widget.batch_widget.img_pg_layout.show()
             self.widget.batch_widget.left_control_widget.hide()
-            self.widget.batch_widget.surf_view.hide()
+            self.widget.batch_widget.hide_surf_view()
             self.widget.batch_widget.view3d_f_btn.hide()
             self.widget.batch_widget.view3d_s_btn.hide()
             self.widget.batch_widget.view3d_t_btn.hide()
@@ -631,7 +655,7 @@ class BatchController(object):
         start_dir = self.model.working_directories.get('batch', os.path.expanduser("~"))
         filenames = open_files_dialog(self.widget, "Load image data file(s)",
                                       start_dir,
-                                      ('Raw data (*.nxs *.tif *.tiff);;'
+                                      ('Raw data (*.nxs *.h5 *.tif *.tiff);;'
                                        'Proc data (*.nxs)')
                                       )
         if len(filenames) == 0:
@@ -656,6 +680,7 @@ class BatchController(object):
 
         n_img_all = self.model.batch_model.n_img_all
         self.widget.batch_widget.step_series_widget.stop_txt.setValue(n_img_all)
+        self.update_reduction_channels()
         self.plot_image(0)
 
     def is_proc(self, filename):
@@ -663,12 +688,12 @@ class BatchController(object):
         Check if file contains processed data
         """
         if os.path.splitext(filename)[1] == '.nxs':
-            data_file = h5py.File(filename, "r")
-            if 'processed' in data_file:
-                return True
-            # ToDo Check for old format. To be removed
-            if 'data' in data_file:
-                return True
+            with open_proc_data(filename) as data_file:
+                if 'processed' in data_file:
+                    return True
+                # ToDo Check for old format. To be removed
+                if 'data' in data_file:
+                    return True
         return False
 
     def load_raw_data(self, filenames):
@@ -720,6 +745,34 @@ class BatchController(object):
         self.model.batch_model.load_proc_data(filename)
         self.widget.calibration_lbl.setText(
             self.model.calibration_model.calibration_name)
+        self.update_reduction_channels()
+
+    def update_reduction_channels(self):
+        """
+        Fill the reduction selection with the per-frame reductions of the current batch data
+        """
+        reduction_cb = self.widget.batch_widget.reduction_cb
+        current = reduction_cb.currentText()
+        reduction_cb.blockSignals(True)
+        reduction_cb.clear()
+        reduction_cb.addItem('No reduction')
+        reduction_cb.addItems(list(self.model.batch_model.reduction_data))
+        reduction_cb.setCurrentIndex(max(reduction_cb.findText(current), 0))
+        reduction_cb.blockSignals(False)
+        self.plot_reduction()
+
+    def plot_reduction(self):
+        """
+        Plot the selected per-frame reduction against the frame index
+        """
+        values = self.model.batch_model.reduction_data.get(self.widget.batch_widget.reduction_cb.currentText())
+        if values is None:
+            self.widget.batch_widget.reduction_plot.hide()
+            return
+        self.widget.batch_widget.reduction_curve.setData(np.arange(len(values)), values)
+        self.widget.batch_widget.reduction_frame_line.setValue(
+            self.widget.batch_widget.step_series_widget.slider.value())
+        self.widget.batch_widget.reduction_plot.show()
 
     def plot_batch(self, start=None, stop=None):
         """
@@ -746,12 +799,9 @@ class BatchController(object):
 
         if self.widget.batch_widget.view_3d_btn.isChecked():
             step = int(str(self.widget.batch_widget.step_series_widget.step_txt.text()))
-            step_min = max(1, int(data[start:stop + 1].size / self.size_threshold))
-            if step < step_min:
-                step = step_min
-                self.widget.batch_widget.step_series_widget.step_txt.setValue(step)
-            self.widget.batch_widget.surf_view.plot_surf(data[start:stop + 1:step], start, step)
-            self.update_3d_axis(data[start:stop + 1:step])
+            surf_view = self.widget.batch_widget.surf_view
+            surf_view.plot_surf(data[start:stop + 1:step], start, step)
+            self.update_3d_axis(surf_view.data)
 
     def save_data(self):
         """
@@ -882,14 +932,26 @@ class BatchController(object):
         :param y: Number of raw image in the batch
         """
         y = int(y)
-        self.model.current_configuration.auto_integrate_pattern = False
-        self.model.batch_model.load_image(y, self.widget.batch_widget.view_f_btn.isChecked())
-        f_name, pos = self.model.batch_model.get_image_info(y, self.widget.batch_widget.view_f_btn.isChecked())
+        use_all = self.widget.batch_widget.view_f_btn.isChecked()
+        configuration = self.model.current_configuration
+        # the cake of integrated images is read from the cake stack instead of integrating the image again
+        cake = None if use_all or not configuration.auto_integrate_cake else self.model.batch_model.get_cake(y)
+
+        configuration.auto_integrate_pattern = False
+        if cake is not None:
+            configuration.auto_integrate_cake = False
+        self.model.batch_model.load_image(y, use_all)
+        f_name, pos = self.model.batch_model.get_image_info(y, use_all)
         self.widget.batch_widget.setWindowTitle(f"Batch widget. {f_name} - {pos}")
-        self.model.current_configuration.auto_integrate_pattern = True
+        configuration.auto_integrate_pattern = True
+        if cake is not None:
+            configuration.auto_integrate_cake = True
+            self.model.calibration_model.set_cake(*cake)
+            configuration.cake_changed.emit()
 
         self.widget.batch_widget.step_series_widget.pos_txt.setText(str(y))
         self.widget.batch_widget.step_series_widget.slider.setValue(y)
+        self.widget.batch_widget.reduction_frame_line.setValue(y)
         self.widget.batch_widget.mouse_pos_widget.clicked_pos_widget.x_pos_lbl.setText(f'Img: {y:.0f}')
 
     def update_axes_range(self):
@@ -991,10 +1053,8 @@ class BatchController(object):
         self.widget.batch_widget.img_view.horizontal_line.setValue(y-start)
 
         start = int(str(self.widget.batch_widget.step_series_widget.start_txt.text()))
-        stop = int(str(self.widget.batch_widget.step_series_widget.stop_txt.text()))
 
         data_img_item = self.widget.batch_widget.img_view.data_img_item
-        img_data = self.model.batch_model.data[start:stop + 1]
 
         height = data_img_item.viewRect().height()
         bottom = data_img_item.viewRect().top()
@@ -1002,7 +1062,7 @@ class BatchController(object):
 
         if bound == 0:
             return
-        v_scale = img_data.shape[0] / bound
+        v_scale = data_img_item.height() / bound
         min_azi = v_scale * bottom + start
         max_azi = v_scale * (bottom + height) + start
 
@@ -1028,6 +1088,15 @@ class BatchController(object):
         stop = int(str(self.widget.batch_widget.step_series_widget.stop_txt.text()))
         start = int(str(self.widget.batch_widget.step_series_widget.start_txt.text()))
 
+        cake_filename = None
+        if self.widget.batch_widget.cake_btn.isChecked():
+            cake_filename = save_file_dialog(self.widget, "Save cake stack.",
+                                             directory=self.model.working_directories.get('batch',
+                                                                                          os.path.expanduser("~")),
+                                             filter='Cake stack (*.h5)')
+            if cake_filename == '':
+                return
+
         self.model.img_model.blockSignals(True)
         n_int = (stop-start)/step
         progress_dialog = self.widget.get_progress_dialog("Integrating multiple images.", "Abort Integration",
@@ -1036,9 +1105,14 @@ class BatchController(object):
         progress_dialog.setWindowFlags(QtCore.Qt.WindowStaysOnTopHint | QtCore.Qt.Window)
         self.model.batch_model.integrate_raw_data(num_points, start, stop + 1, step,
                                                   self.widget.batch_widget.view_f_btn.isChecked(),
-                                                  progress_dialog=progress_dialog)
+                                                  progress_dialog=progress_dialog,
+                                                  remove_cosmics=self.widget.batch_widget.cosmic_btn.isChecked(),
+                                                  num_sectors=self.widget.batch_widget.sectors_sb.value(),
+                                                  cake_filename=cake_filename,
+                                                  azimuth_points=self.model.current_configuration.cake_azimuth_points)
         progress_dialog.close()
         self.show_metadata_info()
+        self.update_reduction_channels()
 
         self.model.img_model.blockSignals(False)
         self.model.enabled_phases_in_cake.emit()
@@ -1051,6 +1125,97 @@ class BatchController(object):
         self.change_view()
         self.widget.batch_widget.img_view.auto_range()
 
+    def toggle_live(self):
+        """
+        Start/stop following the image files while they are written by the detector
+        """
+        batch_model = self.model.batch_model
+        live_btn = self.widget.batch_widget.live_btn
+        if not live_btn.isChecked():
+            self.live_timer.stop()
+            batch_model.close_live_output()
+            return
+
+        if not self.model.calibration_model.is_calibrated:
+            self.widget.show_error_msg("Can not integrate multiple images without calibration.")
+            live_btn.setChecked(False)
+            return
+        if not batch_model.raw_available:
+            self.widget.show_error_msg("No images loaded for integration")
+            live_btn.setChecked(False)
+            return
+
+        filename = save_file_dialog(self.widget, "Save live integration.",
+                                    directory=self.model.working_directories.get('batch', os.path.expanduser("~")),
+                                    filter='Single file Data (*.nxs)')
+        if filename == '':
+            live_btn.setChecked(False)
+            return
+
+        self.model.img_model.blockSignals(True)
+        batch_model.set_image_files(list(batch_model.files), live=True)
+        batch_model.open_live_output(filename)
+        self.model.img_model.blockSignals(False)
+        self.widget.batch_widget.background_btn.setChecked(False)
+        self.live_timer.start()
+        self.update_live()
+
+    def update_live(self):
+        """
+        Integrate the images written since the last update. If the heatmap shows the last integrated images, the new
+        patterns are appended to it, otherwise the heatmap is plotted again.
+        """
+        batch_model = self.model.batch_model
+        n_old = 0 if batch_model.data is None else batch_model.n_img
+        batch_model.update_image_files()
+
+        if not self.widget.automatic_binning_cb.isChecked():
+            num_points = int(str(self.widget.bin_count_txt.text()))
+        else:
+            num_points = None
+        self.model.img_model.blockSignals(True)
+        n_new = batch_model.integrate_new_frames(num_points,
+                                                 remove_cosmics=self.widget.batch_widget.cosmic_btn.isChecked())
+        self.model.img_model.blockSignals(False)
+        if n_new == 0:
+            return
+
+        n_img = batch_model.n_img
+        n_img_all = batch_model.n_img_all
+        step_series_widget = self.widget.batch_widget.step_series_widget
+        step_series_widget.pos_label.setText(f"Frame({n_img}/{n_img_all}):")
+        images = [(batch_model.file_map[i + 1] - batch_model.file_map[i]) for i in range(len(batch_model.files))]
+        self.widget.batch_widget.file_view_widget.set_raw_files(batch_model.files, images)
+        self.update_reduction_channels()
+
+        img_view = self.widget.batch_widget.img_view
+        start = int(str(step_series_widget.start_txt.text()))
+        append = self.widget.batch_widget.view_2d_btn.isChecked() and 0 <= start < n_old and \
+            img_view.n_rows == n_old - start and img_view.img_data.shape[1] == batch_model.data.shape[1] and \
+            not self.widget.batch_widget.background_btn.isChecked()
+
+        # the shown range is extended to the new images
+        step_series_widget.start_txt.blockSignals(True)
+        step_series_widget.stop_txt.blockSignals(True)
+        step_series_widget.start_txt.setRange(0, n_img - 1)
+        step_series_widget.stop_txt.setRange(0, n_img - 1)
+        step_series_widget.stop_txt.setValue(n_img - 1)
+        step_series_widget.start_txt.blockSignals(False)
+        step_series_widget.stop_txt.blockSignals(False)
+
+        if append:
+            rows = batch_model.data[n_old:]
+            if self.min_val.get('current', None) is not None:
+                rows = np.maximum(rows, self.min_val['current'])
+            img_view.append_rows(self.scale(rows))
+            step_series_widget.slider.setRange(start, n_img - 1)
+            step_series_widget.pos_validator.setRange(start, n_img - 1)
+            self.update_y_axis()
+        else:
+            if n_old == 0:
+                self.widget.batch_widget.view_2d_btn.setChecked(True)
+            self.change_view()
+
     def set_navigation_range(self, all_range, nav_range):
         """
         Set start and stop positions as well as range of navigation widget
@@ -1085,3 +1250,65 @@ class BatchController(object):
         elif self.model.current_configuration.integration_unit == 'q_A^-1':
             self.widget.batch_widget.q_btn.setChecked(True)
             self.set_unit_q()
+        self.update_reductions_widget()
+
+    def update_reductions(self):
+        """
+        Sets the per-frame reductions of the batch model from the reductions widget, they are calculated during the
+        next integration. Reductions with invalid parameters are not used.
+        """
+        widget = self.widget.batch_widget.reductions_widget
+        reductions = {}
+        if widget.total_counts_cb.isChecked():
+            reductions['total_counts'] = total_counts
+        if widget.max_pixel_cb.isChecked():
+            reductions['max_pixel'] = max_pixel
+        if widget.saturated_pixels_cb.isChecked():
+            try:
+                reductions['saturated_pixels'] = SaturatedPixels(widget.saturation_threshold_txt.value())
+            except ValueError:
+                pass
+        if widget.roi_sum_cb.isChecked():
+            reductions['roi_sum'] = RoiSum(*(sb.value() for sb in widget.roi_sbs))
+        if widget.peak_integral_cb.isChecked():
+            try:
+                reductions['peak_integral'] = PeakIntegral(widget.peak_tth_min_txt.value(),
+                                                           widget.peak_tth_max_txt.value())
+            except ValueError:
+                pass
+
+        batch_model = self.model.batch_model
+        for name in ('total_counts', 'max_pixel', 'saturated_pixels', 'roi_sum', 'peak_integral'):
+            if name in reductions:
+                batch_model.add_reduction(name, reductions[name])
+            elif name in batch_model.reductions:
+                batch_model.remove_reduction(name)
+
+    def update_reductions_widget(self):
+        """
+        Shows the per-frame reductions of the current batch model in the reductions widget
+        """
+        widget = self.widget.batch_widget.reductions_widget
+        reductions = self.model.batch_model.reductions
+        for child in widget.checkboxes + widget.text_fields + widget.roi_sbs:
+            child.blockSignals(True)
+
+        widget.total_counts_cb.setChecked('total_counts' in reductions)
+        widget.max_pixel_cb.setChecked('max_pixel' in reductions)
+        saturated_pixels = reductions.get('saturated_pixels')
+        widget.saturated_pixels_cb.setChecked(saturated_pixels is not None)
+        if saturated_pixels is not None:
+            widget.saturation_threshold_txt.setText(str(saturated_pixels.threshold))
+        roi_sum = reductions.get('roi_sum')
+        widget.roi_sum_cb.setChecked(roi_sum is not None)
+        if roi_sum is not None:
+            for sb, value in zip(widget.roi_sbs, (roi_sum.row_min, roi_sum.row_max, roi_sum.col_min, roi_sum.col_max)):
+                sb.setValue(value)
+        peak_integral = reductions.get('peak_integral')
+        widget.peak_integral_cb.setChecked(peak_integral is not None)
+        if peak_integral is not None:
+            widget.peak_tth_min_txt.setText(str(peak_integral.tth_min))
+            widget.peak_tth_max_txt.setText(str(peak_integral.tth_max))
+
+        for child in widget.checkboxes + widget.text_fields + widget.roi_sbs:
+            child.blockSignals(False)
@@ -30,6 +30,7 @@ from ...widgets.UtilityWidgets import open_file_dialog, open_files_dialog, save_
 from ...widgets.integration import IntegrationWidget
 from ...model.DioptasModel import DioptasModel
 from ...model.util.Pattern import Pattern
+from ...model.util.PatternWriter import PatternStackWriter
 from ...model.util.HelperModule import get_partial_index, get_partial_value
 
 from .EpicsController import EpicsController
@@ -271,6 +272,14 @@ class ImageController(object):
                                                           len(filenames))
         self._set_up_batch_processing()
 
+        stack_writer = None
+        if self.widget.pattern_stack_cb.isChecked():
+            stack_filename = os.path.splitext(os.path.basename(str(filenames[0])))[0] + '_stack.nxs'
+            mask = self.model.mask_model.get_mask() if self.model.use_mask else None
+            stack_writer = PatternStackWriter(os.path.join(working_directory, stack_filename),
+                                              unit=self.get_integration_unit(),
+                                              cal_file=self.model.calibration_model.filename, mask=mask)
+
         for ind in range(len(filenames)):
             filename = str(filenames[ind])
             base_filename = os.path.basename(filename)
@@ -284,13 +293,20 @@ class ImageController(object):
 
             x, y = self.integrate_pattern()
             self._save_pattern(base_filename, working_directory, x, y)
+            if stack_writer is not None:
+                self._add_pattern_to_stack(stack_writer, filename)
 
             QtWidgets.QApplication.processEvents()
             if progress_dialog.wasCanceled():
                 break
 
+        if stack_writer is not None:
+            stack_writer.close()
+        failed_files = self.model.pattern_model.pattern_writer.flush()
         progress_dialog.close()
         self._tear_down_batch_processing()
+        if failed_files:
+            self.widget.show_error_msg("Could not write the following pattern files:\n" + "\n".join(failed_files))
 
     def _get_pattern_working_directory(self):
         if self.widget.pattern_autocreate_cb.isChecked():
@@ -349,9 +365,10 @@ class ImageController(object):
             filename = os.path.join(working_directory, os.path.splitext(base_filename)[0] + file_ending)
             self.model.pattern_model.set_pattern(x, y, filename, unit=self.get_integration_unit())
             if file_ending == '.xy':
-                self.model.pattern_model.save_pattern(filename, header=self._create_pattern_header())
+                self.model.pattern_model.save_pattern(filename, header=self._create_pattern_header(),
+                                                      asynchronous=True)
             else:
-                self.model.pattern_model.save_pattern(filename)
+                self.model.pattern_model.save_pattern(filename, asynchronous=True)
 
             # save the background subtracted filename
             if self.model.pattern.has_background():
@@ -361,9 +378,18 @@ class ImageController(object):
                 filename = os.path.join(directory, self.model.pattern.name + file_ending)
                 if file_ending == '.xy':
                     self.model.pattern_model.save_pattern(filename, header=self._create_pattern_header(),
-                                                          subtract_background=True)
+                                                          subtract_background=True, asynchronous=True)
                 else:
-                    self.model.pattern_model.save_pattern(filename, subtract_background=True)
+                    self.model.pattern_model.save_pattern(filename, subtract_background=True, asynchronous=True)
+
+    def _add_pattern_to_stack(self, stack_writer, filename):
+        pattern = self.model.pattern
+        x, y = pattern.original_data
+        background = None
+        if pattern.has_background():
+            # the background subtracted pattern might be cropped to the background range
+            background = y - np.interp(x, *pattern.data, left=np.nan, right=np.nan)
+        stack_writer.add(x, y, filename, background)
 
     def _create_pattern_header(self):
         header = self.model.calibration_model.create_file_header()
@@ -28,6 +28,7 @@ from .PatternController import PatternController
 from dioptas.controller.integration.phase.PhaseController import PhaseController
 from .OptionsController import OptionsController
 from .BatchController import BatchController
+from .PeakMonitorController import PeakMonitorController
 
 # imports for type hinting in PyCharm -- DO NOT DELETE
 from ...widgets.integration import IntegrationWidget
@@ -70,3 +71,4 @@ class IntegrationController(object):
         self.correction_controller = CorrectionController(self.widget, self.model)
         self.options_controller = OptionsController(self.widget, self.model)
         self.batch_controller = BatchController(self.widget, self.model)
+        self.peak_monitor_controller = PeakMonitorController(self.widget, self.model)
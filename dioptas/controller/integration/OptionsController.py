@@ -49,6 +49,8 @@ class OptionsController(object):
 
     def connect_signals(self):
         self.options_widget.correct_solid_angle_cb.stateChanged.connect(self.correct_solid_angle_cb_clicked)
+        self.options_widget.corrections_in_integrator_cb.stateChanged.connect(self.corrections_in_integrator_cb_clicked)
+        self.options_widget.integration_method_cb.currentIndexChanged.connect(self.integration_method_changed)
         self.model.configuration_selected.connect(self.update_gui)
         self.model.pattern_changed.connect(self.update_gui)
 
@@ -64,9 +66,25 @@ class OptionsController(object):
     def correct_solid_angle_cb_clicked(self):
         self.model.current_configuration.correct_solid_angle = self.options_widget.correct_solid_angle_cb.isChecked()
 
+    def corrections_in_integrator_cb_clicked(self):
+        apply_corrections = self.options_widget.corrections_in_integrator_cb.isChecked()
+        if apply_corrections != self.model.current_configuration.apply_corrections_in_integrator:
+            self.model.current_configuration.apply_corrections_in_integrator = apply_corrections
+
+    def integration_method_changed(self):
+        method = str(self.options_widget.integration_method_cb.currentText())
+        method = None if method == 'auto' else method
+        if method != self.model.current_configuration.integration_method:
+            self.model.current_configuration.integration_method = method
+
     def update_gui(self):
         self.options_widget.blockSignals(True)
         self.options_widget.correct_solid_angle_cb.setChecked(int(self.model.current_configuration.correct_solid_angle))
+        self.options_widget.corrections_in_integrator_cb.setChecked(
+            self.model.current_configuration.apply_corrections_in_integrator)
+        integration_method = self.model.current_configuration.integration_method
+        self.options_widget.integration_method_cb.setCurrentText('auto' if integration_method is None
+                                                                 else integration_method)
         self.options_widget.bin_count_txt.setText("{:1.0f}".format(self.model.calibration_model.num_points))
 
         self.options_widget.cake_azimuth_points_sb.setValue(self.model.current_configuration.cake_azimuth_points)
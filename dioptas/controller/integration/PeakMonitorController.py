@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from ...widgets.UtilityWidgets import save_file_dialog
+
+# imports for type hinting in PyCharm -- DO NOT DELETE
+from ...widgets.integration import IntegrationWidget
+from ...model.DioptasModel import DioptasModel
+
+
+class PeakMonitorController(object):
+    """
+    PeakMonitorController handles the peak monitor window, which follows the summed intensity of 2theta/azimuth windows
+    over the loaded images.
+    """
+
+    def __init__(self, widget, dioptas_model):
+        """
+        :param widget: Reference to an IntegrationWidget
+        :param dioptas_model: reference to DioptasModel object
+
+        :type widget: IntegrationWidget
+        :type dioptas_model: DioptasModel
+        """
+        self.widget = widget
+        self.peak_monitor_widget = widget.peak_monitor_widget
+        self.model = dioptas_model
+        self.peak_monitor_model = None
+
+        self.connect_signals()
+        self.update_peak_monitor_model()
+
+    def connect_signals(self):
+        self.widget.integration_control_widget.img_control_widget.peak_monitor_btn.clicked.connect(
+            self.peak_monitor_widget.raise_widget)
+        self.peak_monitor_widget.add_btn.clicked.connect(self.add_window)
+        self.peak_monitor_widget.delete_btn.clicked.connect(self.delete_window)
+        self.peak_monitor_widget.start_btn.toggled.connect(self.start_btn_toggled)
+        self.peak_monitor_widget.clear_btn.clicked.connect(self.clear)
+        self.peak_monitor_widget.suspend_integration_cb.toggled.connect(self.suspend_integration_cb_toggled)
+        self.model.configuration_selected.connect(self.update_peak_monitor_model)
+
+    def update_peak_monitor_model(self):
+        """
+        Connects the widget to the peak monitor of the currently selected configuration.
+        """
+        if self.peak_monitor_model is self.model.peak_monitor_model:
+            return
+        if self.peak_monitor_model is not None:
+            self.peak_monitor_model.windows_changed.disconnect(self.update_windows)
+            self.peak_monitor_model.values_changed.disconnect(self.update_plot)
+        self.peak_monitor_model = self.model.peak_monitor_model
+        self.peak_monitor_model.windows_changed.connect(self.update_windows)
+        self.peak_monitor_model.values_changed.connect(self.update_plot)
+
+        self.peak_monitor_widget.start_btn.blockSignals(True)
+        self.peak_monitor_widget.start_btn.setChecked(self.peak_monitor_model.running)
+        self.peak_monitor_widget.start_btn.blockSignals(False)
+        self.peak_monitor_widget.suspend_integration_cb.blockSignals(True)
+        self.peak_monitor_widget.suspend_integration_cb.setChecked(self.peak_monitor_model.suspend_integration)
+        self.peak_monitor_widget.suspend_integration_cb.blockSignals(False)
+        self.update_windows()
+
+    def add_window(self):
+        widget = self.peak_monitor_widget
+        try:
+            tth_min, tth_max = widget.tth_min_txt.value(), widget.tth_max_txt.value()
+        except ValueError:
+            return
+        try:
+            azi_min, azi_max = widget.azi_min_txt.value(), widget.azi_max_txt.value()
+        except ValueError:
+            azi_min, azi_max = None, None
+        name = str(widget.name_txt.text()) or 'window {}'.format(len(self.peak_monitor_model.windows) + 1)
+        self.peak_monitor_model.add_window(name, tth_min, tth_max, azi_min, azi_max)
+
+    def delete_window(self):
+        row = self.peak_monitor_widget.windows_tw.currentRow()
+        if 0 <= row < len(self.peak_monitor_model.windows):
+            self.peak_monitor_model.remove_window(row)
+
+    def start_btn_toggled(self, checked):
+        if not checked:
+            self.peak_monitor_model.stop()
+            self.peak_monitor_widget.file_lbl.setText('')
+            return
+
+        filename = None
+        if self.peak_monitor_widget.stream_cb.isChecked():
+            filename = save_file_dialog(self.widget, "Stream peak monitor to file.",
+                                        os.path.join(self.model.working_directories.get('pattern', ''),
+                                                     'peak_monitor.txt'),
+                                        'Text file (*.txt)')
+            if filename == '':
+                self.peak_monitor_widget.start_btn.setChecked(False)
+                return
+        self.peak_monitor_model.start(filename)
+        self.peak_monitor_widget.file_lbl.setText(os.path.basename(filename) if filename else '')
+
+    def suspend_integration_cb_toggled(self, checked):
+        self.peak_monitor_model.suspend_integration = checked
+
+    def clear(self):
+        self.peak_monitor_model.clear()
+
+    def update_windows(self):
+        self.peak_monitor_widget.set_windows(self.peak_monitor_model.windows)
+        self.update_plot()
+
+    def update_plot(self):
+        self.peak_monitor_widget.plot_values(self.peak_monitor_model.values)
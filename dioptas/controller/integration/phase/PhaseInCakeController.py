@@ -18,7 +18,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from ....model.util.HelperModule import get_partial_index
+import numpy as np
 
 # imports for type hinting in PyCharm -- DO NOT DELETE
 from ....model.DioptasModel import DioptasModel
@@ -74,23 +74,13 @@ class PhaseInCakeController(object):
             cake_tth = self.model.calibration_model.tth
         else:
             cake_tth = self.model.cake_tth
-        reflections_tth = self.phase_model.get_phase_line_positions(ind, 'tth',
-                                                                    self.model.calibration_model.wavelength * 1e10)
-        reflections_intensities = [reflex[1] for reflex in self.phase_model.reflections[ind]]
-
-        cake_line_positions = []
-        cake_line_intensities = []
-
-        for ind, tth in enumerate(reflections_tth):
-            pos_ind = get_partial_index(cake_tth, tth)
-            if pos_ind is not None:
-                cake_line_positions.append(pos_ind + 0.5)
-                cake_line_intensities.append(reflections_intensities[ind])
-            elif clip is False:
-                cake_line_positions.append(0)
-                cake_line_intensities.append(reflections_intensities[ind])
-
-        return cake_line_positions, cake_line_intensities
+        line_indices, line_intensities = self.phase_model.get_phase_line_indices(
+            ind, cake_tth, self.model.calibration_model.wavelength * 1e10)
+        inside = ~np.isnan(line_indices)
+
+        if clip:
+            return list(line_indices[inside] + 0.5), list(line_intensities[inside])
+        return list(np.where(inside, line_indices + 0.5, 0)), list(line_intensities)
 
     def add_phase_plot(self):
         cake_line_positions, cake_line_intensities = self.get_phase_position_and_intensities(-1, False)
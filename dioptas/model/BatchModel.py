@@ -7,6 +7,12 @@ from qtpy import QtCore
 from PIL import Image
 
 from .util import extract_background
+from .util.cosmics import find_cosmics
+from .util.CakeStack import CakeStackWriter, CAKE_STACK_GROUP, read_cake
+from .util.FrameReductions import default_reductions
+from .util.IntegrationMethodTuner import get_method_name
+from .util.LambdaLoader import LambdaImage
+from .util.ProcessedDataWriter import ProcessedDataWriter, open_proc_data
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +35,18 @@ class BatchModel(QtCore.QObject):
         self.n_img = None
         self.n_img_all = None
         self.raw_available = False
+        self.sector_data = None
+        self.sector_azimuth = None
+        self.cake_file = None
+        self.reduction_data = {}
+
+        # live mode: image sources of the growing files, row buffer of the appended patterns and the output file
+        self._live_sources = {}
+        self._data_buffer = None
+        self.live_writer = None
+
+        # scalar reductions (name -> callable, see util.FrameReductions) evaluated for every frame during integration
+        self.reductions = dict(default_reductions)
 
         self.calibration_model = calibration_model
         self.mask_model = mask_model
@@ -50,8 +68,15 @@ class BatchModel(QtCore.QObject):
         self.used_mask_shape = None
         self.used_calibration = None
         self.raw_available = False
-
-    def set_image_files(self, files):
+        self.sector_data = None
+        self.sector_azimuth = None
+        self.cake_file = None
+        self.reduction_data = {}
+        self.close_live_output()
+        self._close_live_sources()
+        self._data_buffer = None
+
+    def set_image_files(self, files, live=False):
         """
         Set internal variables with respect of given list of files.
 
@@ -59,9 +84,29 @@ class BatchModel(QtCore.QObject):
         and total number of images are stored in internal variables.
 
         :param files: List of file names including path
+        :param live: The files are still being written by the detector. Lambda files are opened in SWMR mode and kept
+                     open, new images are counted by update_image_files.
         """
         if files is None:
             return
+        self._close_live_sources()
+        if live:
+            self.files = np.array(files)
+            img_model = self.calibration_model.img_model
+            loaded_file, loaded_pos = img_model.filename, img_model.series_pos - 1
+            if loaded_file in self.files:
+                # releases the file, it can not be opened in SWMR mode while it is open in normal mode
+                img_model.series_get_image = None
+            n_images = [self._count_live_images(file_index) for file_index in range(len(files))]
+            self.raw_available = True
+            self._set_image_counts(n_images)
+
+            source = self._live_sources.get(loaded_file)
+            if isinstance(source, LambdaImage) and source.series_max > 0:
+                img_model.load_series(loaded_file, source.get_image, source.series_max,
+                                      min(loaded_pos, source.series_max - 1))
+            return
+
         pos_map = []
         file_map = [0]
         image_counter = 0
@@ -84,6 +129,62 @@ class BatchModel(QtCore.QObject):
         self.pos_map_all = np.array(pos_map)
         self.file_map = np.array(file_map)
 
+    def update_image_files(self):
+        """
+        Counts the images of files set in live mode again (see set_image_files). Only the shape of the datasets of the
+        opened Lambda files is refreshed, the images of all other files are counted only once.
+
+        :return: Number of new images
+        """
+        if not self.raw_available or not self._live_sources:
+            return 0
+        n_img_all = self.n_img_all
+        self._set_image_counts([self._count_live_images(file_index) for file_index in range(len(self.files))])
+        return self.n_img_all - n_img_all
+
+    def _set_image_counts(self, n_images):
+        pos_map = []
+        file_map = [0]
+        for file_index, n_img in enumerate(n_images):
+            pos_map += list(zip([file_index] * n_img, range(n_img)))
+            file_map.append(file_map[-1] + n_img)
+        self.n_img_all = file_map[-1]
+        self.pos_map_all = np.array(pos_map)
+        self.file_map = np.array(file_map)
+
+    def _count_live_images(self, file_index):
+        file = self.files[file_index]
+        source = self._live_sources.get(file)
+        if source is None:
+            if file[-4:] == '.tif':
+                source = 1
+            else:
+                try:
+                    source = LambdaImage(file, swmr=True)
+                except (IOError, KeyError):
+                    self.calibration_model.img_model.load(file)
+                    source = self.calibration_model.img_model.series_max
+            self._live_sources[file] = source
+        if isinstance(source, LambdaImage):
+            return source.refresh()
+        return source
+
+    def _close_live_sources(self):
+        for source in self._live_sources.values():
+            if isinstance(source, LambdaImage):
+                source.close()
+        self._live_sources = {}
+
+    def _load_file(self, file_index):
+        """
+        Loads the first image of a file into the image model, files opened in live mode are read from their source.
+        """
+        source = self._live_sources.get(self.files[file_index])
+        if isinstance(source, LambdaImage):
+            self.calibration_model.img_model.load_series(self.files[file_index], source.get_image, source.series_max)
+        else:
+            self.calibration_model.img_model.load(self.files[file_index])
+
     def try_load_old_format(self, data_file):
         self.data = data_file['data'][()]
         self.binning = data_file['binning'][()]
@@ -116,7 +217,7 @@ class BatchModel(QtCore.QObject):
         Load diffraction patterns and metadata from h5 file
 
         """
-        with h5py.File(filename, "r") as data_file:
+        with open_proc_data(filename) as data_file:
             # ToDo To be removed
             if 'processed/result' not in data_file:
                 self.try_load_old_format(data_file)
@@ -155,6 +256,21 @@ class BatchModel(QtCore.QObject):
             if 'bkg' in data_file['processed/process/']:
                 self.bkg = data_file['processed/process/bkg'][()]
 
+            if 'sectors' in data_file['processed']:
+                self.sector_data = data_file['processed/sectors/data'][()]
+                self.sector_azimuth = data_file['processed/sectors/azimuth'][()]
+
+            if 'reductions' in data_file['processed']:
+                self.reduction_data = {name: dataset[()]
+                                       for name, dataset in data_file['processed/reductions'].items()
+                                       if name != 'frame'}
+
+            try:
+                if CAKE_STACK_GROUP in data_file['processed']:
+                    self.cake_file = data_file['processed'][CAKE_STACK_GROUP].file.filename
+            except KeyError:
+                logger.info("Cake stack file is not found")
+
     def save_proc_data(self, filename):
         """
         Save diffraction patterns to h5 file
@@ -183,13 +299,28 @@ class BatchModel(QtCore.QObject):
                 nxprocess["mask_file"] = str(self.used_mask)
                 nxprocess['mask_shape'] = self.used_mask_shape
 
-            nxprocess['int_method'] = 'csr'
+            nxprocess['int_method'] = get_method_name(self.calibration_model.last_integration_method or 'csr')
             nxprocess['int_unit'] = '2th_deg'
             nxprocess['num_points'] = self.binning.shape[0]
 
             if self.bkg is not None:
                 nxprocess.create_dataset("bkg", data=self.bkg)
 
+            if self.sector_data is not None:
+                nxprocess['num_sectors'] = self.sector_data.shape[1]
+
+                nxsectors = nxentry.create_group('sectors')
+                nxsectors.attrs["NX_class"] = 'NXdata'
+                nxsectors.attrs["signal"] = 'data'
+                nxsectors.attrs["axes"] = ['.', 'azimuth', 'binning']
+                nxsectors.create_dataset("data", data=self.sector_data)
+                azimuth = nxsectors.create_dataset("azimuth", data=self.sector_azimuth)
+                azimuth.attrs["unit"] = 'deg'
+                azimuth.attrs['long_name'] = 'azimuth (degrees)'
+                tth = nxsectors.create_dataset("binning", data=self.binning)
+                tth.attrs["unit"] = 'deg'
+                tth.attrs['long_name'] = 'two_theta (degrees)'
+
             nxdata.create_dataset("data", data=self.data)
             tth = nxdata.create_dataset("binning", data=self.binning)
             tth.attrs["unit"] = 'deg'
@@ -199,6 +330,33 @@ class BatchModel(QtCore.QObject):
             nxprocess.create_dataset("file_map", data=self.file_map)
             nxprocess.create_dataset("files", data=self.files.astype('S'))
 
+            if self.reduction_data:
+                names = list(self.reduction_data)
+                nxreductions = nxentry.create_group('reductions')
+                nxreductions.attrs["NX_class"] = 'NXdata'
+                nxreductions.attrs["signal"] = names[0]
+                if len(names) > 1:
+                    nxreductions.attrs["auxiliary_signals"] = names[1:]
+                nxreductions.attrs["axes"] = 'frame'
+                for name in names:
+                    nxreductions.create_dataset(name, data=self.reduction_data[name])
+                nxreductions.create_dataset("frame", data=np.arange(self.n_img))
+
+            if self.cake_file is not None:
+                nxentry[CAKE_STACK_GROUP] = h5py.ExternalLink(os.path.abspath(self.cake_file), CAKE_STACK_GROUP)
+
+    def add_reduction(self, name, reduction):
+        """
+        Adds a scalar reduction, which is evaluated for every frame during the next integration.
+
+        :param name: Name of the reduction, used as dataset name in the processed file
+        :param reduction: Callable taking the raw image, binning and intensity of the frame (see util.FrameReductions)
+        """
+        self.reductions[name] = reduction
+
+    def remove_reduction(self, name):
+        del self.reductions[name]
+
     def save_as_csv(self, filename):
         """
         Save diffraction patterns to 3-columns csv file
@@ -209,7 +367,8 @@ class BatchModel(QtCore.QObject):
         y = np.arange(self.n_img)[None, :].repeat(self.binning.shape[0], axis=0).flatten()
         np.savetxt(filename, np.array(list(zip(x, y, self.data.T.flatten()))), delimiter=',', fmt='%f')
 
-    def integrate_raw_data(self, num_points, start, stop, step, use_all=False, progress_dialog=None):
+    def integrate_raw_data(self, num_points, start, stop, step, use_all=False, progress_dialog=None,
+                           remove_cosmics=False, num_sectors=0, cake_filename=None, azimuth_points=360):
         """
         Integrate images from given file
 
@@ -219,42 +378,84 @@ class BatchModel(QtCore.QObject):
         :param stop: Stop image index fro integration
         :param step: Step along images to integrate
         :param use_all: Use all images. If False use only images, that were already integrated.
+        :param remove_cosmics: Detect cosmic rays in every image and add them to the mask before integration
+        :param num_sectors: If larger than 0, every image is additionally integrated into this number of azimuthal
+                            sectors (stored in sector_data), the pattern is then calculated from the sectors
+        :param cake_filename: If given, the cake of every image is written into a compressed (n_img, azimuth_points,
+                              num_points) stack in this hdf5 file (see get_cake). The pattern and the sectors are
+                              then derived from the cake.
+        :param azimuth_points: Number of azimuthal bins of the cakes. If sectors are used, it is rounded up to a
+                               multiple of num_sectors, so that the sectors can be derived from the cake.
         """
         intensity_data = []
+        reduction_data = {name: [] for name in self.reductions}
+        sector_data = []
+        sector_azimuth = None
         binning_data = []
         pos_map = []
         image_counter = 0
         current_file = ''
-        if self.mask_model.mode:
-            if self.mask_model.filename != '':
-                self.used_mask = self.mask_model.filename
-            mask = self.mask_model.get_mask()
-            self.used_mask_shape = mask.shape
-        else:
-            mask = None
-
-        for index in range(start, stop, step):
-            if use_all:
-                file_index, pos = self.pos_map_all[index]
-            else:
-                file_index, pos = self.pos_map[index]
-            if file_index != current_file:
-                current_file = file_index
-                self.calibration_model.img_model.load(self.files[file_index])
+        mask = self._get_integration_mask()
 
-            if progress_dialog is not None and progress_dialog.wasCanceled():
-                break
+        cake_writer = None
+        if cake_filename is not None:
+            cake_writer = CakeStackWriter(cake_filename, len(range(start, stop, step)))
+            if num_sectors > 0:
+                azimuth_points = int(np.ceil(azimuth_points / num_sectors)) * num_sectors
 
-            self.calibration_model.img_model.load_series_img(pos)
-            binning, intensity = self.calibration_model.integrate_1d(num_points=num_points,
-                                                                     mask=mask)
-            image_counter += 1
-            if progress_dialog is not None:
-                progress_dialog.setValue(image_counter)
+        try:
+            for index in range(start, stop, step):
+                if use_all:
+                    file_index, pos = self.pos_map_all[index]
+                else:
+                    file_index, pos = self.pos_map[index]
+                if file_index != current_file:
+                    current_file = file_index
+                    self._load_file(file_index)
+
+                if progress_dialog is not None and progress_dialog.wasCanceled():
+                    break
 
-            pos_map.append((file_index, pos))
-            intensity_data.append(intensity)
-            binning_data.append(binning)
+                self.calibration_model.img_model.load_series_img(pos)
+                img_mask = mask
+                if remove_cosmics:
+                    cosmics = find_cosmics(self.calibration_model.img_model.img_data)
+                    img_mask = cosmics if mask is None else np.logical_or(mask, cosmics)
+                if num_sectors > 0 and cake_writer is not None:
+                    # the sectors are combined from the cake bins, integrating the same image with a different
+                    # number of azimuthal bins would rebuild the integration engine of pyFAI for every frame
+                    cake_writer.add(image_counter, self.calibration_model.integrate_2d(
+                        mask=img_mask, rad_points=num_points, azimuth_points=azimuth_points))
+                    _, sector_azimuth, sectors = self.calibration_model.derive_sectors_from_cake(num_sectors)
+                    binning, intensity = self.calibration_model.derive_pattern_from_sectors()
+                    sector_data.append(sectors)
+                elif num_sectors > 0:
+                    _, sector_azimuth, sectors = self.calibration_model.integrate_sectors(num_sectors,
+                                                                                          num_points=num_points,
+                                                                                          mask=img_mask)
+                    binning, intensity = self.calibration_model.derive_pattern_from_sectors()
+                    sector_data.append(sectors)
+                elif cake_writer is not None:
+                    binning, intensity, cake = self.calibration_model.integrate_1d_and_2d(
+                        mask=img_mask, num_points=num_points, azimuth_points=azimuth_points)
+                    cake_writer.add(image_counter, cake)
+                else:
+                    binning, intensity = self.calibration_model.integrate_1d(num_points=num_points,
+                                                                             mask=img_mask)
+                raw_img_data = self.calibration_model.img_model.raw_img_data
+                for name, reduction in self.reductions.items():
+                    reduction_data[name].append(reduction(raw_img_data, binning, intensity))
+
+                image_counter += 1
+                if progress_dialog is not None:
+                    progress_dialog.setValue(image_counter)
+
+                pos_map.append((file_index, pos))
+                intensity_data.append(intensity)
+                binning_data.append(binning)
+        finally:
+            if cake_writer is not None:
+                cake_writer.close(self.calibration_model.cake_tth, self.calibration_model.cake_azi)
 
         # deal with different x lengths due to trimmed zeros:
         binning_lengths = [len(binning) for binning in binning_data]
@@ -266,6 +467,12 @@ class BatchModel(QtCore.QObject):
             intensity_data[ind] = np.append(intensity_data[ind],
                                             np.zeros((binning_max_length - binning_lengths[ind], 1)))
 
+        self.cake_file = cake_filename
+
+        for ind in range(len(sector_data)):
+            sector_data[ind] = np.pad(sector_data[ind],
+                                      ((0, 0), (0, binning_max_length - sector_data[ind].shape[1])))
+
         # finish and save everything
 
         if self.calibration_model.filename != '':
@@ -274,6 +481,147 @@ class BatchModel(QtCore.QObject):
         self.binning = np.array(binning)
         self.data = np.array(intensity_data)
         self.n_img = self.data.shape[0]
+        self.reduction_data = {name: np.array(values) for name, values in reduction_data.items()}
+        if num_sectors > 0:
+            self.sector_data = np.array(sector_data)
+            self.sector_azimuth = np.array(sector_azimuth)
+        else:
+            self.sector_data = None
+            self.sector_azimuth = None
+
+    def _get_integration_mask(self):
+        if not self.mask_model.mode:
+            return None
+        if self.mask_model.filename != '':
+            self.used_mask = self.mask_model.filename
+        mask = self.mask_model.get_mask()
+        self.used_mask_shape = mask.shape
+        return mask
+
+    def integrate_new_frames(self, num_points=None, progress_dialog=None, remove_cosmics=False):
+        """
+        Integrates all images of the files, which have not been integrated yet, and appends their patterns to the
+        already integrated ones (live mode, see update_image_files). The patterns are collected in a row buffer, which
+        grows in steps, so that existing patterns are not copied for every new frame. If a live output file is open,
+        the new patterns are appended to it.
+
+        Sectors, cakes and the background are not calculated in live mode, they are dropped when frames are appended.
+
+        :param num_points: Numbers of radial bins
+        :param progress_dialog: Progress dialog to show progress
+        :param remove_cosmics: Detect cosmic rays in every image and add them to the mask before integration
+        :return: Number of integrated images
+        """
+        if not self.raw_available or self.n_img_all == 0:
+            return 0
+        processed = set() if self.pos_map is None else set(map(tuple, self.pos_map.tolist()))
+        new_frames = [(file_index, pos) for file_index, pos in self.pos_map_all.tolist()
+                      if (file_index, pos) not in processed]
+        if len(new_frames) == 0:
+            return 0
+
+        mask = self._get_integration_mask()
+        intensity_data = []
+        binning_data = []
+        reduction_data = {name: [] for name in self.reductions}
+        pos_map = []
+        current_file = None
+        for file_index, pos in new_frames:
+            if progress_dialog is not None and progress_dialog.wasCanceled():
+                break
+            if file_index != current_file:
+                current_file = file_index
+                self._load_file(file_index)
+
+            self.calibration_model.img_model.load_series_img(pos)
+            img_mask = mask
+            if remove_cosmics:
+                cosmics = find_cosmics(self.calibration_model.img_model.img_data)
+                img_mask = cosmics if mask is None else np.logical_or(mask, cosmics)
+            binning, intensity = self.calibration_model.integrate_1d(num_points=num_points, mask=img_mask)
+            raw_img_data = self.calibration_model.img_model.raw_img_data
+            for name, reduction in self.reductions.items():
+                reduction_data[name].append(reduction(raw_img_data, binning, intensity))
+
+            pos_map.append((file_index, pos))
+            binning_data.append(binning)
+            intensity_data.append(intensity)
+            if progress_dialog is not None:
+                progress_dialog.setValue(len(pos_map))
+
+        if len(pos_map) == 0:
+            return 0
+
+        if self.calibration_model.filename != '':
+            self.used_calibration = self.calibration_model.filename
+        self._append_patterns(binning_data, intensity_data, pos_map, reduction_data)
+
+        if self.live_writer is not None:
+            self.live_writer.append(self.data, self.binning, self.pos_map, self.file_map, self.reduction_data)
+        return len(pos_map)
+
+    def _append_patterns(self, binning_data, intensity_data, pos_map, reduction_data):
+        n_old = 0 if self.data is None else self.n_img
+        n_new = n_old + len(intensity_data)
+
+        # patterns are trimmed of trailing zeros, all patterns are padded to the longest binning
+        binning_lengths = [len(binning) for binning in binning_data]
+        longest = int(np.argmax(binning_lengths))
+        if self.binning is None or n_old == 0 or binning_lengths[longest] > len(self.binning):
+            self.binning = np.array(binning_data[longest])
+        n_bins = len(self.binning)
+
+        buffer = self._data_buffer
+        if buffer is None or self.data is None or self.data.base is not buffer or \
+                buffer.shape[0] < n_new or buffer.shape[1] < n_bins:
+            buffer = np.zeros((max(2 * n_new, 16), n_bins))
+            if self.data is not None:
+                buffer[:n_old, :self.data.shape[1]] = self.data
+            self._data_buffer = buffer
+        for ind, intensity in enumerate(intensity_data):
+            buffer[n_old + ind, :len(intensity)] = intensity
+        self.data = buffer[:n_new, :n_bins]
+        self.n_img = n_new
+
+        if self.pos_map is None or n_old == 0:
+            self.pos_map = np.array(pos_map)
+        else:
+            self.pos_map = np.concatenate((self.pos_map, pos_map))
+
+        old_reduction_data = self.reduction_data
+        self.reduction_data = {}
+        for name, values in reduction_data.items():
+            old_values = old_reduction_data.get(name)
+            if old_values is None or len(old_values) != n_old:
+                old_values = np.full(n_old, np.nan)
+            self.reduction_data[name] = np.concatenate((old_values, values))
+
+        self.bkg = None
+        self.sector_data = None
+        self.sector_azimuth = None
+        self.cake_file = None
+
+    def open_live_output(self, filename):
+        """
+        Opens a processed data file, to which the patterns integrated in live mode are appended (see
+        integrate_new_frames). Already integrated patterns are written immediately.
+        """
+        self.close_live_output()
+        if self.calibration_model.filename != '':
+            self.used_calibration = self.calibration_model.filename
+        if self.mask_model.mode and self.mask_model.filename != '':
+            self.used_mask = self.mask_model.filename
+            self.used_mask_shape = self.mask_model.get_mask().shape
+        self.live_writer = ProcessedDataWriter(filename, self.files, self.reductions, self.used_calibration,
+                                               self.used_mask, self.used_mask_shape,
+                                               self.calibration_model.last_integration_method or 'csr')
+        if self.data is not None:
+            self.live_writer.append(self.data, self.binning, self.pos_map, self.file_map, self.reduction_data)
+
+    def close_live_output(self):
+        if self.live_writer is not None:
+            self.live_writer.close()
+            self.live_writer = None
 
     def extract_background(self, parameters, progress_dialog=None):
         """
@@ -291,6 +639,17 @@ class BatchModel(QtCore.QObject):
             bkg[i] = extract_background(self.binning, y, *parameters)
         self.bkg = bkg
 
+    def get_cake(self, index):
+        """
+        Reads the cake of an integrated image from the cake stack file, only this cake is loaded into memory.
+
+        :param index: Index of the integrated image in the batch
+        :return: cake, binning, azimuth or None if no cake stack is available
+        """
+        if self.cake_file is None or not os.path.isfile(self.cake_file) or not 0 <= index < self.n_img:
+            return None
+        return read_cake(self.cake_file, index)
+
     def get_image_info(self, index, use_all=False):
         """
         Get filename and image position in the file
@@ -319,4 +678,8 @@ class BatchModel(QtCore.QObject):
         if not self.raw_available:
             return
         filename, pos = self.get_image_info(index, use_all)
-        self.calibration_model.img_model.load(filename, pos)
+        source = self._live_sources.get(filename)
+        if isinstance(source, LambdaImage):
+            self.calibration_model.img_model.load_series(filename, source.get_image, source.series_max, pos)
+        else:
+            self.calibration_model.img_model.load(filename, pos)
@@ -24,6 +24,7 @@ import sys
 import time
 from enum import Enum
 from copy import deepcopy
+from functools import partial
 
 import numpy as np
 from pyFAI.azimuthalIntegrator import AzimuthalIntegrator
@@ -39,6 +40,7 @@ from .ImgModel import ImgModel
 from .util import Signal
 from .util.HelperModule import get_base_name, rotate_matrix_p90, rotate_matrix_m90, get_partial_index
 from .util.calc import supersample_image, trim_trailing_zeros
+from .util.IntegrationMethodTuner import integration_method_tuner
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -82,6 +84,13 @@ class CalibrationModel(object):
         self.polarization_factor = 0.99
         self.supersampling_factor = 1
         self.correct_solid_angle = True
+        # if True, background and corrections are passed as dark and flat images to pyFAI instead of being applied to
+        # the image data before the integration
+        self.apply_corrections_in_integrator = False
+        # manually selected pyFAI integration method, if None the fastest method is determined by the tuner
+        self.integration_method = None
+        self.integration_method_tuner = integration_method_tuner
+        self.last_integration_method = None  # method used for the last 1D integration
         self._calibrants_working_dir = calibrants_path
 
         self.distortion_spline_filename = None
@@ -93,9 +102,20 @@ class CalibrationModel(object):
         self.cake_img = np.zeros((2048, 2048))
         self.cake_tth = None
         self.cake_azi = None
+        self.cake_normalization = None
+
+        self.sector_x = None
+        self.sector_azi = None
+        self.sector_int = None
+        self.sector_normalization = None
 
         self.peak_search_algorithm = None
 
+        # integrated linear components of the image for fast updates of background scaling, offset and factor
+        self._pattern_integration_cache = {}
+        self._cake_integration_cache = {}
+        self._sector_integration_cache = {}
+
         self.detector_reset = Signal()
 
     def find_peaks_automatic(self, x, y, peak_ind):
@@ -333,7 +353,7 @@ class CalibrationModel(object):
 
     def _check_detector_and_image_shape(self):
         if self.detector.shape is not None:
-            if self.detector.shape != self.img_model.img_data.shape:
+            if self.detector.shape != self.img_model.raw_img_data.shape:
                 self.reset_detector()
                 self.detector_reset.emit()
 
@@ -347,119 +367,362 @@ class CalibrationModel(object):
                 if mask.shape == self.detector.mask.shape:
                     return np.logical_or(self.detector.mask, mask)
 
-    def _prepare_integration_super_sampling(self, mask):
+    def _prepare_integration_super_sampling(self, mask, img_data=None):
+        if img_data is None:
+            img_data = self.img_model.img_data
         if self.supersampling_factor > 1:
-            img_data = supersample_image(self.img_model.img_data, self.supersampling_factor)
+            img_data = supersample_image(img_data, self.supersampling_factor)
             if mask is not None:
                 mask = supersample_image(mask, self.supersampling_factor)
-        else:
-            img_data = self.img_model.img_data
         return img_data, mask
 
+    def _get_integration_key(self, geometry, *args):
+        """
+        Creates a key describing all the settings of an integration besides the mask. Integrated linear components
+        of the image can only be reused if this key did not change.
+        """
+        return (id(geometry.detector), tuple(geometry.getPyFAI().items()), self.polarization_factor,
+                self.correct_solid_angle, self.supersampling_factor) + args
+
+    def _integrate_linear(self, cache, key, mask, integrate):
+        """
+        Integrates the image data with the given integrate function. Azimuthal integration is linear in the image
+        data, so if only background scaling, background offset or factor of the image model changed since the last
+        call, the linear components of the image are integrated once (see ImgModel.linear_components) and
+        afterwards only combined with the current coefficients, without a new integration.
+        :param cache: dictionary storing the state of the previous integrations
+        :param key: key of the integration settings (see _get_integration_key)
+        :param mask: integration mask, already combined with the detector mask
+        :param integrate: function taking the (supersampled) image and mask and returning a tuple of arrays where the
+                          last one is the intensity
+        :return: result of integrate for the current image data
+        """
+        img_model = self.img_model
+        sources = (img_model.img_data_version, id(img_model.raw_img_data), id(img_model.background_data))
+        if cache.get('key') != key or cache.get('sources') != sources or \
+                not np.array_equal(cache.get('mask'), mask):
+            cache.clear()
+            cache.update(key=key, sources=sources, mask=None if mask is None else np.copy(mask),
+                         coefficients=img_model.linear_coefficients, components=None)
+        elif cache['components'] is None and cache['coefficients'] != img_model.linear_coefficients:
+            cache['components'] = []
+            for component in img_model.linear_components:
+                component_data, component_mask = self._prepare_integration_super_sampling(mask, component)
+                cache['components'].append(integrate(component_data, component_mask))
+
+        if cache['components'] is None:
+            return integrate(*self._prepare_integration_super_sampling(mask))
+
+        components = cache['components']
+        intensity = sum(coefficient * component[-1]
+                        for coefficient, component in zip(img_model.linear_coefficients, components))
+        return components[0][:-1] + (intensity,)
+
+    def _integrate_with_corrections_in_integrator(self, mask, integrate):
+        """
+        Integrates the raw image data and lets pyFAI subtract the background (as dark image) and divide by the
+        corrections (as flat image), so that no corrected copy of the image has to be created. The results agree with
+        the integration of ImgModel.img_data within the float32 precision of the pyFAI engines (differences below
+        1e-5 of the maximum intensity).
+        :param mask: integration mask, already combined with the detector mask
+        :param integrate: function taking image, mask, dark and flat and returning a tuple of arrays where the last one
+                          is the intensity
+        """
+        img_model = self.img_model
+        img_data, mask = self._prepare_integration_super_sampling(mask, img_model.raw_img_data)
+        dark, flat = img_model.integration_dark, img_model.integration_flat
+        if self.supersampling_factor > 1:
+            dark = None if dark is None else supersample_image(dark, self.supersampling_factor)
+            flat = None if flat is None else supersample_image(flat, self.supersampling_factor)
+        result = integrate(img_data, mask, dark, flat)
+        return result[:-1] + (result[-1] * img_model.factor,)
+
+    def _get_integration_method(self, dim, geometry, mask, integrate, tune=True):
+        """
+        :return:
+            the manually set integration_method or the fastest method for the current detector and image shape. If the
+            fastest method is not known yet, all available methods are timed (if tune is True) with the current
+            binning, later changes of the binning use the same method.
+        """
+        if self.integration_method is not None:
+            return self.integration_method
+
+        tuner = self.integration_method_tuner
+        shape = tuple(np.array(self.img_model.raw_img_data.shape) * self.supersampling_factor)
+        key = tuner.create_key(dim, geometry.detector, shape)
+        if not tuner.has_method(key) and tune:
+            img_data, mask = self._prepare_integration_super_sampling(mask)
+            tuner.tune(key, dim, lambda method: integrate(img_data, mask, method=method))
+            geometry.reset()  # the engines of the slower methods are not needed anymore
+        return tuner.get_method(key)
+
     def integrate_1d(self, num_points=None, mask=None, polarization_factor=None, filename=None,
-                     unit='2th_deg', method='csr', azi_range=None):
-        if np.sum(mask) == self.img_model.img_data.shape[0] * self.img_model.img_data.shape[1]:
+                     unit='2th_deg', method=None, azi_range=None):
+        img_shape = self.img_model.raw_img_data.shape
+        if np.sum(mask) == img_shape[0] * img_shape[1]:
             # do not perform integration if the image is completely masked...
             return self.tth, self.int
 
-        if self.pattern_geometry_img_shape != self.img_model.img_data.shape:
+        self._reset_pattern_geometry_for_img_shape()
+        self._check_detector_and_image_shape()
+        mask = self._prepare_integration_mask(mask)
+        return self._integrate_1d(mask, num_points, polarization_factor, filename, unit, method, azi_range)
+
+    def _reset_pattern_geometry_for_img_shape(self):
+        if self.pattern_geometry_img_shape != self.img_model.raw_img_data.shape:
             # if cake geometry was used on differently shaped image before the azimuthal integrator needs to be reset
             self.pattern_geometry.reset()
-            self.pattern_geometry_img_shape = self.img_model.img_data.shape
+            self.pattern_geometry_img_shape = self.img_model.raw_img_data.shape
 
+    def _integrate_1d(self, mask, num_points=None, polarization_factor=None, filename=None, unit='2th_deg',
+                      method=None, azi_range=None):
+        """
+        Integrates the image to a pattern, the mask needs to be already combined with the detector mask.
+        """
         if polarization_factor is None:
             polarization_factor = self.polarization_factor
 
-        self._check_detector_and_image_shape()
-        mask = self._prepare_integration_mask(mask)
-        img_data, mask = self._prepare_integration_super_sampling(mask)
-
         if num_points is None:
-            num_points = self.calculate_number_of_pattern_points(img_data.shape, 2)
+            num_points = self._calculate_default_number_of_points()
 
         self.num_points = num_points
 
-        t1 = time.time()
+        integration_unit = '2th_deg' if unit == 'd_A' else unit
 
-        if unit == 'd_A':
+        def integrate(img_data, mask, dark=None, flat=None, method=None):
             try:
-                self.tth, self.int = self.pattern_geometry.integrate1d(img_data, num_points,
-                                                                       method=method,
-                                                                       unit='2th_deg',
-                                                                       azimuth_range=azi_range,
-                                                                       mask=mask,
-                                                                       polarization_factor=polarization_factor,
-                                                                       correctSolidAngle=self.correct_solid_angle,
-                                                                       filename=filename)
+                return tuple(self.pattern_geometry.integrate1d(img_data, num_points,
+                                                               method=method,
+                                                               unit=integration_unit,
+                                                               azimuth_range=azi_range,
+                                                               mask=mask,
+                                                               dark=dark,
+                                                               flat=flat,
+                                                               polarization_factor=polarization_factor,
+                                                               correctSolidAngle=self.correct_solid_angle,
+                                                               filename=filename))
             except NameError:
-                self.tth, self.int = self.pattern_geometry.integrate1d(img_data, num_points,
-                                                                       method='csr',
-                                                                       unit='2th_deg',
-                                                                       azimuth_range=azi_range,
-                                                                       mask=mask,
-                                                                       polarization_factor=polarization_factor,
-                                                                       correctSolidAngle=self.correct_solid_angle,
-                                                                       filename=filename)
-            self.tth = self.pattern_geometry.wavelength / (2 * np.sin(self.tth / 360 * np.pi)) * 1e10
-            self.int = self.int
+                return tuple(self.pattern_geometry.integrate1d(img_data, num_points,
+                                                               method='csr',
+                                                               unit=integration_unit,
+                                                               azimuth_range=azi_range,
+                                                               mask=mask,
+                                                               dark=dark,
+                                                               flat=flat,
+                                                               polarization_factor=polarization_factor,
+                                                               correctSolidAngle=self.correct_solid_angle,
+                                                               filename=filename))
+
+        if method is None:
+            method = self._get_integration_method(1, self.pattern_geometry, mask, integrate, tune=filename is None)
+        integrate = partial(integrate, method=method)
+        self.last_integration_method = method
+
+        t1 = time.time()
+
+        if filename is not None:  # the pattern has to be written to the file by pyFAI
+            tth, intensity = integrate(*self._prepare_integration_super_sampling(mask))
+        elif self.apply_corrections_in_integrator:
+            tth, intensity = self._integrate_with_corrections_in_integrator(mask, integrate)
         else:
-            try:
-                self.tth, self.int = self.pattern_geometry.integrate1d(img_data, num_points,
-                                                                       method=method,
-                                                                       unit=unit,
-                                                                       azimuth_range=azi_range,
-                                                                       mask=mask,
-                                                                       polarization_factor=polarization_factor,
-                                                                       correctSolidAngle=self.correct_solid_angle,
-                                                                       filename=filename)
-            except NameError:
-                self.tth, self.int = self.pattern_geometry.integrate1d(img_data, num_points,
-                                                                       method='csr',
-                                                                       unit=unit,
-                                                                       azimuth_range=azi_range,
-                                                                       mask=mask,
-                                                                       polarization_factor=polarization_factor,
-                                                                       correctSolidAngle=self.correct_solid_angle,
-                                                                       filename=filename)
+            key = self._get_integration_key(self.pattern_geometry, num_points, integration_unit, method, azi_range,
+                                            polarization_factor)
+            tth, intensity = self._integrate_linear(self._pattern_integration_cache, key, mask, integrate)
         logger.info('1d integration of {0}: {1}s.'.format(os.path.basename(self.img_model.filename), time.time() - t1))
 
-        self.tth, self.int = trim_trailing_zeros(self.tth, self.int)
+        return self._set_pattern(tth, intensity, unit)
 
+    def _set_pattern(self, tth, intensity, unit):
+        if unit == 'd_A':
+            tth = self.pattern_geometry.wavelength / (2 * np.sin(tth / 360 * np.pi)) * 1e10
+        self.tth, self.int = trim_trailing_zeros(tth, intensity)
         return self.tth, self.int
 
-    def integrate_2d(self, mask=None, polarization_factor=None, unit='2th_deg', method='csr',
+    def _calculate_default_number_of_points(self):
+        return self.calculate_number_of_pattern_points(
+            np.array(self.img_model.raw_img_data.shape) * self.supersampling_factor, 2)
+
+    def integrate_2d(self, mask=None, polarization_factor=None, unit='2th_deg', method=None,
                      rad_points=None, azimuth_points=360,
                      azimuth_range=None):
-        if polarization_factor is None:
-            polarization_factor = self.polarization_factor
+        self._reset_cake_geometry_for_img_shape()
+        self._check_detector_and_image_shape()
+        mask = self._prepare_integration_mask(mask)
+        return self._integrate_2d(mask, polarization_factor, unit, method, rad_points, azimuth_points, azimuth_range)
 
-        if self.cake_geometry_img_shape != self.img_model.img_data.shape:
+    def _reset_cake_geometry_for_img_shape(self):
+        if self.cake_geometry_img_shape != self.img_model.raw_img_data.shape:
             # if cake geometry was used on differently shaped image before the azimuthal integrator needs to be reset
             self.cake_geometry.reset()
-            self.cake_geometry_img_shape = self.img_model.img_data.shape
+            self.cake_geometry_img_shape = self.img_model.raw_img_data.shape
 
-        self._check_detector_and_image_shape()
-        mask = self._prepare_integration_mask(mask)
-        img_data, mask = self._prepare_integration_super_sampling(mask)
+    def _integrate_2d(self, mask, polarization_factor=None, unit='2th_deg', method=None, rad_points=None,
+                      azimuth_points=360, azimuth_range=None):
+        """
+        Integrates the image to a cake, the mask needs to be already combined with the detector mask. Besides the cake
+        the normalization of each cake bin is kept in cake_normalization, which allows to derive the pattern from the
+        cake.
+        """
+        t1 = time.time()
+        result = self._integrate_cake(self._cake_integration_cache, mask, polarization_factor, unit, method,
+                                      rad_points, azimuth_points, azimuth_range)
+        self.cake_tth, self.cake_azi, self.cake_normalization, self.cake_img = result
+        logger.info('2d integration of {0}: {1}s.'.format(os.path.basename(self.img_model.filename), time.time() - t1))
+        return self.cake_img
+
+    def _integrate_cake(self, cache, mask, polarization_factor=None, unit='2th_deg', method=None, rad_points=None,
+                        azimuth_points=360, azimuth_range=None):
+        """
+        Integrates the image into azimuthal and radial bins with the cake geometry.
+        :param cache: dictionary storing the integrated linear components (see _integrate_linear)
+        :return: radial bin centers, azimuthal bin centers, normalization of each bin (or None), intensity
+        """
+        if polarization_factor is None:
+            polarization_factor = self.polarization_factor
 
         if rad_points is None:
-            rad_points = self.calculate_number_of_pattern_points(img_data.shape, 2)
+            rad_points = self._calculate_default_number_of_points()
         self.num_points = rad_points
 
+        def integrate(img_data, mask, dark=None, flat=None, method=None):
+            res = self.cake_geometry.integrate2d(img_data, rad_points, azimuth_points,
+                                                 azimuth_range=azimuth_range,
+                                                 method=method,
+                                                 mask=mask,
+                                                 dark=dark,
+                                                 flat=flat,
+                                                 unit=unit,
+                                                 polarization_factor=polarization_factor,
+                                                 correctSolidAngle=self.correct_solid_angle)
+            normalization = getattr(res, 'sum_normalization', None)
+            if normalization is not None and normalization.ndim == 3:
+                normalization = normalization[..., 0]
+            return res[1], res[2], normalization, res[0]
+
+        if method is None:
+            method = self._get_integration_method(2, self.cake_geometry, mask, integrate)
+        integrate = partial(integrate, method=method)
+
+        if self.apply_corrections_in_integrator:
+            return self._integrate_with_corrections_in_integrator(mask, integrate)
+        key = self._get_integration_key(self.cake_geometry, rad_points, azimuth_points, azimuth_range, method,
+                                        unit, polarization_factor)
+        return self._integrate_linear(cache, key, mask, integrate)
+
+    def integrate_sectors(self, num_sectors, mask=None, num_points=None, unit='2th_deg', azimuth_range=None,
+                          polarization_factor=None, method=None):
+        """
+        Integrates the image into patterns of num_sectors azimuthal sectors with equal width. All sectors are
+        calculated in a single pass over the pixels, pyFAI uses one sparse matrix assigning every pixel to its
+        radial bin and sector, instead of integrating the image once per sector.
+        :param num_sectors: number of azimuthal sectors
+        :param num_points: number of radial bins, if None it is calculated from the image shape
+        :param unit: radial unit of the patterns ('2th_deg', 'q_A^-1' or 'd_A')
+        :param azimuth_range: azimuthal range (min, max) divided into the sectors, if None the full circle is used
+        :return: x, azimuthal centers of the sectors, intensities with shape (num_sectors, num_points)
+        """
+        self._reset_cake_geometry_for_img_shape()
+        self._check_detector_and_image_shape()
+        mask = self._prepare_integration_mask(mask)
+
+        integration_unit = '2th_deg' if unit == 'd_A' else unit
+
         t1 = time.time()
+        x, azi, normalization, intensity = self._integrate_cake(self._sector_integration_cache, mask,
+                                                                polarization_factor, integration_unit, method,
+                                                                num_points, num_sectors, azimuth_range)
+        logger.info('sector integration of {0}: {1}s.'.format(os.path.basename(self.img_model.filename),
+                                                             time.time() - t1))
+        if unit == 'd_A':
+            x = self.cake_geometry.wavelength / (2 * np.sin(x / 360 * np.pi)) * 1e10
 
-        res = self.cake_geometry.integrate2d(img_data, rad_points, azimuth_points,
-                                             azimuth_range=azimuth_range,
-                                             method=method,
-                                             mask=mask,
-                                             unit=unit,
-                                             polarization_factor=polarization_factor,
-                                             correctSolidAngle=self.correct_solid_angle)
-        logger.info('2d integration of {0}: {1}s.'.format(os.path.basename(self.img_model.filename), time.time() - t1))
-        self.cake_img = res[0]
-        self.cake_tth = res[1]
-        self.cake_azi = res[2]
-        return self.cake_img
+        self.sector_x, self.sector_azi, self.sector_normalization, self.sector_int = x, azi, normalization, intensity
+        return self.sector_x, self.sector_azi, self.sector_int
+
+    def derive_pattern_from_sectors(self):
+        """
+        Calculates the pattern over all sectors of the last sector integration, using the normalization of each bin
+        as weight.
+        :return: x, int
+        """
+        return self.sector_x, self._combine_azimuthal_bins(self.sector_int, self.sector_normalization)
+
+    def derive_sectors_from_cake(self, num_sectors):
+        """
+        Combines the azimuthal bins of the current cake into num_sectors sectors of equal width, using the
+        normalization of each cake bin as weight. This gives the same result as integrate_sectors with the radial
+        binning and azimuth range of the cake, without integrating the image a second time.
+        :param num_sectors: number of sectors, the number of azimuthal bins of the cake has to be a multiple of it
+        :return: x, azimuthal centers of the sectors, intensities with shape (num_sectors, num_points)
+        """
+        azimuth_points, rad_points = self.cake_img.shape
+        if azimuth_points % num_sectors != 0:
+            raise ValueError('The number of azimuthal bins of the cake is not a multiple of the number of sectors.')
+        shape = (num_sectors, azimuth_points // num_sectors, rad_points)
+
+        intensity = self.cake_img.reshape(shape)
+        normalization = None
+        if self.cake_normalization is not None:
+            normalization = self.cake_normalization.reshape(shape)
+            self.sector_normalization = np.sum(normalization, axis=1)
+        else:
+            self.sector_normalization = None
+        self.sector_int = self._combine_azimuthal_bins(intensity, normalization, axis=1)
+        self.sector_x = self.cake_tth
+        self.sector_azi = np.mean(np.reshape(self.cake_azi, shape[:2]), axis=1)
+        return self.sector_x, self.sector_azi, self.sector_int
+
+    def integrate_1d_and_2d(self, mask=None, num_points=None, unit='2th_deg', azi_range=None,
+                            azimuth_points=360, azimuth_range=None):
+        """
+        Integrates the image to a pattern and a cake in a single step. The detector check and the mask are prepared
+        only once. If the pattern uses the same radial binning as the cake (2theta or d-spacing unit, same azimuth
+        range), the pattern is derived from the cake by summing up the signal and normalization of the cake bins
+        along the azimuth, without a second integration.
+        :return: tth, int, cake_img
+        """
+        if num_points is None:
+            num_points = self._calculate_default_number_of_points()
+
+        self._reset_cake_geometry_for_img_shape()
+        self._check_detector_and_image_shape()
+        mask = self._prepare_integration_mask(mask)
+
+        self._integrate_2d(mask, rad_points=num_points, azimuth_points=azimuth_points, azimuth_range=azimuth_range)
+
+        if unit in ('2th_deg', 'd_A') and _same_azimuth_range(azi_range, azimuth_range) and \
+                self.cake_normalization is not None:
+            tth, intensity = self.derive_pattern_from_cake()
+            self._set_pattern(tth, intensity, unit)
+        elif mask is None or np.sum(mask) != mask.size:  # completely masked images are not integrated
+            self._reset_pattern_geometry_for_img_shape()
+            self._integrate_1d(mask, num_points, unit=unit, azi_range=azi_range)
+        return self.tth, self.int, self.cake_img
+
+    def set_cake(self, cake_img, cake_tth, cake_azi):
+        """
+        Sets a previously integrated cake, e.g. read from the cake stack of a batch integration.
+        """
+        self.cake_img, self.cake_tth, self.cake_azi = cake_img, cake_tth, cake_azi
+        self.cake_normalization = None
+
+    def derive_pattern_from_cake(self):
+        """
+        Calculates the pattern from the current cake, using the normalization of each cake bin as weight. This gives
+        the same result as a 1D integration with the same radial binning.
+        :return: tth, int
+        """
+        return self.cake_tth, self._combine_azimuthal_bins(self.cake_img, self.cake_normalization)
+
+    @staticmethod
+    def _combine_azimuthal_bins(intensity, normalization, axis=0):
+        if normalization is None:
+            return np.mean(intensity, axis=axis)
+        signal = np.sum(intensity * normalization, axis=axis)
+        normalization = np.sum(normalization, axis=axis)
+        combined = np.zeros_like(signal)
+        np.divide(signal, normalization, out=combined, where=normalization != 0)
+        return combined
 
     def cake_integral(self, tth, bins=1):
         """
@@ -908,3 +1171,12 @@ def get_available_detectors():
     del detector_classes_sorted[base_class_index]
 
     return detector_names_sorted, detector_classes_sorted
+
+
+def _same_azimuth_range(range1, range2):
+    """
+    Compares two azimuth ranges, which can be None, tuples, lists or arrays.
+    """
+    if range1 is None or range2 is None:
+        return range1 is None and range2 is None
+    return np.array_equal(range1, range2)
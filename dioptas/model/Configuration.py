@@ -30,7 +30,7 @@ from .util.ImgCorrection import CbnCorrection, ObliqueAngleDetectorAbsorptionCor
 
 from .util import Pattern
 from .util.calc import convert_units
-from . import ImgModel, CalibrationModel, MaskModel, PatternModel, BatchModel
+from . import ImgModel, CalibrationModel, MaskModel, PatternModel, BatchModel, PeakMonitorModel
 from .CalibrationModel import DetectorModes
 
 
@@ -48,6 +48,7 @@ class Configuration(object):
         self.mask_model = MaskModel()
         self.calibration_model = CalibrationModel(self.img_model)
         self.batch_model = BatchModel(self.calibration_model, self.mask_model)
+        self.peak_monitor_model = PeakMonitorModel(self.calibration_model, self.mask_model)
         self.pattern_model = PatternModel()
 
         if working_directories is None:
@@ -73,6 +74,8 @@ class Configuration(object):
         self.auto_save_integrated_pattern = False
         self.integrated_patterns_file_formats = ['.xy']
 
+        self._pending_hdf5_group = None
+
         self.cake_changed = Signal()
         self._connect_signals()
 
@@ -81,7 +84,30 @@ class Configuration(object):
         Connects the img_changed signal to responding functions.
         """
         self.img_model.img_changed.connect(self.update_mask_dimension)
-        self.img_model.img_changed.connect(self.integrate_image_1d)
+        self.img_model.img_changed.connect(self.integrate_image)
+        self.peak_monitor_model.integration_resumed.connect(self.integrate_image)
+
+    def integrate_image(self):
+        """
+        Integrates the image depending on auto_integrate_pattern and auto_integrate_cake. If both are enabled, the
+        pattern and the cake are integrated together in a single step. Nothing is integrated while the peak monitor is
+        running with suspended integration.
+        """
+        if self.peak_monitor_model.running and self.peak_monitor_model.suspend_integration:
+            return
+        if self.auto_integrate_pattern and self.auto_integrate_cake:
+            self.integrate_image_1d_and_2d()
+        elif self.auto_integrate_pattern:
+            self.integrate_image_1d()
+        elif self.auto_integrate_cake:
+            self.integrate_image_2d()
+
+    def _get_integration_mask(self):
+        if self.use_mask:
+            return self.mask_model.get_mask()
+        elif self.mask_model.roi is not None:
+            return self.mask_model.roi_mask
+        return None
 
     def integrate_image_1d(self):
         """
@@ -89,14 +115,9 @@ class Configuration(object):
         auto_save_integrated is True.
         """
         if self.calibration_model.is_calibrated:
-            if self.use_mask:
-                mask = self.mask_model.get_mask()
-            elif self.mask_model.roi is not None:
-                mask = self.mask_model.roi_mask
-            else:
-                mask = None
-
-            x, y = self.calibration_model.integrate_1d(azi_range=self.oned_azimuth_range, mask=mask, unit=self.integration_unit,
+            x, y = self.calibration_model.integrate_1d(azi_range=self.oned_azimuth_range,
+                                                       mask=self._get_integration_mask(),
+                                                       unit=self.integration_unit,
                                                        num_points=self.integration_rad_points)
 
             self.pattern_model.set_pattern(x, y, self.img_model.filename, unit=self.integration_unit)  #
@@ -108,37 +129,54 @@ class Configuration(object):
         """
         Integrates the image in the ImageModel to a Cake.
         """
-        if self.use_mask:
-            mask = self.mask_model.get_mask()
-        elif self.mask_model.roi is not None:
-            mask = self.mask_model.roi_mask
-        else:
-            mask = None
-
-        self.calibration_model.integrate_2d(mask=mask,
+        self.calibration_model.integrate_2d(mask=self._get_integration_mask(),
                                             rad_points=self._integration_rad_points,
                                             azimuth_points=self._cake_azimuth_points,
                                             azimuth_range=self._cake_azimuth_range)
 
         self.cake_changed.emit()
 
-    def save_pattern(self, filename=None, subtract_background=False):
+    def integrate_image_1d_and_2d(self):
+        """
+        Integrates the image in the ImageModel to a Pattern and a Cake in a single step (see
+        CalibrationModel.integrate_1d_and_2d).
+        """
+        if not self.calibration_model.is_calibrated:
+            self.integrate_image_2d()
+            return
+
+        x, y, _ = self.calibration_model.integrate_1d_and_2d(mask=self._get_integration_mask(),
+                                                             num_points=self._integration_rad_points,
+                                                             unit=self.integration_unit,
+                                                             azi_range=self.oned_azimuth_range,
+                                                             azimuth_points=self._cake_azimuth_points,
+                                                             azimuth_range=self._cake_azimuth_range)
+        self.pattern_model.set_pattern(x, y, self.img_model.filename, unit=self.integration_unit)
+
+        if self.auto_save_integrated_pattern:
+            self._auto_save_patterns()
+
+        self.cake_changed.emit()
+
+    def save_pattern(self, filename=None, subtract_background=False, asynchronous=False):
         """
         Saves the current integrated pattern. The format depends on the file ending. Possible file formats:
             [*.xy, *.chi, *.dat, *.fxye]
         :param subtract_background: flat whether the pattern should be saved with or without subtracted background
+        :param asynchronous: flag whether the file is written in a background thread
         """
         if filename is None:
             filename = self.img_model.filename
 
         if filename.endswith('.xy'):
             self.pattern_model.save_pattern(filename, header=self._create_xy_header(),
-                                            subtract_background=subtract_background)
+                                            subtract_background=subtract_background, asynchronous=asynchronous)
         elif filename.endswith('.fxye'):
             self.pattern_model.save_pattern(filename, header=self._create_fxye_header(filename),
-                                            subtract_background=subtract_background)
+                                            subtract_background=subtract_background, asynchronous=asynchronous)
         else:
-            self.pattern_model.save_pattern(filename, subtract_background=subtract_background)
+            self.pattern_model.save_pattern(filename, subtract_background=subtract_background,
+                                            asynchronous=asynchronous)
 
     def save_background_pattern(self, filename=None):
         """
@@ -188,13 +226,16 @@ class Configuration(object):
         Saves the current pattern in the pattern working directory (specified in self.working_directories['pattern'].
         When background subtraction is enabled in the pattern model the pattern will be saved with background
         subtraction and without in another sub-folder. ('bkg_subtracted')
+        The files are written in the background while the next image is integrated, the patterns of the previous image
+        are waited for first, so that the autosaved files lag behind by at most one image.
         """
+        self.pattern_model.pattern_writer.flush()
         for file_ending in self.integrated_patterns_file_formats:
             filename = os.path.join(
                 self.working_directories['pattern'],
                 os.path.basename(str(self.img_model.filename)).split('.')[:-1][0] + file_ending)
             filename = filename.replace('\\', '/')
-            self.save_pattern(filename)
+            self.save_pattern(filename, asynchronous=True)
 
         if self.pattern_model.pattern.has_background():
             for file_ending in self.integrated_patterns_file_formats:
@@ -203,7 +244,7 @@ class Configuration(object):
                     os.mkdir(directory)
                 filename = os.path.join(directory, self.pattern_model.pattern.name + file_ending)
                 filename = filename.replace('\\', '/')
-                self.save_pattern(filename, subtract_background=True)
+                self.save_pattern(filename, subtract_background=True, asynchronous=True)
 
     def update_mask_dimension(self):
         """
@@ -218,9 +259,10 @@ class Configuration(object):
     @integration_rad_points.setter
     def integration_rad_points(self, new_value):
         self._integration_rad_points = new_value
-        self.integrate_image_1d()
         if self.auto_integrate_cake:
-            self.integrate_image_2d()
+            self.integrate_image_1d_and_2d()
+        else:
+            self.integrate_image_1d()
 
     @property
     def cake_azimuth_points(self):
@@ -238,7 +280,7 @@ class Configuration(object):
 
     @cake_azimuth_range.setter
     def cake_azimuth_range(self, new_value):
-        self._cake_azimuth_range = new_value
+        self._cake_azimuth_range = _azimuth_range_to_tuple(new_value)
         if self.auto_integrate_cake:
             self.integrate_image_2d()
 
@@ -248,7 +290,7 @@ class Configuration(object):
 
     @oned_azimuth_range.setter
     def oned_azimuth_range(self, new_value):
-        self._oned_azimuth_range = new_value
+        self._oned_azimuth_range = _azimuth_range_to_tuple(new_value)
         if self.auto_integrate_pattern:
             self.integrate_image_1d()
 
@@ -281,10 +323,28 @@ class Configuration(object):
     @correct_solid_angle.setter
     def correct_solid_angle(self, new_val):
         self.calibration_model.correct_solid_angle = new_val
-        if self.auto_integrate_pattern:
-            self.integrate_image_1d()
-        if self._auto_integrate_cake:
-            self.integrate_image_2d()
+        self.integrate_image()
+
+    @property
+    def apply_corrections_in_integrator(self):
+        return self.calibration_model.apply_corrections_in_integrator
+
+    @apply_corrections_in_integrator.setter
+    def apply_corrections_in_integrator(self, new_val):
+        self.calibration_model.apply_corrections_in_integrator = new_val
+        self.integrate_image()
+
+    @property
+    def integration_method(self):
+        return self.calibration_model.integration_method
+
+    @integration_method.setter
+    def integration_method(self, new_val):
+        """
+        :param new_val: pyFAI integration method, None for automatically using the fastest method
+        """
+        self.calibration_model.integration_method = new_val
+        self.integrate_image()
 
     def update_auto_background_parameters_unit(self, old_unit, new_unit):
         """
@@ -318,14 +378,7 @@ class Configuration(object):
 
     @auto_integrate_cake.setter
     def auto_integrate_cake(self, new_value):
-        if self._auto_integrate_cake == new_value:
-            return
-
         self._auto_integrate_cake = new_value
-        if new_value:
-            self.img_model.img_changed.connect(self.integrate_image_2d)
-        else:
-            self.img_model.img_changed.disconnect(self.integrate_image_2d)
 
     @property
     def auto_integrate_pattern(self):
@@ -333,14 +386,7 @@ class Configuration(object):
 
     @auto_integrate_pattern.setter
     def auto_integrate_pattern(self, new_value):
-        if self._auto_integrate_pattern == new_value:
-            return
-
         self._auto_integrate_pattern = new_value
-        if new_value:
-            self.img_model.img_changed.connect(self.integrate_image_1d)
-        else:
-            self.img_model.img_changed.disconnect(self.integrate_image_1d)
 
     @property
     def cake_img(self):
@@ -499,6 +545,9 @@ class Configuration(object):
             except TypeError:
                 pfp.attrs[key] = ''
         calibration_group.attrs['correct_solid_angle'] = self.correct_solid_angle
+        calibration_group.attrs['apply_corrections_in_integrator'] = self.apply_corrections_in_integrator
+        if self.integration_method is not None:
+            calibration_group.attrs['integration_method'] = self.integration_method
         if self.calibration_model.distortion_spline_filename is not None:
             calibration_group.attrs['distortion_spline_filename'] = self.calibration_model.distortion_spline_filename
 
@@ -548,9 +597,43 @@ class Configuration(object):
         else:
             pattern_group.attrs['auto_background_subtraction'] = False
 
-    def load_from_hdf5(self, hdf5_group):
+    def load_from_hdf5(self, hdf5_group, lazy=False):
         """
         Loads a configuration from the specified hdf5_group.
+        :param hdf5_group: group in the project file containing the configuration
+        :type hdf5_group: h5py.Group
+        :param lazy: if True, only the lightweight settings (calibration, integration parameters, stored patterns) are
+                     read now. Image, background, mask and correction data are read from the (still open) group when
+                     load_pending_data() is called, e.g. when the configuration gets selected.
+        """
+        self._load_settings_from_hdf5(hdf5_group)
+        if lazy:
+            self._pending_hdf5_group = hdf5_group
+        else:
+            self._load_data_from_hdf5(hdf5_group)
+
+    @property
+    def has_pending_data(self):
+        """
+        :return: True if the image, mask and correction data of a lazily loaded configuration were not read yet
+        """
+        return self._pending_hdf5_group is not None
+
+    def load_pending_data(self):
+        """
+        Reads the image, background, mask and correction data of a lazily loaded configuration (see load_from_hdf5)
+        and integrates the image. Does nothing if all data has already been loaded.
+        """
+        if self._pending_hdf5_group is None:
+            return
+        hdf5_group = self._pending_hdf5_group
+        self._pending_hdf5_group = None
+        self._load_data_from_hdf5(hdf5_group)
+
+    def _load_settings_from_hdf5(self, hdf5_group):
+        """
+        Loads all lightweight information of a configuration from the specified hdf5_group. No image-sized arrays are
+        read and no integration is performed.
         :type hdf5_group: h5py.Group
         """
 
@@ -587,10 +670,14 @@ class Configuration(object):
             pass
 
         try:
-            self.correct_solid_angle = f.get('calibration_model').attrs['correct_solid_angle']
+            self.calibration_model.correct_solid_angle = f.get('calibration_model').attrs['correct_solid_angle']
         except KeyError:
             pass
 
+        self.calibration_model.apply_corrections_in_integrator = \
+            bool(f.get('calibration_model').attrs.get('apply_corrections_in_integrator', False))
+        self.calibration_model.integration_method = f.get('calibration_model').attrs.get('integration_method', None)
+
         try:
             distortion_spline_filename = f.get('calibration_model').attrs['distortion_spline_filename']
             self.calibration_model.load_distortion(distortion_spline_filename)
@@ -609,8 +696,7 @@ class Configuration(object):
         except AttributeError: # to ensure backwards compatibility
             pass
 
-        # load img_model
-        self.img_model._img_data = np.copy(f.get('image_model').get('raw_image_data')[...])
+        # image file information
         filename = f.get('image_model').attrs['filename']
         self.img_model.filename = filename
 
@@ -622,7 +708,7 @@ class Configuration(object):
 
         self.img_model.autoprocess = f.get('image_model').attrs['auto_process']
         self.img_model.autoprocess_changed.emit()
-        self.img_model.factor = f.get('image_model').attrs['factor']
+        self.img_model._factor = f.get('image_model').attrs['factor']
 
         try:
             self.img_model.series_max = f.get('image_model').attrs['series_max']
@@ -630,26 +716,9 @@ class Configuration(object):
         except KeyError:
             pass
 
-        if f.get('image_model').attrs['has_background']:
-            self.img_model.background_data = np.copy(f.get('image_model').get('background_data')[...])
-            self.img_model.background_filename = f.get('image_model').attrs['background_filename']
-            self.img_model.background_scaling = f.get('image_model').attrs['background_scaling']
-            self.img_model.background_offset = f.get('image_model').attrs['background_offset']
-
-        # load image transformations
-        transformation_group = f.get('image_model').get('image_transformations')
-        transformation_list = []
-        for key, transformation in transformation_group.attrs.items():
-            transformation_list.append(transformation)
-        self.img_model.load_transformations_string_list(transformation_list)
-        self.calibration_model.load_transformations_string_list(transformation_list)
-
         # load roi data
         if f.get('image_model').attrs['has_roi']:
-            self.roi = tuple(f.get('image_model').get('roi')[...])
-
-        # load mask model
-        self.mask_model.set_mask(np.copy(f.get('mask').get('data')[...]))
+            self.mask_model.roi = tuple(f.get('image_model').get('roi')[...])
 
         # load pattern model
         if f.get('pattern').get('x') and f.get('pattern').get('y'):
@@ -658,7 +727,9 @@ class Configuration(object):
                                            f.get('pattern').attrs['pattern_filename'],
                                            f.get('pattern').attrs['unit'])
             self.pattern_model.file_iteration_mode = f.get('pattern').attrs['file_iteration_mode']
-        self.integration_unit = f.get('general_information').attrs['integration_unit']
+        old_unit = self._integration_unit
+        self._integration_unit = f.get('general_information').attrs['integration_unit']
+        self.update_auto_background_parameters_unit(old_unit, self._integration_unit)
 
         if f.get('background_pattern').attrs['has_background_pattern']:
             self.pattern_model.background_pattern = Pattern(f.get('background_pattern').get('x')[...],
@@ -678,19 +749,20 @@ class Configuration(object):
 
         # load general configuration
         if f.get('general_information').attrs['integration_num_points']:
-            self.integration_rad_points = f.get('general_information').attrs['integration_num_points']
+            self._integration_rad_points = f.get('general_information').attrs['integration_num_points']
 
         # cake parameters:
         self.auto_integrate_cake = f.get('general_information').attrs['auto_integrate_cake']
         try:
-            self.cake_azimuth_points = f.get('general_information').attrs['cake_azimuth_points']
+            self._cake_azimuth_points = f.get('general_information').attrs['cake_azimuth_points']
         except KeyError as e:
             pass
         try:
-            if f.get('general_information').attrs['cake_azimuth_range'] == "None":
-                self.cake_azimuth_range = None
-            else:
-                self.cake_azimuth_range = f.get('general_information').attrs['cake_azimuth_range']
+            cake_azimuth_range = f.get('general_information').attrs['cake_azimuth_range']
+            if isinstance(cake_azimuth_range, (str, bytes)):  # saved as "None"
+                self._cake_azimuth_range = None
+            else:  # h5py returns an array
+                self._cake_azimuth_range = _azimuth_range_to_tuple(cake_azimuth_range)
         except KeyError as e:
             pass
 
@@ -698,23 +770,60 @@ class Configuration(object):
         self.use_mask = f.get('general_information').attrs['use_mask']
         self.transparent_mask = f.get('general_information').attrs['transparent_mask']
 
-        # corrections
+        # autosave parameters
+        self.auto_save_integrated_pattern = f.get('general_information').attrs['auto_save_integrated_pattern']
+        self.integrated_patterns_file_formats = []
+        for file_format in f.get('general_information').get('integrated_patterns_file_formats'):
+            self.integrated_patterns_file_formats.append(file_format[0].decode('utf-8'))
+
+    def _load_data_from_hdf5(self, hdf5_group):
+        """
+        Loads the image, background, mask and correction data of a configuration from the specified hdf5_group and
+        integrates the image. The settings need to be loaded before (see _load_settings_from_hdf5).
+        :type hdf5_group: h5py.Group
+        """
+        f = hdf5_group
+
+        # load img_model
+        self.img_model._img_data = np.copy(f.get('image_model').get('raw_image_data')[...])
+
+        if f.get('image_model').attrs['has_background']:
+            self.img_model._background_data = np.copy(f.get('image_model').get('background_data')[...])
+            self.img_model.background_filename = f.get('image_model').attrs['background_filename']
+            self.img_model._background_scaling = f.get('image_model').attrs['background_scaling']
+            self.img_model._background_offset = f.get('image_model').attrs['background_offset']
+
+        # load image transformations
+        transformation_group = f.get('image_model').get('image_transformations')
+        transformation_list = []
+        for key, transformation in transformation_group.attrs.items():
+            transformation_list.append(transformation)
+        self.img_model.load_transformations_string_list(transformation_list)
+        self.calibration_model.load_transformations_string_list(transformation_list)
+        self.img_model._calculate_img_data()
+        self.update_mask_dimension()
+
+        # load mask model
+        self.mask_model.set_mask(np.copy(f.get('mask').get('data')[...]))
+
+        # corrections, the geometry arrays are calculated for the shape of the just loaded image
+        img_shape = self.img_model.raw_img_data.shape
         if f.get('image_model').get('corrections').attrs['has_corrections']:
             for name, correction_group in f.get('image_model').get('corrections').items():
                 params = {}
                 for param, val in correction_group.attrs.items():
                     params[param] = val
                 if name == 'cbn':
-                    tth_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.ttha
-                    azi_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.chia
+                    tth_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.twoThetaArray(img_shape)
+                    azi_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.chiArray(img_shape)
                     cbn_correction = CbnCorrection(tth_array=tth_array, azi_array=azi_array)
 
                     cbn_correction.set_params(params)
                     cbn_correction.update()
                     self.img_model.add_img_correction(cbn_correction, name)
                 elif name == 'oiadac':
-                    tth_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.ttha
-                    azi_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.chia
+                    tth_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.twoThetaArray(img_shape)
+                    azi_array = 180.0 / np.pi * self.calibration_model.pattern_geometry.chiArray(img_shape)
                     oiadac = ObliqueAngleDetectorAbsorptionCorrection(tth_array=tth_array, azi_array=azi_array)
 
                     oiadac.set_params(params)
@@ -731,13 +840,17 @@ class Configuration(object):
                     self.img_model.transfer_correction.set_params(params)
                     self.img_model.enable_transfer_function()
 
-        # autosave parameters
-        self.auto_save_integrated_pattern = f.get('general_information').attrs['auto_save_integrated_pattern']
-        self.integrated_patterns_file_formats = []
-        for file_format in f.get('general_information').get('integrated_patterns_file_formats'):
-            self.integrated_patterns_file_formats.append(file_format[0].decode('utf-8'))
-
         if self.calibration_model.is_calibrated:
             self.integrate_image_1d()
         else:
             self.pattern_model.pattern.recalculate_pattern()
+
+
+def _azimuth_range_to_tuple(azimuth_range):
+    """
+    Azimuth ranges are kept as tuple of floats (or None), so that they can be compared, e.g. ranges read from a
+    project file are numpy arrays.
+    """
+    if azimuth_range is None:
+        return None
+    return tuple(float(value) for value in azimuth_range)
@@ -19,6 +19,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import logging
+import time
 from scipy.interpolate import interp1d, interp2d
 import numpy as np
 
@@ -31,6 +33,8 @@ from .Configuration import Configuration
 from . import ImgModel, CalibrationModel, MaskModel, PhaseModel, PatternModel, OverlayModel
 from .. import __version__
 
+logger = logging.getLogger(__name__)
+
 
 class DioptasModel(object):
     """
@@ -51,6 +55,8 @@ class DioptasModel(object):
         self._combine_cakes = False
         self._cake_data = None
 
+        self._project_file = None  # open project file, as long as configurations still have data to be read from it
+
         self.configuration_added = Signal()
         self.configuration_selected = Signal(int)  # new index
         self.configuration_removed = Signal(int)  # removed index
@@ -94,6 +100,8 @@ class DioptasModel(object):
         del self.configurations[ind]
         if ind == len(self.configurations) or ind == -1:
             self.configuration_ind = len(self.configurations) - 1
+        self.current_configuration.load_pending_data()
+        self._close_project_file_if_loaded()
         self.connect_models()
         self.configuration_removed.emit(self.configuration_ind)
 
@@ -102,6 +110,7 @@ class DioptasModel(object):
         Saves the current state of the model in a h5py file. file-ending can be chosen as wanted. Usually Dioptas
         projects are saved as *.dio files.
         """
+        self.load_pending_configurations()
         f = h5py.File(filename, 'w')
 
         f.attrs['__version__'] = __version__
@@ -151,11 +160,17 @@ class DioptasModel(object):
         f.flush()
         f.close()
 
-    def load(self, filename):
+    def load(self, filename, lazy=True):
         """
         Loads a previously saved model (see save function) from an h5py file.
+        :param filename: path of the project file
+        :param lazy: if True, only the selected configuration is loaded completely. The image, mask and correction data
+                     of all other configurations is read from the project file, which stays open, when they get
+                     selected.
         """
+        start_time = time.time()
         self.disconnect_models()
+        self._close_project_file()
 
         f = h5py.File(filename, 'r')
 
@@ -171,13 +186,15 @@ class DioptasModel(object):
         self.configurations = []
         for ind, configuration_group in f.get('configurations').items():
             configuration = Configuration()
-            configuration.load_from_hdf5(configuration_group)
+            configuration.load_from_hdf5(configuration_group, lazy=lazy)
             self.configurations.append(configuration)
         self.configuration_ind = f.get('configurations').attrs['selected_configuration']
+        self.current_configuration.load_pending_data()
 
         self.connect_models()
         self.configuration_added.emit()
         self.select_configuration(self.configuration_ind)
+        logger.info("First configuration of {0} loaded in {1:.3f} s.".format(filename, time.time() - start_time))
 
         # load phase model
         for ind, phase_group in f.get('phases').items():
@@ -204,7 +221,31 @@ class DioptasModel(object):
             self.overlay_model.set_overlay_offset(index, overlay_group.attrs['offset'])
             self.overlay_model.set_overlay_scaling(index, overlay_group.attrs['scaling'])
 
-        f.close()
+        self._project_file = f
+        self._close_project_file_if_loaded()
+
+    def load_pending_configurations(self):
+        """
+        Reads all data of lazily loaded configurations, which has not been read from the project file yet, and closes
+        the project file afterwards.
+        """
+        for configuration in self.configurations:
+            configuration.load_pending_data()
+        self._close_project_file()
+
+    def _close_project_file_if_loaded(self):
+        """
+        Closes the project file, if no configuration needs to read data from it anymore.
+        """
+        for configuration in self.configurations:
+            if configuration.has_pending_data:
+                return
+        self._close_project_file()
+
+    def _close_project_file(self):
+        if self._project_file is not None:
+            self._project_file.close()
+            self._project_file = None
 
     def select_configuration(self, ind):
         """
@@ -214,6 +255,9 @@ class DioptasModel(object):
         if 0 <= ind < len(self.configurations):
             self.disconnect_models()
             self.configuration_ind = ind
+            if self.current_configuration.has_pending_data:
+                self.current_configuration.load_pending_data()
+                self._close_project_file_if_loaded()
             self.connect_models()
             self.configuration_selected.emit(ind)
             self.current_configuration.auto_integrate_pattern = False
@@ -306,6 +350,13 @@ class DioptasModel(object):
         """
         return self.configurations[self.configuration_ind].batch_model
 
+    @property
+    def peak_monitor_model(self):
+        """
+        :rtype: PeakMonitorModel
+        """
+        return self.configurations[self.configuration_ind].peak_monitor_model
+
     @property
     def use_mask(self):
         return self.configurations[self.configuration_ind].use_mask
@@ -362,6 +413,7 @@ class DioptasModel(object):
         """
         Activates cake integration in all configurations.
         """
+        self.load_pending_configurations()
         for configuration in self.configurations:
             if not configuration.auto_integrate_cake:
                 configuration.auto_integrate_cake = True
@@ -494,6 +546,7 @@ class DioptasModel(object):
         """
         working_directories = self.working_directories
         self.disconnect_models()
+        self._close_project_file()
         self.delete_configurations()
         self.configurations = [Configuration()]
         self.configuration_ind = 0
@@ -525,6 +578,7 @@ class DioptasModel(object):
         Performs tasks before multiple configuration load the next image. This is in particular to prevent multiple
         integrations, if only one is needed.
         """
+        self.load_pending_configurations()
         if self.combine_cakes:
             for configuration in self.configurations:
                 configuration.cake_changed.disconnect(self.calculate_combined_cake)
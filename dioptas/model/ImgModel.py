@@ -35,6 +35,7 @@ from .util.HelperModule import rotate_matrix_p90, rotate_matrix_m90, FileNameIte
 from .util.ImgCorrection import ImgCorrectionManager, ImgCorrectionInterface, TransferFunctionCorrection
 from .util.LambdaLoader import LambdaImage
 from .util.KaraboLoader import KaraboFile
+from .util.NeXusLoader import NeXusImage
 
 logger = logging.getLogger(__name__)
 
@@ -64,9 +65,8 @@ class ImgModel(object):
         self.series_max = 1
 
         self._img_data = None
-        self._img_data_background_subtracted = None
-        self._img_data_absorption_corrected = None
-        self._img_data_background_subtracted_absorption_corrected = None
+        # background subtracted and/or absorption corrected image, calculated when img_data is requested
+        self._compound_img_data = None
 
         self.background_filename = ''
         self._background_data = None
@@ -75,6 +75,13 @@ class ImgModel(object):
 
         self._factor = 1
 
+        # incremented whenever the image, background or correction data changes, but not for changes of the linear
+        # parameters (background scaling, background offset and factor)
+        self.img_data_version = 0
+        self._integration_dark = None
+        self._integration_dark_source = None
+        self._integration_dark_parameters = None
+
         self.transfer_correction = TransferFunctionCorrection()
 
         # anything that gets loaded from an image file and needs to be reset if a file without these attributes is
@@ -129,6 +136,23 @@ class ImgModel(object):
         self.filename = filename
 
         image_file_data = self.get_image_data(filename, pos)
+        self._set_image_file_data(filename, image_file_data, pos)
+
+    def load_series(self, filename, series_get_image, series_max, pos=0):
+        """
+        Loads an image of an image series, which is already opened, e.g. a file which is still being written by the
+        detector and can therefore not be opened again. The img_changed signal will be emitted after the process.
+        :param filename: path of the image file the series belongs to
+        :param series_get_image: function returning the image at a given position (starting from 0)
+        :param series_max: number of images in the series
+        :param pos: position of image in the series to be loaded
+        """
+        self.filename = str(filename)
+        self._set_image_file_data(self.filename, {"img_data": series_get_image(pos),
+                                                  "series_max": series_max,
+                                                  "series_get_image": series_get_image}, pos)
+
+    def _set_image_file_data(self, filename, image_file_data, pos):
         self.set_loadable_attributes(image_file_data)
 
         self.file_name_iterator.update_filename(filename)
@@ -149,7 +173,9 @@ class ImgModel(object):
         :return: dictionary containing all retrieved file information. Look at "loadable data" for possible key names.
                  Present key names depend on applied image loader
         """
-        img_loaders = [self.load_PIL, self.load_spe, self.load_fabio, self.load_lambda, self.load_karabo]
+        # lambda and NeXus series have to be tried before fabio, which would load only the first image of a series
+        img_loaders = [self.load_PIL, self.load_spe, self.load_lambda, self.load_nexus, self.load_fabio,
+                       self.load_karabo]
 
         for loader in img_loaders:
             data = loader(filename, pos)
@@ -239,6 +265,24 @@ class ImgModel(object):
                 "series_max": lambda_im.series_max,
                 "series_get_image": lambda_im.get_image}
 
+    def load_nexus(self, filename, pos=0):
+        """
+        Loads an image series from a HDF5/NeXus file, e.g. an Eiger master file with external data files.
+        :param filename: path to the master or NeXus file
+        :param pos: position of image in the image file to be loaded
+        :return: dictionary with img_data, series_max and series_get_image, None if unsuccessful
+        """
+        try:
+            nexus_im = NeXusImage(filename)
+        except IOError:
+            return None
+
+        if pos >= nexus_im.series_max:
+            return None
+        return {"img_data": nexus_im.get_image(pos),
+                "series_max": nexus_im.series_max,
+                "series_get_image": nexus_im.get_image}
+
     def load_karabo(self, filename, pos=0):
         """
         Loads an Imageseries created from within the karabo-framework at XFEL.
@@ -370,7 +414,7 @@ class ImgModel(object):
     @background_scaling.setter
     def background_scaling(self, new_value):
         self._background_scaling = new_value
-        self._calculate_img_data()
+        self._calculate_img_data(sources_changed=False)
         self.img_changed.emit()
 
     @property
@@ -380,7 +424,7 @@ class ImgModel(object):
     @background_offset.setter
     def background_offset(self, new_value):
         self._background_offset = new_value
-        self._calculate_img_data()
+        self._calculate_img_data(sources_changed=False)
         self.img_changed.emit()
 
     def load_series_img(self, pos):
@@ -460,11 +504,15 @@ class ImgModel(object):
             self.file_name_iterator.create_timed_file_list = True
             self.file_name_iterator.update_filename(self.filename)
 
-    def _calculate_img_data(self):
+    def _calculate_img_data(self, sources_changed=True):
         """
-        Calculates compound img_data based on the state of the object. This function is used internally to not compute
-        those img arrays every time somebody requests the image data by get_img_data() and img_data.
+        Invalidates the compound img_data based on the state of the object. It is calculated only when somebody
+        requests the image data by img_data, so that it is not computed for every image if nobody uses it (e.g. if the
+        background and corrections are applied by the integrator).
+        :param sources_changed: False if only background scaling or offset have changed
         """
+        if sources_changed:
+            self.img_data_version += 1
 
         # check that all data has the same dimensions
         if self._background_data is not None:
@@ -476,18 +524,16 @@ class ImgModel(object):
                 self.transfer_correction.reset()
                 self.corrections_removed.emit()
 
-        # calculate the current _img_data
+        self._compound_img_data = None
+
+    def _calculate_compound_img_data(self):
         if self._background_data is not None and not self._img_corrections.has_items():
-            self._img_data_background_subtracted = self._img_data - (self._background_scaling *
-                                                                     self._background_data +
-                                                                     self._background_offset)
+            return self._img_data - (self._background_scaling * self._background_data + self._background_offset)
         elif self._background_data is None and self._img_corrections.has_items():
-            self._img_data_absorption_corrected = self._img_data / self._img_corrections.get_data()
-
+            return self._img_data / self._img_corrections.get_data()
         elif self._background_data is not None and self._img_corrections.has_items():
-            self._img_data_background_subtracted_absorption_corrected = (self._img_data - (
-                    self._background_scaling * self._background_data + self._background_offset)) / \
-                                                                        self._img_corrections.get_data()
+            return (self._img_data - (self._background_scaling * self._background_data + self._background_offset)) / \
+                   self._img_corrections.get_data()
 
     @property
     def img_data(self):
@@ -500,14 +546,63 @@ class ImgModel(object):
         if self._background_data is None and not self._img_corrections.has_items():
             return self._img_data * self.factor
 
-        elif self._background_data is not None and not self._img_corrections.has_items():
-            return self._img_data_background_subtracted * self.factor
+        if self._compound_img_data is None:
+            self._compound_img_data = self._calculate_compound_img_data()
+        return self._compound_img_data * self.factor
 
-        elif self._background_data is None and self._img_corrections.has_items():
-            return self._img_data_absorption_corrected * self.factor
+    @property
+    def linear_components(self):
+        """
+        :return:
+            list of images which give img_data when multiplied with the linear_coefficients and summed up. The
+            components do not depend on background scaling, background offset and factor, thus anything linear
+            (e.g. an integration) can be calculated once for each component and combined for new parameters.
+        """
+        components = [self._img_data]
+        if self._background_data is not None:
+            components.extend([self._background_data, np.ones(self._img_data.shape)])
+        if self._img_corrections.has_items():
+            corrections = self._img_corrections.get_data()
+            components = [component / corrections for component in components]
+        return components
 
-        elif self._background_data is not None and self._img_corrections.has_items():
-            return self._img_data_background_subtracted_absorption_corrected * self.factor
+    @property
+    def integration_dark(self):
+        """
+        :return:
+            the scaled and offset background image, which can be subtracted by the integrator as dark image from the
+            raw_img_data, or None if no background is loaded. The array is cached until the background or its
+            parameters change.
+        """
+        if self._background_data is None:
+            return None
+        parameters = (self._background_scaling, self._background_offset)
+        if self._integration_dark_source is not self._background_data or \
+                self._integration_dark_parameters != parameters:
+            self._integration_dark = self._background_scaling * self._background_data + self._background_offset
+            self._integration_dark_source = self._background_data
+            self._integration_dark_parameters = parameters
+        return self._integration_dark
+
+    @property
+    def integration_flat(self):
+        """
+        :return:
+            the combined correction map, by which the background subtracted image can be divided by the integrator as
+            flat image, or None if no corrections are active.
+        """
+        if not self._img_corrections.has_items():
+            return None
+        return self._img_corrections.get_data()
+
+    @property
+    def linear_coefficients(self):
+        """
+        :return: list of coefficients for the linear_components
+        """
+        if self._background_data is None:
+            return [self.factor]
+        return [self.factor, -self.factor * self._background_scaling, -self.factor * self._background_offset]
 
     @property
     def raw_img_data(self):
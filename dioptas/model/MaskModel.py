@@ -18,19 +18,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from collections import deque
-
 import numpy as np
-import skimage.draw
 from PIL import Image
 from qtpy import QtCore
 from math import sqrt, atan2, cos, sin
 
-from .util.cosmics import cosmicsimage
+from .util.cosmics import find_cosmics
+from .util.MaskHistory import MaskHistory
 
 
 class MaskModel(object):
     def __init__(self, mask_dimension=(2048, 2048)):
+        self._roi = None
+        self._roi_mask = None
+        self._combined_mask = None  # cached combination of mask and roi mask
+
         self.mask_dimension = mask_dimension
         self.reset_dimension()
         self.filename = ''
@@ -38,8 +40,7 @@ class MaskModel(object):
         self.roi = None
 
         self._mask_data = np.zeros(self.mask_dimension, dtype=bool)
-        self._undo_deque = deque(maxlen=50)
-        self._redo_deque = deque(maxlen=50)
+        self._history = MaskHistory(max_steps=50)
 
     def set_dimension(self, mask_dimension):
         if not np.array_equal(mask_dimension, self.mask_dimension):
@@ -49,21 +50,37 @@ class MaskModel(object):
     def reset_dimension(self):
         if self.mask_dimension is not None:
             self._mask_data = np.zeros(self.mask_dimension, dtype=bool)
-            self._undo_deque = deque(maxlen=50)
-            self._redo_deque = deque(maxlen=50)
+            self._history = MaskHistory(max_steps=50)
+            self._roi_mask = None
+            self._mask_changed()
+
+    @property
+    def roi(self):
+        return self._roi
+
+    @roi.setter
+    def roi(self, roi):
+        self._roi = roi
+        self._roi_mask = None
+        self._mask_changed()
 
     @property
     def roi_mask(self):
+        """
+        Boolean mask of everything outside of the roi, it is only calculated once for every roi.
+        """
         if self.roi is not None:
-            roi_mask = np.ones(self.mask_dimension)
-            x1, x2, y1, y2 = self.roi
-            if x1 < 0:
-                x1 = 0
-            if y1 < 0:
-                y1 = 0
-            roi_mask[int(x1):int(x2), int(y1):int(y2)] = 0
-
-            return roi_mask
+            if self._roi_mask is None:
+                roi_mask = np.ones(self.mask_dimension, dtype=bool)
+                x1, x2, y1, y2 = self.roi
+                if x1 < 0:
+                    x1 = 0
+                if y1 < 0:
+                    y1 = 0
+                roi_mask[int(x1):int(x2), int(y1):int(y2)] = False
+                self._roi_mask = roi_mask
+
+            return self._roi_mask
 
         else:
             return None
@@ -72,35 +89,32 @@ class MaskModel(object):
         if self.roi is None:
             return self._mask_data
         elif self.roi is not None:
-            return np.logical_or(self._mask_data, self.roi_mask)
+            if self._combined_mask is None:
+                self._combined_mask = np.logical_or(self._mask_data, self.roi_mask)
+            return self._combined_mask
+
+    def _mask_changed(self):
+        self._combined_mask = None
 
     def get_img(self):
         return self._mask_data
 
     def update_deque(self):
         """
-        Saves the current mask data into a deque, which can be popped later
-        to provide an undo/redo feature.
+        Saves the current mask data into the undo history, which stores
+        compressed differences between the steps to provide an undo/redo feature.
         When performing a new action the old redo steps will be cleared..._
         """
-        self._undo_deque.append(np.copy(self._mask_data))
-        self._redo_deque.clear()
+        self._history.record(self._mask_data)
+        self._mask_changed()
 
     def undo(self):
-        try:
-            old_data = self._undo_deque.pop()
-            self._redo_deque.append(np.copy(self._mask_data))
-            self._mask_data = old_data
-        except IndexError:
-            pass
+        self._mask_data = self._history.undo(self._mask_data)
+        self._mask_changed()
 
     def redo(self):
-        try:
-            new_data = self._redo_deque.pop()
-            self._undo_deque.append(np.copy(self._mask_data))
-            self._mask_data = new_data
-        except IndexError:
-            pass
+        self._mask_data = self._history.redo(self._mask_data)
+        self._mask_changed()
 
     def mask_below_threshold(self, img_data, threshold):
         self.update_deque()
@@ -117,7 +131,6 @@ class MaskModel(object):
     def mask_QGraphicsPolygonItem(self, QGraphicsPolygonItem):
         """
         Masks a polygon given by a QGraphicsPolygonItem from the QtWidgets Library.
-        Uses the sklimage.draw.polygon function.
         """
 
         # get polygon points
@@ -133,7 +146,7 @@ class MaskModel(object):
     def mask_QGraphicsEllipseItem(self, QGraphicsEllipseItem):
         """
         Masks an Ellipse given by a QGraphicsEllipseItem from the QtWidgets
-        Library. Uses the skimage.draw.ellipse function.
+        Library.
         """
         bounding_rect = QGraphicsEllipseItem.rect()
         cx = bounding_rect.center().x()
@@ -172,37 +185,52 @@ class MaskModel(object):
     def mask_polygon(self, x, y):
         """
         Masks the a polygon with given vertices. x and y are lists of
-        the polygon vertices. Uses the draw.polygon implementation of
-        the skimage library.
+        the polygon vertices. Only the bounding box of the polygon is
+        rasterized, see rasterize_polygon.
         """
         self.update_deque()
-        rr, cc = skimage.draw.polygon(y, x, self._mask_data.shape)
-        self._mask_data[rr, cc] = self.mode
+        region = rasterize_polygon(y, x, self._mask_data.shape)
+        if region is not None:
+            rows, cols, inside = region
+            self._mask_data[rows, cols][inside] = self.mode
 
     def mask_ellipse(self, cx, cy, x_radius, y_radius):
         """
         Masks an ellipse with center coordinates (cx, cy) and the radii
-        given. Uses the draw.ellipse implementation of
-        the skimage library.
+        given. Only the bounding box of the ellipse is rasterized, see
+        rasterize_ellipse.
         """
         self.update_deque()
-        rr, cc = skimage.draw.ellipse(
-            cy, cx, y_radius, x_radius, shape=self._mask_data.shape)
-        self._mask_data[rr, cc] = self.mode
+        region = rasterize_ellipse(cy, cx, y_radius, x_radius, self._mask_data.shape)
+        if region is not None:
+            rows, cols, inside = region
+            self._mask_data[rows, cols][inside] = self.mode
 
     def grow(self):
+        """
+        Grows the mask by one pixel in every direction (including diagonals). Rows and columns are processed
+        separately with shifted in-place operations, which is considerably faster than scipy.ndimage morphology.
+        """
         self.update_deque()
-        self._mask_data[1:, :] = np.logical_or(self._mask_data[1:, :], self._mask_data[:-1, :])
-        self._mask_data[:-1, :] = np.logical_or(self._mask_data[:-1, :], self._mask_data[1:, :])
-        self._mask_data[:, 1:] = np.logical_or(self._mask_data[:, 1:], self._mask_data[:, :-1])
-        self._mask_data[:, :-1] = np.logical_or(self._mask_data[:, :-1], self._mask_data[:, 1:])
+        rows_grown = self._mask_data.copy()
+        rows_grown[1:, :] |= self._mask_data[:-1, :]
+        rows_grown[:-1, :] |= self._mask_data[1:, :]
+        self._mask_data[...] = rows_grown
+        self._mask_data[:, 1:] |= rows_grown[:, :-1]
+        self._mask_data[:, :-1] |= rows_grown[:, 1:]
 
     def shrink(self):
+        """
+        Shrinks the mask by one pixel in every direction (including diagonals), pixels at the border of the image are
+        only compared to their neighbours within the image.
+        """
         self.update_deque()
-        self._mask_data[1:, :] = np.logical_and(self._mask_data[1:, :], self._mask_data[:-1, :])
-        self._mask_data[:-1, :] = np.logical_and(self._mask_data[:-1, :], self._mask_data[1:, :])
-        self._mask_data[:, 1:] = np.logical_and(self._mask_data[:, 1:], self._mask_data[:, :-1])
-        self._mask_data[:, :-1] = np.logical_and(self._mask_data[:, :-1], self._mask_data[:, 1:])
+        rows_shrunk = self._mask_data.copy()
+        rows_shrunk[1:, :] &= self._mask_data[:-1, :]
+        rows_shrunk[:-1, :] &= self._mask_data[1:, :]
+        self._mask_data[...] = rows_shrunk
+        self._mask_data[:, 1:] &= rows_shrunk[:, :-1]
+        self._mask_data[:, :-1] &= rows_shrunk[:, 1:]
 
     def invert_mask(self):
         self.update_deque()
@@ -214,12 +242,8 @@ class MaskModel(object):
 
     def remove_cosmic(self, img):
         self.update_deque()
-        test = cosmicsimage(img, sigclip=3.0, objlim=3.0)
-        num = 2
-        for i in range(num):
-            test.lacosmiciteration(True)
-            test.clean()
-            self._mask_data = np.logical_or(self._mask_data, np.array(test.mask, dtype='bool'))
+        cosmics = find_cosmics(img, sigclip=3.0, objlim=3.0, iterations=2)
+        self._mask_data = np.logical_or(self._mask_data, cosmics)
 
     def set_mode(self, mode):
         """
@@ -229,7 +253,7 @@ class MaskModel(object):
 
     def set_mask(self, mask_data):
         self.update_deque()
-        self._mask_data = mask_data
+        self._mask_data = np.asarray(mask_data, dtype=bool)
 
     def save_mask(self, filename):
         im_array = np.int8(self.get_img())
@@ -327,3 +351,79 @@ class MaskModel(object):
             yn = p0.y() + (r - width) * sin(phi)
             p.append(QtCore.QPointF(xn, yn))
         return p
+
+
+def rasterize_polygon(r, c, shape):
+    """
+    Rasterizes a polygon by scanlines within its bounding box. For every row the crossings with the polygon edges are
+    calculated at once and the pixels between pairs of crossings are filled (even-odd rule). Pixels are inside if
+    their center is inside the polygon or on its boundary, same as in skimage.draw.polygon.
+
+    :param r: row coordinates of the vertices
+    :param c: column coordinates of the vertices
+    :param shape: shape of the image
+    :return: (row slice, column slice, boolean array of the pixels inside the polygon within these slices) or None if
+             the polygon is outside of the image
+    """
+    r = np.asarray(r, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    row_start, row_stop = max(0, int(np.ceil(r.min()))), min(shape[0], int(np.floor(r.max())) + 1)
+    col_start, col_stop = max(0, int(np.ceil(c.min()))), min(shape[1], int(np.floor(c.max())) + 1)
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+
+    # crossings of every scanline with every edge, edges are half-open in row direction
+    rows = np.arange(row_start, row_stop, dtype=np.float64)[:, None]
+    r_next, c_next = np.roll(r, -1), np.roll(c, -1)
+    crossing = (r <= rows) != (r_next <= rows)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_c = c + (rows - r) * (c_next - c) / (r_next - r)
+    crossing_c = np.sort(np.where(crossing, crossing_c, np.inf), axis=1)
+
+    num_pairs = len(r) // 2
+    starts = [np.ceil(crossing_c[:, 0:2 * num_pairs:2])]
+    stops = [np.floor(crossing_c[:, 1:2 * num_pairs:2]) + 1]
+
+    # pixels whose center lies exactly on an edge (e.g. for integer vertices) are inside as well
+    on_edge = (np.minimum(r, r_next) <= rows) & (rows <= np.maximum(r, r_next))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        edge_c = np.where(r == r_next, np.minimum(c, c_next), c + (rows - r) * (c_next - c) / (r_next - r))
+    edge_c_stop = np.where(r == r_next, np.maximum(c, c_next), edge_c)
+    starts.append(np.where(on_edge, np.ceil(edge_c), np.inf))
+    stops.append(np.where(on_edge, np.floor(edge_c_stop) + 1, np.inf))
+
+    width = col_stop - col_start
+    starts = np.clip(np.hstack(starts) - col_start, 0, width)
+    stops = np.clip(np.hstack(stops) - col_start, 0, width)
+    filled = starts < stops
+
+    # every filled span adds 1 at its start and subtracts 1 after its end, the cumulative sum is >0 inside
+    # (crossing spans do not overlap and only few edges can meet in a pixel, so int8 is sufficient)
+    span_changes = np.zeros((len(rows), width + 1), dtype=np.int8)
+    span_rows = np.nonzero(filled)[0]
+    np.add.at(span_changes, (span_rows, starts[filled].astype(int)), 1)
+    np.add.at(span_changes, (span_rows, stops[filled].astype(int)), -1)
+    inside = np.cumsum(span_changes[:, :-1], axis=1, dtype=np.int8) > 0
+
+    return slice(row_start, row_stop), slice(col_start, col_stop), inside
+
+
+def rasterize_ellipse(r, c, r_radius, c_radius, shape):
+    """
+    Rasterizes an axis aligned ellipse within its bounding box, same pixels as in skimage.draw.ellipse.
+
+    :return: (row slice, column slice, boolean array of the pixels inside the ellipse within these slices) or None if
+             the ellipse is outside of the image
+    """
+    r_radius, c_radius = abs(r_radius), abs(c_radius)
+    row_start, row_stop = max(0, int(np.ceil(r - r_radius))), min(shape[0], int(np.floor(r + r_radius)) + 1)
+    col_start, col_stop = max(0, int(np.ceil(c - c_radius))), min(shape[1], int(np.floor(c + c_radius)) + 1)
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+
+    rows = np.arange(row_start, row_stop, dtype=np.float64)[:, None] - r
+    cols = np.arange(col_start, col_stop, dtype=np.float64)[None, :] - c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inside = (rows / r_radius) ** 2 + (cols / c_radius) ** 2 < 1
+
+    return slice(row_start, row_stop), slice(col_start, col_stop), inside
@@ -20,10 +20,10 @@
 
 import logging
 
-from math import sqrt
 from .util import Signal
 from .util.HelperModule import FileNameIterator, get_base_name
 from .util import Pattern
+from .util.PatternWriter import PatternWriter, write_pattern
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +48,7 @@ class PatternModel(object):
         self.file_name_iterator = FileNameIterator()
 
         self._background_pattern = None
+        self.pattern_writer = PatternWriter()
 
         self.pattern_changed = Signal()
 
@@ -80,89 +81,36 @@ class PatternModel(object):
         self.file_name_iterator.update_filename(filename)
         self.pattern_changed.emit()
 
-    def save_pattern(self, filename, header=None, subtract_background=False):
+    def save_pattern(self, filename, header=None, subtract_background=False, asynchronous=False):
         """
         Saves the current data pattern.
         :param filename: where to save
         :param header: you can specify any specific header
         :param subtract_background: whether or not the background set will be used for saving or not
+        :param asynchronous: if True, the file is written in a background thread by the pattern_writer, use
+                             pattern_writer.flush() to wait for it
         """
         if subtract_background:
             x, y = self.pattern.data
         else:
             x, y = self.pattern._original_x, self.pattern._original_y
+        self._write_pattern(filename, x, y, header, asynchronous)
 
-        file_handle = open(filename, 'w')
-        num_points = len(x)
-
-        if filename.endswith('.chi'):
-            if header is None or header == '':
-                file_handle.write(filename + '\n')
-                file_handle.write(self.unit + '\n\n')
-                file_handle.write("       {0}\n".format(num_points))
-            else:
-                file_handle.write(header)
-            for ind in range(num_points):
-                file_handle.write(' {0:.7E}  {1:.7E}\n'.format(x[ind], y[ind]))
-        elif filename.endswith('.fxye'):
-            factor = 100
-            if 'CONQ' in header:
-                factor = 1
-            header = header.replace('NUM_POINTS', '{0:.6g}'.format(num_points))
-            header = header.replace('MIN_X_VAL', '{0:.6g}'.format(factor * x[0]))
-            header = header.replace('STEP_X_VAL', '{0:.6g}'.format(factor * (x[1] - x[0])))
-
-            file_handle.write(header)
-            file_handle.write('\n')
-            for ind in range(num_points):
-                file_handle.write('\t{0:.6g}\t{1:.6g}\t{2:.6g}\n'.format(factor * x[ind], y[ind], sqrt(abs(y[ind]))))
-        else:
-            if header is not None:
-                file_handle.write(header)
-                file_handle.write('\n')
-            for ind in range(num_points):
-                file_handle.write('{0:.9E}  {1:.9E}\n'.format(x[ind], y[ind]))
-        file_handle.close()
-
-    def save_background_as_pattern(self, filename, header=None):
+    def save_background_as_pattern(self, filename, header=None, asynchronous=False):
         """
                 Saves the current data pattern.
                 :param filename: where to save
                 :param header: you can specify any specific header
+                :param asynchronous: if True, the file is written in a background thread by the pattern_writer
         """
         x, y = self.pattern.auto_background_pattern.data
+        self._write_pattern(filename, x, y, header, asynchronous)
 
-        file_handle = open(filename, 'w')
-        num_points = len(x)
-
-        if filename.endswith('.chi'):
-            if header is None or header == '':
-                file_handle.write(filename + '\n')
-                file_handle.write(self.unit + '\n\n')
-                file_handle.write("       {0}\n".format(num_points))
-            else:
-                file_handle.write(header)
-            for ind in range(num_points):
-                file_handle.write(' {0:.7E}  {1:.7E}\n'.format(x[ind], y[ind]))
-        elif filename.endswith('.fxye'):
-            factor = 100
-            if 'CONQ' in header:
-                factor = 1
-            header = header.replace('NUM_POINTS', '{0:.6g}'.format(num_points))
-            header = header.replace('MIN_X_VAL', '{0:.6g}'.format(factor * x[0]))
-            header = header.replace('STEP_X_VAL', '{0:.6g}'.format(factor * (x[1] - x[0])))
-
-            file_handle.write(header)
-            file_handle.write('\n')
-            for ind in range(num_points):
-                file_handle.write('\t{0:.6g}\t{1:.6g}\t{2:.6g}\n'.format(factor * x[ind], y[ind], sqrt(abs(y[ind]))))
+    def _write_pattern(self, filename, x, y, header, asynchronous):
+        if asynchronous:
+            self.pattern_writer.write(filename, x, y, header, self.unit)
         else:
-            if header is not None:
-                file_handle.write(header)
-                file_handle.write('\n')
-            for ind in range(num_points):
-                file_handle.write('{0:.9E}  {1:.9E}\n'.format(x[ind], y[ind]))
-        file_handle.close()
+            write_pattern(filename, x, y, header, self.unit)
 
     def get_pattern(self):
         return self.pattern
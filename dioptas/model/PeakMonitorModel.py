@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+
+import numpy as np
+from qtpy import QtCore
+
+PeakWindow = namedtuple('PeakWindow', ['name', 'tth_min', 'tth_max', 'azi_min', 'azi_max'])
+
+
+class PeakMonitorModel(QtCore.QObject):
+    """
+    Follows the summed intensity of a few 2theta/azimuth windows over a series of raw frames. The pixels of all windows
+    and their weights (solid angle and polarization correction) are determined once from the calibration geometry,
+    afterwards every frame is evaluated by gathering only these pixels, which is much cheaper than integrating the
+    whole image.
+
+    While the monitor is running every new image of the ImgModel is evaluated, the values are collected in a time
+    series and optionally appended to a text file. If suspend_integration is set, the Configuration does not integrate
+    the new images while the monitor is running. If images were skipped this way, integration_resumed is emitted when
+    the monitor is stopped or the suspension is switched off, so that the current image is integrated again.
+    """
+
+    values_changed = QtCore.Signal()
+    windows_changed = QtCore.Signal()
+    integration_resumed = QtCore.Signal()
+
+    def __init__(self, calibration_model, mask_model):
+        super(PeakMonitorModel, self).__init__()
+        self.calibration_model = calibration_model
+        self.mask_model = mask_model
+
+        self.windows = []
+        self.frames = []
+        self._values = []
+
+        self.running = False
+        self._suspend_integration = True
+        self._integration_skipped = False
+        self.filename = None
+        self._file = None
+        self._mask = None
+
+        # precomputed pixel selection of the windows (see _prepare_selection)
+        self._selection_key = None
+        self._pixel_indices = None
+        self._pixel_weights = None
+        self._pixel_windows = None
+
+    @property
+    def suspend_integration(self):
+        return self._suspend_integration
+
+    @suspend_integration.setter
+    def suspend_integration(self, value):
+        self._suspend_integration = value
+        if not value:
+            self._resume_integration()
+
+    def _resume_integration(self):
+        if self._integration_skipped:
+            self._integration_skipped = False
+            self.integration_resumed.emit()
+
+    def add_window(self, name, tth_min, tth_max, azi_min=None, azi_max=None):
+        """
+        Adds a window, which is summed up for every frame.
+        :param tth_min, tth_max: 2theta range in degree
+        :param azi_min, azi_max: azimuthal range in degree (-180 to 180), if azi_min > azi_max the window crosses
+                                 +-180 degree, if None the full azimuth is used
+        """
+        self.windows.append(PeakWindow(name, *sorted((tth_min, tth_max)), azi_min, azi_max))
+        self._windows_changed()
+
+    def remove_window(self, ind):
+        del self.windows[ind]
+        self._windows_changed()
+
+    def _windows_changed(self):
+        """
+        The time series is restarted, since the values of the previous frames do not belong to the new windows.
+        """
+        self._selection_key = None
+        self.frames = []
+        self._values = []
+        if self._file is not None:
+            self._write_header()
+        self.windows_changed.emit()
+
+    def _write_header(self):
+        self._file.write('# frame\tfile\t' + '\t'.join(window.name for window in self.windows) + '\n')
+
+    @property
+    def values(self):
+        """
+        :return: summed intensities with shape (number of frames, number of windows)
+        """
+        if not self._values:
+            return np.zeros((0, len(self.windows)))
+        return np.array(self._values)
+
+    def clear(self):
+        self.frames = []
+        self._values = []
+        self.values_changed.emit()
+
+    def _get_selection_key(self, shape):
+        geometry = self.calibration_model.pattern_geometry
+        return (id(geometry.detector), tuple(geometry.getPyFAI().items()), shape,
+                self.calibration_model.supersampling_factor, self.calibration_model.polarization_factor,
+                self.calibration_model.correct_solid_angle)
+
+    def _prepare_selection(self, shape):
+        """
+        Determines the pixel indices of all windows, their weights and the window they belong to.
+        """
+        geometry = self.calibration_model.pattern_geometry
+        factor = self.calibration_model.supersampling_factor
+        geometry_shape = (shape[0] * factor, shape[1] * factor)
+        tth = np.degrees(geometry.twoThetaArray(geometry_shape)[::factor, ::factor]).ravel()
+        chi = np.degrees(geometry.chiArray(geometry_shape)[::factor, ::factor]).ravel()
+
+        weights = geometry.polarization(geometry_shape, self.calibration_model.polarization_factor)
+        if self.calibration_model.correct_solid_angle:
+            weights = weights * geometry.solidAngleArray(geometry_shape)
+        weights = 1.0 / weights[::factor, ::factor].ravel()
+
+        valid = np.ones(tth.size, dtype=bool)
+        if self._mask is not None and self._mask.shape == tuple(shape):
+            valid = np.logical_not(self._mask.ravel())
+
+        indices = []
+        window_ids = []
+        for ind, window in enumerate(self.windows):
+            selection = valid & (tth >= window.tth_min) & (tth < window.tth_max)
+            if window.azi_min is not None and window.azi_max is not None:
+                if window.azi_min <= window.azi_max:
+                    selection &= (chi >= window.azi_min) & (chi < window.azi_max)
+                else:
+                    selection &= (chi >= window.azi_min) | (chi < window.azi_max)
+            window_indices = np.flatnonzero(selection)
+            indices.append(window_indices)
+            window_ids.append(np.full(window_indices.size, ind))
+
+        self._pixel_indices = np.concatenate(indices) if indices else np.zeros(0, dtype=int)
+        self._pixel_windows = np.concatenate(window_ids) if window_ids else np.zeros(0, dtype=int)
+        self._pixel_weights = weights[self._pixel_indices].astype(np.float64)
+
+    def evaluate(self, img_data):
+        """
+        Sums up the (solid angle and polarization corrected) intensities of all windows.
+        :return: array with one value per window
+        """
+        key = self._get_selection_key(img_data.shape)
+        if key != self._selection_key:
+            self._prepare_selection(img_data.shape)
+            self._selection_key = key
+        gathered = np.ravel(img_data)[self._pixel_indices] * self._pixel_weights
+        return np.bincount(self._pixel_windows, weights=gathered, minlength=len(self.windows))
+
+    def start(self, filename=None):
+        """
+        Starts monitoring the images loaded into the ImgModel.
+        :param filename: optional text file, to which the values of every frame are appended
+        """
+        if self.running:
+            self.stop()
+        self._mask = np.copy(self.mask_model.get_mask()) if self.mask_model.mode else None
+        self._selection_key = None
+
+        self.filename = filename
+        if filename is not None:
+            self._file = open(filename, 'a')
+            self._write_header()
+
+        self.calibration_model.img_model.img_changed.connect(self.process_img)
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.calibration_model.img_model.img_changed.disconnect(self.process_img)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.running = False
+        self._resume_integration()
+
+    def process_img(self):
+        """
+        Evaluates the current raw image of the ImgModel and appends the values to the time series.
+        """
+        if self.suspend_integration:
+            self._integration_skipped = True
+        img_model = self.calibration_model.img_model
+        if not self.calibration_model.is_calibrated or img_model.raw_img_data is None:
+            return
+        values = self.evaluate(img_model.raw_img_data)
+        frame = (img_model.filename, img_model.series_pos)
+        self.frames.append(frame)
+        self._values.append(values)
+
+        if self._file is not None:
+            self._file.write('{}\t{}:{}\t'.format(len(self.frames) - 1, *frame) +
+                             '\t'.join('{:.6g}'.format(value) for value in values) + '\n')
+            self._file.flush()
+        self.values_changed.emit()
@@ -22,8 +22,7 @@ import numpy as np
 
 from .util import Signal
 from .util.jcpds import jcpds, jcpds_reflection
-from .util.cif import CifConverter
-from .util.HelperModule import calculate_color
+from .util.HelperModule import calculate_color, get_partial_indices
 
 
 class PhaseLoadError(Exception):
@@ -43,6 +42,7 @@ class PhaseModel(object):
         super(PhaseModel, self).__init__()
         self.phases = []  # type: list[jcpds]
         self.reflections = []
+        self._line_indices_cache = []
         self.phase_files = []
         self.phase_colors = []
         self.phase_visible = []
@@ -78,6 +78,8 @@ class PhaseModel(object):
         :param intensity_cutoff: all reflections added to the jcpds will have larger intensity in % (0-100)
         :param minimum_d_spacing: all reflections added to the jcpds will have larger d spacing than specified here
         """
+        from .util.cif import CifConverter  # imported on demand, PyCifRW is slow to import
+
         try:
             cif_converter = CifConverter(0.31, minimum_d_spacing, intensity_cutoff)
             jcpds_object = cif_converter.convert_cif_to_jcpds(filename)
@@ -95,6 +97,7 @@ class PhaseModel(object):
         """
         self.phases.append(jcpds_object)
         self.reflections.append([])
+        self._line_indices_cache.append(None)
         self.phase_colors.append(calculate_color(PhaseModel.num_phases + 9))
         self.phase_visible.append(True)
         PhaseModel.num_phases += 1
@@ -119,6 +122,7 @@ class PhaseModel(object):
         """
         del self.phases[ind]
         del self.reflections[ind]
+        del self._line_indices_cache[ind]
         del self.phase_files[ind]
         del self.phase_colors[ind]
         del self.phase_visible[ind]
@@ -130,7 +134,7 @@ class PhaseModel(object):
         """
         self.clear_reflections(ind)
         self.phases[ind].reload_file()
-        for _ in range(len(self.phases[ind].reflections)):
+        for _ in range(len(self.phases[ind].reflection_data)):
             self.reflection_added.emit(ind)
         self.get_lines_d(ind)
         self.phase_changed.emit(ind)
@@ -208,17 +212,29 @@ class PhaseModel(object):
         """
         Gets the reflections from the phase with index ind and saves them in a two-dimensional array.
         """
-        reflections = self.phases[ind].get_reflections()
-        res = np.zeros((len(reflections), 5))
-        for i, reflection in enumerate(reflections):
-            res[i, 0] = reflection.d
-            res[i, 1] = reflection.intensity
-            res[i, 2] = reflection.h
-            res[i, 3] = reflection.k
-            res[i, 4] = reflection.l
+        reflection_data = self.phases[ind].reflection_data
+        res = np.zeros((len(reflection_data), 5))
+        res[:, 0] = reflection_data['d']
+        res[:, 1] = reflection_data['intensity']
+        res[:, 2] = reflection_data['h']
+        res[:, 3] = reflection_data['k']
+        res[:, 4] = reflection_data['l']
         self.reflections[ind] = res
+        self._line_indices_cache[ind] = None
         return res
 
+    def get_lines_d_for_conditions(self, ind, pressures, temperatures=None):
+        """
+        Calculates the d spacings of the reflections of the phase with index ind for many pressures and temperatures,
+        e.g. one condition for every pattern of a batch. The current state of the phase is not changed and no signals
+        are emitted.
+        :param ind: phase index
+        :param pressures: pressures in GPa, scalar or array
+        :param temperatures: temperatures in K, scalar or array. If None, the current temperature of the phase is used.
+        :return: d spacing array with shape (number of conditions, number of reflections)
+        """
+        return self.phases[ind].compute_d_spacings(pressures, temperatures)
+
     def get_phase_line_positions(self, ind, unit, wavelength):
         """
         Gets the line positions of phase with index ind in a specfic unit.
@@ -235,6 +251,25 @@ class PhaseModel(object):
                             np.sin(positions / 360 * np.pi)
         return positions
 
+    def get_phase_line_indices(self, ind, tth_binning, wavelength):
+        """
+        Maps the line positions of the phase with index ind onto a two theta binning (e.g. of the cake or the batch
+        view). The result is cached until the binning, the wavelength or the lines of the phase change.
+        :param ind: phase index
+        :param tth_binning: monotonically increasing two theta array in degree
+        :param wavelength: wavelength in Angstrom
+        :return: partial indices of the lines in the binning (NaN for lines outside), line intensities
+        """
+        cache = self._line_indices_cache[ind]
+        if cache is not None and cache[1] == wavelength and np.array_equal(cache[0], tth_binning):
+            return cache[2], cache[3]
+
+        positions = self.get_phase_line_positions(ind, 'tth', wavelength)
+        line_indices = get_partial_indices(tth_binning, positions)
+        intensities = self.reflections[ind][:, 1]
+        self._line_indices_cache[ind] = (np.array(tth_binning), wavelength, line_indices, intensities)
+        return line_indices, intensities
+
     def get_phase_line_intensities(self, ind, positions, pattern, x_range, y_range):
         """
         Gets the phase line intensities scaled to each other for a specific x and y range and also a maximum intensity
@@ -321,7 +356,7 @@ class PhaseModel(object):
         """
         Deletes all reflections from a phase with index phase_ind
         """
-        for ind in range(len(self.phases[phase_ind].reflections)):
+        for ind in range(len(self.phases[phase_ind].reflection_data)):
             self.delete_reflection(phase_ind, 0)
 
     def update_reflection(self, phase_ind, reflection_ind, reflection):
@@ -332,8 +367,7 @@ class PhaseModel(object):
         :param reflection: updated reflection
         :type reflection: jcpds_reflection
         """
-        self.phases[phase_ind].reflections[reflection_ind] = reflection
-        self.phases[phase_ind].params['modified'] = True
+        self.phases[phase_ind].set_reflection(reflection_ind, reflection)
         self.phases[phase_ind].compute_d0()
         self.phases[phase_ind].compute_d()
         self.get_lines_d(phase_ind)
@@ -25,3 +25,4 @@ from .PhaseModel import PhaseModel
 from .PatternModel import PatternModel
 from .OverlayModel import OverlayModel
 from .BatchModel import BatchModel
+from .PeakMonitorModel import PeakMonitorModel
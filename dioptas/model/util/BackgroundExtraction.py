@@ -24,23 +24,37 @@ logger = logging.getLogger(__name__)
 
 import numpy as np
 
-try:
-    from .smooth_bruckner import smooth_bruckner
-except ImportError:
+_smooth_bruckner = None
+
+
+def get_smooth_bruckner():
+    """
+    Returns the fastest available implementation of the bruckner smoothing. The search is done on the first call and
+    not during import, because building the Cython version with pyximport can take several seconds.
+    """
+    global _smooth_bruckner
+    if _smooth_bruckner is not None:
+        return _smooth_bruckner
+
     try:
-        from .smooth_bruckner_cython import smooth_bruckner
+        from .smooth_bruckner import smooth_bruckner
     except ImportError:
         try:
-            import pyximport
-            pyximport.install(language_level=3)
             from .smooth_bruckner_cython import smooth_bruckner
-        except ImportError as e:
-            print(e)
-            logger.warning(
-                "Could not import the Fortran or Cython version of smooth_bruckner. Using python implementation instead. Please"
-                " run 'f2py -c -m smooth_bruckner smooth_bruckner.f95' in the model/util folder for faster"
-                " implementation")
-            from .smooth_bruckner_python import smooth_bruckner
+        except ImportError:
+            try:
+                import pyximport
+                pyximport.install(language_level=3)
+                from .smooth_bruckner_cython import smooth_bruckner
+            except ImportError as e:
+                print(e)
+                logger.warning(
+                    "Could not import the Fortran or Cython version of smooth_bruckner. Using python implementation instead. Please"
+                    " run 'f2py -c -m smooth_bruckner smooth_bruckner.f95' in the model/util folder for faster"
+                    " implementation")
+                from .smooth_bruckner_python import smooth_bruckner
+    _smooth_bruckner = smooth_bruckner
+    return _smooth_bruckner
 
 
 def extract_background(x, y, smooth_width=0.1, iterations=50, cheb_order=50):
@@ -56,7 +70,7 @@ def extract_background(x, y, smooth_width=0.1, iterations=50, cheb_order=50):
     """
     smooth_points = int((float(smooth_width) / (x[1] - x[0])))
 
-    y_smooth = smooth_bruckner(y, smooth_points, iterations)
+    y_smooth = get_smooth_bruckner()(y, smooth_points, iterations)
     # get cheb input parameters
     x_cheb = 2. * (x - x[0]) / (x[-1] - x[0]) - 1.
     cheb_parameters = np.polynomial.chebyshev.chebfit(x_cheb,
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import numpy as np
+
+CAKE_STACK_GROUP = 'cakes'
+
+
+class CakeStackWriter(object):
+    """
+    Writes the cakes of a batch integration into an (n_frames, n_azi, n_rad) dataset of a hdf5 file. Every cake is one
+    deflate compressed chunk. The compression runs on a thread pool (zlib releases the GIL), so that it overlaps with
+    the integration of the next frames, the compressed chunks are written directly into the file in frame order.
+
+    The group containing the stack is a NXdata group with the datasets 'data', 'azimuth' and 'binning'.
+    """
+
+    def __init__(self, filename, num_frames, compression_level=4, max_workers=None):
+        """
+        :param filename: hdf5 file, an existing file is overwritten
+        :param num_frames: maximum number of frames, the dataset is shrunk on close if fewer cakes were added
+        :param compression_level: deflate level (0-9)
+        :param max_workers: number of compression threads, defaults to the number of cpus
+        """
+        if os.path.dirname(filename) != '':
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.filename = filename
+        self.num_frames = num_frames
+        self.compression_level = compression_level
+        self.num_written = 0
+
+        self._file = h5py.File(filename, mode='w')
+        self._group = self._file.create_group(CAKE_STACK_GROUP)
+        self._group.attrs['NX_class'] = 'NXdata'
+        self._group.attrs['signal'] = 'data'
+        self._group.attrs['axes'] = ['.', 'azimuth', 'binning']
+        self._dataset = None
+
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._pending = deque()
+
+    def add(self, index, cake):
+        """
+        Adds the cake of a frame to the stack. The cake is copied, so the array can be changed afterwards.
+        :param index: frame index in the stack
+        :param cake: 2D array (n_azi, n_rad), all cakes need to have the same shape
+        """
+        cake = np.array(cake, dtype=np.float32, order='C')
+        if self._dataset is None:
+            self._dataset = self._group.create_dataset('data', shape=(self.num_frames,) + cake.shape,
+                                                       maxshape=(None,) + cake.shape,
+                                                       chunks=(1,) + cake.shape, dtype=np.float32,
+                                                       compression='gzip', compression_opts=self.compression_level)
+        self._pending.append((index, self._executor.submit(zlib.compress, cake.tobytes(),
+                                                           self.compression_level)))
+        # limit the number of uncompressed cakes held in memory
+        while len(self._pending) > 2 * self._max_workers:
+            self._write_oldest()
+
+    def _write_oldest(self):
+        index, future = self._pending.popleft()
+        self._dataset.id.write_direct_chunk((index, 0, 0), future.result())
+        self.num_written = max(self.num_written, index + 1)
+
+    def close(self, binning=None, azimuth=None):
+        """
+        Writes the remaining cakes and the axes and closes the file.
+        :param binning: radial bin centers of the cakes
+        :param azimuth: azimuthal bin centers of the cakes
+        """
+        while self._pending:
+            self._write_oldest()
+        self._executor.shutdown()
+
+        if self._dataset is not None and self.num_written < self.num_frames:
+            self._dataset.resize(self.num_written, axis=0)
+        if azimuth is not None:
+            azimuth = self._group.create_dataset('azimuth', data=azimuth)
+            azimuth.attrs['unit'] = 'deg'
+            azimuth.attrs['long_name'] = 'azimuth (degrees)'
+        if binning is not None:
+            binning = self._group.create_dataset('binning', data=binning)
+            binning.attrs['unit'] = 'deg'
+            binning.attrs['long_name'] = 'two_theta (degrees)'
+        self._file.close()
+
+
+def read_cake(filename, index):
+    """
+    Reads a single cake from a cake stack file, only the chunk of this frame is read and decompressed.
+    :return: cake, binning, azimuth
+    """
+    with h5py.File(filename, mode='r') as f:
+        group = f[CAKE_STACK_GROUP]
+        return group['data'][index], group['binning'][()], group['azimuth'][()]
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Scalar reductions of single frames, which are evaluated by the batch integration while the frame is in memory (see
+BatchModel.reductions). A reduction is any callable taking the raw image, the binning (2theta in degrees) and the
+intensity of the integrated pattern and returning a number.
+"""
+
+import numpy as np
+
+
+def total_counts(img_data, binning, intensity):
+    return np.sum(img_data, dtype=np.float64)
+
+
+def max_pixel(img_data, binning, intensity):
+    return np.max(img_data)
+
+
+class SaturatedPixels(object):
+    """
+    Counts the pixels with an intensity equal or above the saturation threshold.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def __call__(self, img_data, binning, intensity):
+        return np.count_nonzero(img_data >= self.threshold)
+
+
+class RoiSum(object):
+    """
+    Sums up the intensity of a rectangular region of the image, given by the row and column ranges (end exclusive).
+    """
+
+    def __init__(self, row_min, row_max, col_min, col_max):
+        self.row_min, self.row_max = int(row_min), int(row_max)
+        self.col_min, self.col_max = int(col_min), int(col_max)
+
+    def __call__(self, img_data, binning, intensity):
+        return np.sum(img_data[self.row_min:self.row_max, self.col_min:self.col_max], dtype=np.float64)
+
+
+class PeakIntegral(object):
+    """
+    Integrates the pattern between tth_min and tth_max (in degrees).
+    """
+
+    def __init__(self, tth_min, tth_max):
+        self.tth_min, self.tth_max = sorted((tth_min, tth_max))
+
+    def __call__(self, img_data, binning, intensity):
+        start, stop = np.searchsorted(binning, (self.tth_min, self.tth_max))
+        return np.trapz(intensity[start:stop], binning[start:stop])
+
+
+default_reductions = {
+    'total_counts': total_counts,
+    'max_pixel': max_pixel,
+}
@@ -315,6 +315,26 @@ def get_partial_index(array, value):
     return new_pos
 
 
+def get_partial_indices(array, values):
+    """
+    Vectorized version of get_partial_index for a monotonically increasing array. All values are located with a single
+    np.searchsorted call.
+    :param array: monotonically increasing numpy array
+    :param values: values for which to get the indices
+    :return: array of partial indices, NaN for values outside of the array range
+    """
+    array = np.asarray(array)
+    values = np.asarray(values, dtype=float)
+    upper_ind = np.searchsorted(array, values, side='left')
+    valid = (upper_ind > 0) & (upper_ind < len(array))
+
+    partial_indices = np.full(values.shape, np.nan)
+    lower_ind = upper_ind[valid] - 1
+    lower_values = array[lower_ind]
+    partial_indices[valid] = lower_ind + (values[valid] - lower_values) / (array[lower_ind + 1] - lower_values)
+    return partial_indices
+
+
 def get_partial_value(array, ind):
     """
     Calculates the value for a non-integer array from an array using linear interpolation.
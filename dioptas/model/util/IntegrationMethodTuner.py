@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import json
+import logging
+import os
+import time
+
+import pyFAI.azimuthalIntegrator  # registers the available integration engines
+from pyFAI.method_registry import IntegrationMethod
+
+logger = logging.getLogger(__name__)
+
+
+class IntegrationMethodTuner(object):
+    """
+    Finds the fastest pyFAI integration method by timing the available engines the first time a certain setting is
+    integrated. The winners are stored per dimension, detector and image shape and can be persisted in a json file.
+    The binning (number of points, unit) is not part of the setting, the ranking of the engines is given by the
+    pixels which have to be processed, so that e.g. changing the number of sectors does not start a new timing.
+
+    Only engines with the same pixel splitting are compared, because the splitting changes the integrated intensities
+    and not only the speed.
+    """
+
+    algorithms = ('histogram', 'csr', 'csc', 'lut')
+    implementations = ('cython', 'opencl')
+    fallback_method = 'csr'
+
+    def __init__(self, filename=None, pixel_splitting='bbox', repeats=2):
+        """
+        :param filename: json file in which the results are stored, previous results are loaded from it
+        :param pixel_splitting: pixel splitting of the compared engines ('no', 'bbox' or 'full')
+        :param repeats: number of timed integrations per engine, the first (untimed) integration builds the engine
+        """
+        self.filename = None
+        self.pixel_splitting = pixel_splitting
+        self.repeats = repeats
+        self.methods = {}
+        if filename is not None:
+            self.load(filename)
+
+    @staticmethod
+    def create_key(dim, detector, shape):
+        """
+        :param dim: 1 or 2 for 1D or cake integration
+        :param detector: pyFAI detector
+        :param shape: shape of the integrated image
+        """
+        return '{}d {} {}'.format(dim, detector.name, 'x'.join(str(int(s)) for s in shape))
+
+    def has_method(self, key):
+        return key in self.methods
+
+    def get_method(self, key):
+        """
+        :return: the fastest method found for key, or the fallback method if the key has not been tuned
+        """
+        return self.methods.get(key, self.fallback_method)
+
+    def get_candidates(self, dim):
+        """
+        :return: list of (split, algo, impl, target) tuples of all available engines, OpenCL is only used on CPUs
+        """
+        candidates = []
+        for algo in self.algorithms:
+            for impl in self.implementations:
+                target_type = 'cpu' if impl == 'opencl' else None
+                methods = IntegrationMethod.select_method(dim, self.pixel_splitting, algo, impl,
+                                                          target_type=target_type, degradable=False)
+                if methods:
+                    method = methods[0].method
+                    candidates.append((method.split, method.algo, method.impl, method.target))
+        return candidates
+
+    def tune(self, key, dim, integrate):
+        """
+        Times all candidate engines and stores the fastest one for key.
+        :param key: key created by create_key
+        :param dim: 1 or 2 for 1D or cake integration
+        :param integrate: function taking a method and performing the integration with it
+        :return: the fastest method
+        """
+        timings = {}
+        for method in self.get_candidates(dim):
+            try:
+                integrate(method)
+                durations = []
+                for _ in range(self.repeats):
+                    t1 = time.perf_counter()
+                    integrate(method)
+                    durations.append(time.perf_counter() - t1)
+            except Exception as e:  # engines might be registered but not work on this machine (e.g. OpenCL)
+                logger.info('Integration method {} failed: {}'.format(method, e))
+                continue
+            timings[method] = min(durations)
+
+        if not timings:
+            return self.fallback_method
+
+        fastest_method = min(timings, key=timings.get)
+        logger.info('Fastest integration method for {}: {} ({:.4f}s)'.format(key, fastest_method,
+                                                                             timings[fastest_method]))
+        self.methods[key] = fastest_method
+        self.save()
+        return fastest_method
+
+    def load(self, filename):
+        """
+        Loads previous results from filename (if it exists), new results will be saved to the same file.
+        """
+        self.filename = filename
+        if not os.path.isfile(filename):
+            return
+        try:
+            with open(filename) as f:
+                methods = json.load(f)
+        except ValueError:
+            logger.warning('Could not read integration methods from {}'.format(filename))
+            return
+        for key, method in methods.items():
+            split, algo, impl, target = method
+            self.methods[key] = (split, algo, impl, tuple(target) if target is not None else None)
+
+    def save(self):
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename, 'w') as f:
+                json.dump(self.methods, f, indent=2)
+        except OSError:
+            logger.warning('Could not save integration methods to {}'.format(self.filename))
+
+
+def get_method_name(method):
+    """
+    :param method: pyFAI method name or (split, algo, impl[, target]) tuple as returned by the tuner
+    :return: readable name, which can be parsed by parse_method_name, e.g. 'bbox_csr_cython'
+    """
+    if isinstance(method, (tuple, list)):
+        return '_'.join(str(part) for part in method[:3])
+    return str(method)
+
+
+def parse_method_name(name):
+    """
+    :return: pyFAI method (tuple of split, algo and impl or the name itself) for a name created by get_method_name
+    """
+    parts = name.split('_')
+    return tuple(parts) if len(parts) == 3 else name
+
+
+# shared by all calibration models, so that each setting is only timed once
+integration_method_tuner = IntegrationMethodTuner()
@@ -18,12 +18,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-try:
-    from extra_data import H5File
-except ImportError:
-    karabo_installed = False
-else:
-    karabo_installed = True
+from importlib.util import find_spec
+
+# extra_data is only imported when a karabo file is opened, since importing it (and pandas) is slow
+karabo_installed = find_spec('extra_data') is not None
 
 __all__ = ['KaraboFile', 'karabo_installed']
 
@@ -32,6 +30,10 @@ class KaraboFile:
     def __init__(self, filename, source_ind=0):
         if not karabo_installed:
             raise IOError('karabo_data is required to load karabo h5 files')
+        try:
+            from extra_data import H5File
+        except ImportError:
+            raise IOError('karabo_data could not be imported')
         self.f = H5File(filename)
         self.series_max = len(self.f.train_ids)
         self.sources = [s for s in self.f.instrument_sources if "daqOutput" in s]
@@ -24,10 +24,12 @@ import re
 
 
 class LambdaImage:
-    def __init__(self, filename=None, file_list=None):
+    def __init__(self, filename=None, file_list=None, swmr=False):
         """
         Loads an image produced by a Lambda detector.
         :param filename: path to the image file to be loaded
+        :param swmr: open the files in SWMR mode, to follow files which are still being written by the detector (see
+                     refresh). A file can not be opened in SWMR and normal mode at the same time.
         :return: dictionary with image_data, img_data_lambda and series_max, None if unsuccessful
         """
         detector_identifiers = [["/entry/instrument/detector/description", "Lambda"],
@@ -42,7 +44,7 @@ class LambdaImage:
             filename = file_list[0]
 
         try:
-            nx_file = h5py.File(filename, "r")
+            nx_file = h5py.File(filename, "r", swmr=swmr)
         except OSError:
             raise IOError("not a loadable hdf5 file")
 
@@ -53,26 +55,29 @@ class LambdaImage:
             except KeyError:
                 pass
         else:
+            nx_file.close()
             raise IOError("not a lambda image")
+        nx_file.close()
 
         # the image data is spread over multiple files, so we compile a list of them here
         lambda_files = []
         if file_list:
             for f_name in file_list:
                 try:
-                    lambda_files.append(h5py.File(f_name, "r"))
+                    lambda_files.append(h5py.File(f_name, "r", swmr=swmr))
                 except OSError:
                     pass
         else:
             for moduleIndex in filenumber_list:
                 try:
-                    lambda_files.append(h5py.File(re.sub(regex_in, regex_out.format(moduleIndex), filename), "r"))
+                    lambda_files.append(h5py.File(re.sub(regex_in, regex_out.format(moduleIndex), filename), "r",
+                                                  swmr=swmr))
                 except OSError:
                     pass
 
         self.file_list = file_list
         self.full_img_data = [imageFile[data_path] for imageFile in lambda_files]
-        self.shapes = np.array([module[0].shape for module in self.full_img_data])
+        self.shapes = np.array([module.shape[1:] for module in self.full_img_data])
         self._module_pos = np.array([np.ravel(nxim[module_positions_path]).astype(int) for nxim in lambda_files])
         self.img_idx = lambda_files[0]['entry/instrument/detector/sequence_number']
 
@@ -81,6 +86,22 @@ class LambdaImage:
         np.subtract(self._module_pos, self._module_pos[0][1], self._module_pos, where=[0, 1, 0])
         self.series_max = lambda_files[0][data_path].shape[0]
 
+    def refresh(self):
+        """
+        Updates the number of images of files opened in SWMR mode, which are still being written. Only images, which
+        are already available for all modules, are counted.
+        :return: number of images
+        """
+        for module_img_data in self.full_img_data:
+            if module_img_data.file.swmr_mode:
+                module_img_data.refresh()
+        self.series_max = min(module_img_data.shape[0] for module_img_data in self.full_img_data)
+        return self.series_max
+
+    def close(self):
+        for module_img_data in self.full_img_data:
+            module_img_data.file.close()
+
     def get_image(self, image_nr):
         """
         Gets the data for the given image nr and stitches the tiles together
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import zlib
+from collections import deque
+
+import numpy as np
+
+
+class MaskHistory(object):
+    """
+    Undo/redo history for boolean masks. Instead of full copies of the mask, only the bit-packed state before the
+    last operation is kept. All older steps are stored as zlib-compressed XOR differences between consecutive states,
+    which are very small for typical mask operations (a rectangle, a polygon etc. only change a small region).
+
+    Typical usage::
+        history = MaskHistory()
+        history.record(mask)  # before modifying the mask
+        mask[10:20, 10:20] = True
+        mask = history.undo(mask)
+    """
+
+    def __init__(self, max_steps=50, max_bytes=64 * 1024 ** 2):
+        """
+        :param max_steps: maximum number of undo and of redo steps
+        :param max_bytes: memory budget for the compressed differences, the oldest steps are discarded first
+        """
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        self._state = None  # packed mask before the last operation
+        self._shape = None
+        self._undo_deque = deque()
+        self._redo_deque = deque()
+
+    @property
+    def num_undo(self):
+        return len(self._undo_deque) + (self._state is not None)
+
+    @property
+    def num_redo(self):
+        return len(self._redo_deque)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the history in bytes.
+        """
+        state_bytes = self._state.nbytes if self._state is not None else 0
+        return state_bytes + sum(len(diff) for diff in self._undo_deque) + \
+               sum(len(diff) for diff in self._redo_deque)
+
+    def record(self, mask_data):
+        """
+        Saves the current mask as an undo step, has to be called before the mask is modified. All redo steps are
+        cleared.
+        """
+        packed = self._pack(mask_data)
+        if self._state is not None:
+            if np.shape(mask_data) == self._shape:
+                self._push(self._undo_deque, self._state, packed)
+            else:  # differences between masks of different shape are not possible
+                self._undo_deque.clear()
+        self._state = packed
+        self._shape = np.shape(mask_data)
+        self._redo_deque.clear()
+        self._limit_size()
+
+    def undo(self, mask_data):
+        """
+        :return: mask before the last operation, or mask_data if there is nothing to undo
+        """
+        if self._state is None:
+            return mask_data
+        if np.shape(mask_data) == self._shape:
+            self._push(self._redo_deque, self._state, self._pack(mask_data))
+        else:
+            self._redo_deque.clear()
+        previous_state = self._state
+        if self._undo_deque:
+            self._state = self._apply(previous_state, self._undo_deque.pop())
+        else:
+            self._state = None
+        self._limit_size()
+        return self._unpack(previous_state)
+
+    def redo(self, mask_data):
+        """
+        :return: mask after the last undone operation, or mask_data if there is nothing to redo
+        """
+        if not self._redo_deque:
+            return mask_data
+        packed = self._pack(mask_data)
+        if self._state is not None:
+            self._push(self._undo_deque, self._state, packed)
+        self._state = packed
+        self._shape = np.shape(mask_data)
+        next_state = self._apply(packed, self._redo_deque.pop())
+        self._limit_size()
+        return self._unpack(next_state)
+
+    @staticmethod
+    def _push(history_deque, state, other_state):
+        history_deque.append(zlib.compress(np.bitwise_xor(state, other_state).tobytes(), 1))
+
+    @staticmethod
+    def _apply(state, diff):
+        return np.bitwise_xor(state, np.frombuffer(zlib.decompress(diff), dtype=np.uint8))
+
+    @staticmethod
+    def _pack(mask_data):
+        return np.packbits(np.asarray(mask_data, dtype=bool))
+
+    def _unpack(self, state):
+        size = int(np.prod(self._shape))
+        return np.unpackbits(state, count=size).view(bool).reshape(self._shape)
+
+    def _limit_size(self):
+        while len(self._undo_deque) > self.max_steps - 1 and self._undo_deque:
+            self._undo_deque.popleft()
+        while len(self._redo_deque) > self.max_steps:
+            self._redo_deque.popleft()
+        while self._undo_deque and self.nbytes > self.max_bytes:
+            self._undo_deque.popleft()
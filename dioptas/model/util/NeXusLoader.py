@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import re
+import struct
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.util import find_spec
+
+import h5py
+import numpy as np
+
+# optional decompressors (pip install dioptas[eiger]), without them the chunks are decompressed by the hdf5 filter
+# pipeline in a single thread
+bitshuffle_installed = find_spec('bitshuffle') is not None
+lz4_installed = find_spec('lz4') is not None
+hdf5plugin_installed = find_spec('hdf5plugin') is not None
+
+__all__ = ['NeXusImage']
+
+# the chunks are decompressed in a pool of worker threads shared by all opened files, zlib, lz4 and bitshuffle release
+# the GIL while decompressing
+_decompression_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+FILTER_DEFLATE = 1
+FILTER_SHUFFLE = 2
+FILTER_LZ4 = 32004
+FILTER_BITSHUFFLE = 32008
+
+
+def _inflate(chunk, dtype, cd_values):
+    return zlib.decompress(chunk)
+
+
+def _unshuffle(chunk, dtype, cd_values):
+    # the shuffle filter stores the first bytes of all elements, then the second bytes and so on
+    n_elements = len(chunk) // dtype.itemsize
+    n_shuffled = n_elements * dtype.itemsize
+    shuffled = np.frombuffer(chunk, np.uint8, n_shuffled).reshape(dtype.itemsize, n_elements)
+    unshuffled = np.empty((n_elements, dtype.itemsize), np.uint8)
+    for byte in range(dtype.itemsize):  # much faster than a copy of the transposed array
+        unshuffled[:, byte] = shuffled[byte]
+    return unshuffled.tobytes() + chunk[n_shuffled:]
+
+
+def _decompress_lz4(chunk, dtype, cd_values):
+    # header: uncompressed size (uint64) and block size (uint32), followed by the blocks, each prefixed by its
+    # compressed size (uint32), all big endian. Blocks which did not get smaller are stored uncompressed.
+    import lz4.block
+    total_size, block_size = struct.unpack('>QI', chunk[:12])
+    blocks = []
+    decompressed_size = 0
+    pos = 12
+    while decompressed_size < total_size:
+        compressed_size, = struct.unpack('>I', chunk[pos:pos + 4])
+        pos += 4
+        expected_size = min(block_size, total_size - decompressed_size)
+        block = chunk[pos:pos + compressed_size]
+        pos += compressed_size
+        if compressed_size != expected_size:
+            block = lz4.block.decompress(block, uncompressed_size=expected_size)
+        blocks.append(block)
+        decompressed_size += expected_size
+    return b''.join(blocks)
+
+
+def _decompress_bitshuffle(chunk, dtype, cd_values):
+    # header: uncompressed size (uint64) and block size in bytes (uint32), both big endian
+    import bitshuffle
+    total_size, block_size = struct.unpack('>QI', chunk[:12])
+    data = np.frombuffer(chunk, np.uint8, offset=12)
+    return bitshuffle.decompress_lz4(data, (total_size // dtype.itemsize,), dtype,
+                                     block_size // dtype.itemsize).tobytes()
+
+
+def _bitshuffle_supported(cd_values):
+    # only bitshuffle with lz4 compression (cd_values[4] == 2) stores the header needed for decompression
+    return bitshuffle_installed and len(cd_values) > 4 and cd_values[4] == 2
+
+
+_decompressors = {
+    FILTER_DEFLATE: (_inflate, lambda cd_values: True),
+    FILTER_SHUFFLE: (_unshuffle, lambda cd_values: True),
+    FILTER_LZ4: (_decompress_lz4, lambda cd_values: lz4_installed),
+    FILTER_BITSHUFFLE: (_decompress_bitshuffle, _bitshuffle_supported),
+}
+
+
+def _decode_chunk(chunk, filter_mask, filters, dtype, shape):
+    """
+    Applies the filters of the dataset in reverse order to a raw chunk, filters which are set in the filter_mask have
+    been skipped when the chunk was written.
+    """
+    for ind in reversed(range(len(filters))):
+        if filter_mask & (1 << ind):
+            continue
+        filter_id, cd_values = filters[ind]
+        chunk = _decompressors[filter_id][0](chunk, dtype, cd_values)
+    return np.frombuffer(chunk, dtype).reshape(shape).copy()  # the buffer is read-only
+
+
+def _get_direct_filters(dataset):
+    """
+    :return: list of (filter id, filter parameters) of the dataset, or None if its chunks can not be read directly,
+             i.e. the dataset is not chunked by single frames or uses filters without available decompressor
+    """
+    if dataset.chunks is None or dataset.chunks != (1,) + dataset.shape[1:]:
+        return None
+    plist = dataset.id.get_create_plist()
+    filters = []
+    for ind in range(plist.get_nfilters()):
+        filter_id, _, cd_values, _ = plist.get_filter(ind)
+        if filter_id not in _decompressors or not _decompressors[filter_id][1](cd_values):
+            return None
+        filters.append((filter_id, tuple(cd_values)))
+    return filters
+
+
+class NeXusImage:
+    """
+    Image series stored in HDF5/NeXus files. In Eiger master files the frames are spread over several data files,
+    which are referenced by external links in /entry/data (data_000001, data_000002, ...). For other NeXus files the
+    'default' attributes are followed to the signal of the default NXdata group.
+
+    If a dataset is chunked by single frames and all its filters can be decompressed in python (deflate, shuffle, lz4
+    and bitshuffle/lz4 if the respective packages are installed), the compressed chunks are read directly and
+    decompressed by a pool of worker threads. The following frames are decompressed in advance, so that stepping
+    through the series (e.g. in the batch integration) does not wait for the decompression.
+    """
+    prefetch = 8  # number of frames decompressed in advance
+
+    def __init__(self, filename):
+        """
+        :param filename: path to the master or NeXus file
+        """
+        if not os.path.isfile(filename) or not h5py.is_hdf5(filename):
+            raise IOError("not a hdf5 file")
+        if hdf5plugin_installed:
+            import hdf5plugin  # registers the compression filters of the hdf5 library for the fallback reading
+
+        self.filename = filename
+        self._files = [h5py.File(filename, "r")]
+        try:
+            self._datasets = self._find_datasets(self._files[0])
+        except Exception as e:
+            self.close()
+            raise IOError("not a NeXus image series") from e
+        if not self._datasets:
+            self.close()
+            raise IOError("no image series found")
+
+        self._filters = [_get_direct_filters(dataset) for dataset in self._datasets]
+        self._offsets = np.cumsum([0] + [dataset.shape[0] for dataset in self._datasets])
+        self.series_max = int(self._offsets[-1])
+        self._frames = OrderedDict()  # frame index -> future of the decompressed frame
+
+    def _find_datasets(self, nx_file):
+        if 'entry/data' in nx_file:
+            data_group = nx_file['entry/data']
+            names = sorted(name for name in data_group if re.match(r'data_\d+$', name))
+            if names:
+                datasets = []
+                for name in names:
+                    try:
+                        datasets.append(self._resolve_link(data_group, name))
+                    except (OSError, KeyError):  # data file is not (yet) available
+                        break
+                return [dataset for dataset in datasets if dataset.ndim == 3]
+
+        signal = self._find_default_signal(nx_file)
+        if signal is not None and signal.ndim == 3:
+            return [signal]
+        raise IOError("not a NeXus image series")
+
+    def _resolve_link(self, group, name):
+        """
+        External links are resolved with respect to the directory of the master file, so that the data files are
+        found independent of the current working directory.
+        """
+        link = group.get(name, getlink=True)
+        if not isinstance(link, h5py.ExternalLink):
+            return group[name]
+        data_filename = link.filename
+        if not os.path.isabs(data_filename):
+            data_filename = os.path.join(os.path.dirname(os.path.abspath(self.filename)), data_filename)
+        data_file = h5py.File(data_filename, "r")
+        self._files.append(data_file)
+        return data_file[link.path]
+
+    @staticmethod
+    def _find_default_signal(nx_file):
+        node = nx_file
+        while 'default' in node.attrs:
+            default = node.attrs['default']
+            default = default.decode() if isinstance(default, bytes) else str(default)
+            if default not in node or not isinstance(node[default], h5py.Group):
+                break
+            node = node[default]
+        if node is nx_file or 'signal' not in node.attrs:
+            return None
+        signal = node.attrs['signal']
+        signal = signal.decode() if isinstance(signal, bytes) else str(signal)
+        dataset = node.get(signal)
+        return dataset if isinstance(dataset, h5py.Dataset) else None
+
+    def get_image(self, image_nr):
+        """
+        :param image_nr: position of the image in the series, starting at 0
+        :return: image_data
+        """
+        frame = self._frames.pop(image_nr, None)
+        if frame is None:
+            frame = self._read_frame(image_nr)
+
+        for next_nr in range(image_nr + 1, min(image_nr + 1 + self.prefetch, self.series_max)):
+            if next_nr not in self._frames and self._is_direct(next_nr):
+                self._frames[next_nr] = self._read_frame(next_nr)
+        while len(self._frames) > 2 * self.prefetch:
+            self._frames.popitem(last=False)
+
+        return frame.result()[::-1]
+
+    def _locate(self, image_nr):
+        dataset_ind = int(np.searchsorted(self._offsets, image_nr, side='right')) - 1
+        return dataset_ind, image_nr - int(self._offsets[dataset_ind])
+
+    def _is_direct(self, image_nr):
+        return self._filters[self._locate(image_nr)[0]] is not None
+
+    def _read_frame(self, image_nr):
+        """
+        Reads the (compressed) frame in the calling thread, since the hdf5 library is not thread safe, and submits the
+        decompression to the worker threads.
+        :return: future of the frame
+        """
+        if not 0 <= image_nr < self.series_max:
+            raise IndexError("image {} is not in the series".format(image_nr))
+        dataset_ind, pos = self._locate(image_nr)
+        dataset = self._datasets[dataset_ind]
+        filters = self._filters[dataset_ind]
+        if filters is None:
+            frame = Future()
+            frame.set_result(dataset[pos])
+            return frame
+
+        filter_mask, chunk = dataset.id.read_direct_chunk((pos,) + (0,) * (dataset.ndim - 1))
+        return _decompression_executor.submit(_decode_chunk, chunk, filter_mask, filters, dataset.dtype,
+                                              dataset.shape[1:])
+
+    def close(self):
+        for nx_file in self._files:
+            nx_file.close()
@@ -62,6 +62,8 @@ class Pattern(QtCore.QObject):
         self._auto_background_before_subtraction_pattern = None
         self._auto_background_pattern = None
 
+        self._stage_cache = {}
+
     def load(self, filename, skiprows=0):
         try:
             if filename.endswith('.chi'):
@@ -118,65 +120,90 @@ class Pattern(QtCore.QObject):
         self.recalculate_pattern()
 
     def recalculate_pattern(self):
-        x = self._original_x
-        y = self._original_y * self._scaling + self._offset
+        """
+        Calculates the pattern data from the original data. The calculation is split into stages (scaling and offset,
+        background subtraction, automatic background subtraction and smoothing), whose results are cached with the
+        inputs they depend on. Only the stages downstream of a changed parameter are recalculated.
+        """
+        x, y = self._get_stage('scaled', (self._original_x, self._original_y, self._scaling, self._offset),
+                               self._calculate_scaled)
 
         if self._background_pattern is not None:
-            # create background function
             x_bkg, y_bkg = self._background_pattern.data
-
-            if not np.array_equal(x_bkg, self._original_x):
-                # the background will be interpolated
-                f_bkg = interp1d(x_bkg, y_bkg, kind='linear')
-
-                # find overlapping x and y values:
-                ind = np.where((self._original_x <= np.max(x_bkg)) & (self._original_x >= np.min(x_bkg)))
-                x = self._original_x[ind]
-                y = self._original_y[ind]
-
-                if len(x) == 0:
-                    # if there is no overlapping between background and pattern, raise an error
-                    raise BkgNotInRangeError(self.name)
-
-                y = y - f_bkg(x)
-            else:
-                # if pattern and bkg have the same x basis we just delete y-y_bkg
-                y = y - y_bkg
+            x, y = self._get_stage('background', (x, y, x_bkg, y_bkg), self._subtract_background)
 
         if self.auto_background_subtraction:
-            self._auto_background_before_subtraction_pattern = Pattern(x, y)
+            self._auto_background_before_subtraction_pattern = PatternData(x, y)
+
             if self.auto_background_subtraction_roi is not None:
                 ind = (x >= np.min(self.auto_background_subtraction_roi)) & \
                       (x <= np.max(self.auto_background_subtraction_roi))
-                x = x[ind]
-                y = y[ind]
-                self.auto_background_subtraction_roi = [np.min(x), np.max(x)]
             else:
-                self.auto_background_subtraction_roi = [np.min(x), np.max(x)]
-
-            # reset ROI if limits are larger or smaller than the actual data
-            x_min, x_max = np.min(x), np.max(x)
-            if self.auto_background_subtraction_roi[0]<x_min:
-                self.auto_background_subtraction_roi[0]=x_min
+                ind = slice(None)
+            self.auto_background_subtraction_roi = [np.min(x[ind]), np.max(x[ind])]
 
-            if self.auto_background_subtraction_roi[1]>x_max:
-                self.auto_background_subtraction_roi[1]=x_max
-
-            y_bkg = extract_background(x, y,
-                                       self.auto_background_subtraction_parameters[0],
-                                       self.auto_background_subtraction_parameters[1],
-                                       self.auto_background_subtraction_parameters[2])
-            self._auto_background_pattern = Pattern(x, y_bkg, name='auto_bg_' + self.name)
-            y -= y_bkg
+            x, y, y_bkg = self._get_stage('auto_background',
+                                          (x, y, tuple(self.auto_background_subtraction_roi),
+                                           tuple(self.auto_background_subtraction_parameters)),
+                                          self._subtract_auto_background)
+            self._auto_background_pattern = PatternData(x, y_bkg, name='auto_bg_' + self.name)
 
         if self._smoothing > 0:
-            y = gaussian_filter1d(y, self._smoothing)
+            x, y = self._get_stage('smoothed', (x, y, self._smoothing), self._calculate_smoothed)
 
         self._pattern_x = x
         self._pattern_y = y
 
         self.pattern_changed.emit(self._pattern_x, self._pattern_y)
 
+    def _get_stage(self, name, inputs, calculate):
+        """
+        Returns the cached result of a calculation stage if its inputs did not change, otherwise calculates it with
+        calculate(*inputs). Arrays are compared by identity, the stages never modify their input arrays in place.
+        """
+        cached = self._stage_cache.get(name)
+        if cached is not None and len(cached[0]) == len(inputs) and \
+                all(_same_input(old, new) for old, new in zip(cached[0], inputs)):
+            return cached[1]
+        result = calculate(*inputs)
+        self._stage_cache[name] = (inputs, result)
+        return result
+
+    @staticmethod
+    def _calculate_scaled(x, y, scaling, offset):
+        return x, y * scaling + offset
+
+    def _subtract_background(self, x, y, x_bkg, y_bkg):
+        if np.array_equal(x_bkg, x):
+            # if pattern and bkg have the same x basis we just delete y-y_bkg
+            return x, y - y_bkg
+
+        # the background will be interpolated, find overlapping x and y values:
+        ind = np.where((x <= np.max(x_bkg)) & (x >= np.min(x_bkg)))
+        x = x[ind]
+        y = y[ind]
+
+        if len(x) == 0:
+            # if there is no overlapping between background and pattern, raise an error
+            raise BkgNotInRangeError(self.name)
+
+        if np.any(np.diff(x_bkg) < 0):
+            sort_ind = np.argsort(x_bkg)
+            x_bkg, y_bkg = x_bkg[sort_ind], y_bkg[sort_ind]
+        return x, y - np.interp(x, x_bkg, y_bkg)
+
+    @staticmethod
+    def _subtract_auto_background(x, y, roi, parameters):
+        ind = (x >= roi[0]) & (x <= roi[1])
+        x = x[ind]
+        y = y[ind]
+        y_bkg = extract_background(x, y, parameters[0], parameters[1], parameters[2])
+        return x, y - y_bkg, y_bkg
+
+    @staticmethod
+    def _calculate_smoothed(x, y, smoothing):
+        return x, gaussian_filter1d(y, smoothing)
+
     @property
     def data(self):
         return self._pattern_x, self._pattern_y
@@ -296,6 +323,31 @@ class Pattern(QtCore.QObject):
         return len(self._original_x)
 
 
+class PatternData(object):
+    """
+    Lightweight x, y container without signals, used for the intermediate results of a Pattern (e.g. the automatically
+    extracted background).
+    """
+
+    def __init__(self, x, y, name=''):
+        self.x = x
+        self.y = y
+        self.name = name
+
+    @property
+    def data(self):
+        return self.x, self.y
+
+    def __len__(self):
+        return len(self.x)
+
+
+def _same_input(old, new):
+    if isinstance(old, np.ndarray) or isinstance(new, np.ndarray):
+        return old is new
+    return old == new
+
+
 class BkgNotInRangeError(Exception):
     def __init__(self, pattern_name):
         self.pattern_name = pattern_name
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import logging
+import threading
+import queue
+
+import numpy as np
+import h5py
+
+logger = logging.getLogger(__name__)
+
+
+def format_columns(row_format, *columns):
+    """
+    Formats all rows of the given columns at once, instead of formatting every line separately.
+    :param row_format: printf-style format string for a single row, e.g. '%.9E  %.9E\\n'
+    :param columns: 1d arrays with equal length
+    :return: formatted string
+    """
+    values = np.column_stack(columns).ravel().tolist()
+    return (row_format * len(columns[0])) % tuple(values)
+
+
+def format_pattern(filename, x, y, header=None, unit=''):
+    """
+    Creates the file content for a pattern. The format depends on the file ending:
+        .chi - Fit2D chi file, with a default header containing filename and unit if no header is given
+        .fxye - GSAS file, the header has to contain the placeholders NUM_POINTS, MIN_X_VAL and STEP_X_VAL
+        all others - two column text file
+    :return: file content as string
+    """
+    num_points = len(x)
+
+    if filename.endswith('.chi'):
+        if header is None or header == '':
+            header = filename + '\n' + unit + '\n\n' + "       {0}\n".format(num_points)
+        return header + format_columns(' %.7E  %.7E\n', x, y)
+    elif filename.endswith('.fxye'):
+        factor = 100
+        if 'CONQ' in header:
+            factor = 1
+        header = header.replace('NUM_POINTS', '{0:.6g}'.format(num_points))
+        header = header.replace('MIN_X_VAL', '{0:.6g}'.format(factor * x[0]))
+        header = header.replace('STEP_X_VAL', '{0:.6g}'.format(factor * (x[1] - x[0])))
+        return header + '\n' + format_columns('\t%.6g\t%.6g\t%.6g\n', factor * np.asarray(x), y,
+                                              np.sqrt(np.abs(y)))
+    else:
+        content = format_columns('%.9E  %.9E\n', x, y)
+        if header is not None:
+            content = header + '\n' + content
+        return content
+
+
+def write_pattern(filename, x, y, header=None, unit=''):
+    """
+    Writes a pattern into a file, see format_pattern for the supported formats.
+    """
+    with open(filename, 'w') as file_handle:
+        file_handle.write(format_pattern(filename, x, y, header, unit))
+
+
+class PatternWriter(object):
+    """
+    Writes pattern files in a background thread, so that the integration of the next image does not have to wait
+    for formatting and writing the files. Files are written in the order they are queued.
+
+    The thread only runs while patterns are queued and is not a daemon thread, so queued patterns are still written
+    when the program exits. Files which could not be written are returned by flush.
+
+    Typical usage::
+        writer = PatternWriter()
+        for x, y, filename in patterns:
+            writer.write(filename, x, y)
+        failed = writer.flush()
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._failed = []
+
+    def write(self, filename, x, y, header=None, unit=''):
+        """
+        Queues a pattern for writing, the data is copied, so the arrays can be modified afterwards.
+        """
+        with self._lock:
+            self._queue.put((filename, np.array(x), np.array(y), header, unit))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._process_queue)
+                self._thread.start()
+
+    def flush(self):
+        """
+        Waits until all queued patterns are written.
+        :return: list of filenames, which could not be written since the last flush
+        """
+        self._queue.join()
+        with self._lock:
+            failed, self._failed = self._failed, []
+        return failed
+
+    def _process_queue(self):
+        while True:
+            with self._lock:
+                if self._queue.empty():
+                    self._thread = None
+                    return
+                filename, x, y, header, unit = self._queue.get()
+            try:
+                write_pattern(filename, x, y, header, unit)
+            except Exception:
+                logger.exception("Could not write pattern {0}".format(filename))
+                with self._lock:
+                    self._failed.append(filename)
+            finally:
+                self._queue.task_done()
+
+
+class PatternStackWriter(object):
+    """
+    Saves all integrated patterns of a batch run into a single NeXus/HDF5 file. The layout follows the processed
+    batch files, so that the stack can be opened by BatchModel.load_proc_data: processed/result/data contains one
+    pattern per row and processed/result/binning the x values. The source files, their mapping to the patterns (every
+    pattern is integrated from the first image of its file), the calibration file, the mask and, if given, the
+    subtracted backgrounds are stored in processed/process. The background dataset is created as soon as the first
+    pattern with background is added, rows of patterns without background are filled with NaN.
+    Patterns are buffered and written in chunks of *chunk_size* rows.
+
+    Typical usage::
+        with PatternStackWriter('stack.nxs', unit='2th_deg') as stack:
+            for x, y, filename in patterns:
+                stack.add(x, y, filename)
+    """
+
+    def __init__(self, filename, unit='', chunk_size=64, cal_file='', mask=None):
+        """
+        :param filename: NeXus file, an existing file is overwritten
+        :param unit: unit of the x values
+        :param chunk_size: number of buffered patterns
+        :param cal_file: calibration file used for the integration
+        :param mask: mask used for the integration
+        """
+        self.filename = filename
+        self.unit = unit
+        self.chunk_size = chunk_size
+        self.cal_file = cal_file
+        self.mask = mask
+        self.num_patterns = 0
+
+        self._file = None
+        self._x = None
+        self._buffer = []
+
+    def add(self, x, y, filename='', background=None):
+        """
+        Adds a pattern to the stack, all patterns need to have the same x values.
+        :param x: x values of the pattern
+        :param y: intensities
+        :param filename: name of the image the pattern was integrated from
+        :param background: optional background, which has been subtracted from y
+        """
+        if self._x is None:
+            self._x = np.array(x)
+        elif len(x) != len(self._x):
+            raise ValueError('All patterns in a stack need to have the same number of points.')
+
+        self._buffer.append((np.array(y), filename, background))
+        if len(self._buffer) >= self.chunk_size:
+            self._write_buffer()
+
+    def close(self):
+        """
+        Writes all buffered patterns and closes the file.
+        """
+        if self._buffer:
+            self._write_buffer()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _create_file(self):
+        if os.path.dirname(self.filename) != '':
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        self._file = h5py.File(self.filename, mode='w')
+        self._file.attrs['default'] = 'processed'
+
+        nxentry = self._file.create_group('processed')
+        nxentry.attrs['NX_class'] = 'NXentry'
+        nxentry.attrs['default'] = 'result'
+
+        nxdata = nxentry.create_group('result')
+        nxdata.attrs['NX_class'] = 'NXdata'
+        nxdata.attrs['signal'] = 'data'
+        nxdata.attrs['axes'] = ['.', 'binning']
+
+        nxprocess = nxentry.create_group('process')
+        nxprocess.attrs['NX_class'] = 'NXprocess'
+        nxprocess['int_unit'] = self.unit
+        nxprocess['num_points'] = len(self._x)
+        nxprocess['cal_file'] = str(self.cal_file or '')
+        if self.mask is not None:
+            nxprocess.create_dataset('mask', data=self.mask)
+
+        num_points = len(self._x)
+        chunks = (self.chunk_size, num_points)
+        nxdata.create_dataset('data', shape=(0, num_points), maxshape=(None, num_points), chunks=chunks,
+                              dtype=np.float64)
+        binning = nxdata.create_dataset('binning', data=self._x)
+        binning.attrs['unit'] = self.unit
+        nxprocess.create_dataset('files', shape=(0,), maxshape=(None,), dtype=h5py.string_dtype())
+        nxprocess.create_dataset('file_map', data=[0], maxshape=(None,), chunks=(self.chunk_size,), dtype=np.int64)
+        nxprocess.create_dataset('pos_map', shape=(0, 2), maxshape=(None, 2), chunks=(self.chunk_size, 2),
+                                 dtype=np.int64)
+
+    def _create_background_dataset(self):
+        num_points = len(self._x)
+        self._file['processed/process'].create_dataset('bkg', shape=(self.num_patterns, num_points),
+                                                       maxshape=(None, num_points),
+                                                       chunks=(self.chunk_size, num_points), dtype=np.float64,
+                                                       fillvalue=np.nan)
+
+    def _write_buffer(self):
+        if self._file is None:
+            self._create_file()
+
+        start, stop = self.num_patterns, self.num_patterns + len(self._buffer)
+        data = self._file['processed/result/data']
+        data.resize(stop, axis=0)
+        data[start:stop] = np.array([y for y, _, _ in self._buffer])
+
+        files = self._file['processed/process/files']
+        files.resize(stop, axis=0)
+        files[start:stop] = [filename for _, filename, _ in self._buffer]
+        file_map = self._file['processed/process/file_map']
+        file_map.resize(stop + 1, axis=0)
+        file_map[start + 1:stop + 1] = np.arange(start + 1, stop + 1)
+        pos_map = self._file['processed/process/pos_map']
+        pos_map.resize(stop, axis=0)
+        pos_map[start:stop] = np.column_stack((np.arange(start, stop), np.zeros(stop - start)))
+
+        has_background = any(background is not None for _, _, background in self._buffer)
+        if has_background and 'bkg' not in self._file['processed/process']:
+            self._create_background_dataset()
+        if 'bkg' in self._file['processed/process']:
+            bkg = self._file['processed/process/bkg']
+            bkg.resize(stop, axis=0)
+            bkg[start:stop] = np.array([background if background is not None else np.full(len(self._x), np.nan)
+                                        for _, _, background in self._buffer])
+
+        self.num_patterns = stop
+        self._buffer = []
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+
+import h5py
+import numpy as np
+
+from .IntegrationMethodTuner import get_method_name
+
+
+def open_proc_data(filename):
+    """
+    Opens a processed data file for reading. SWMR mode allows reading files, which are still written by a live
+    integration, a file which is already opened in normal mode in this process (e.g. as raw data) can only be opened
+    the same way.
+    :return: h5py.File
+    """
+    try:
+        return h5py.File(filename, "r", swmr=True)
+    except OSError:
+        return h5py.File(filename, "r")
+
+
+class ProcessedDataWriter(object):
+    """
+    Appends the patterns of a live batch integration to a processed data file with the same layout as written by
+    BatchModel.save_proc_data. All datasets are created resizable when the file is opened, afterwards the file is
+    switched into SWMR mode, so that it can already be read (e.g. loaded by another Dioptas) while frames are appended.
+    """
+
+    def __init__(self, filename, files, reduction_names=(), cal_file=None, mask_file=None, mask_shape=None,
+                 int_method='csr'):
+        """
+        :param filename: hdf5 file, an existing file is overwritten
+        :param files: raw image files of the batch, they can not change afterwards
+        :param reduction_names: names of the per-frame reductions to be written
+        :param cal_file: calibration file used for the integration
+        :param mask_file: mask file used for the integration
+        :param mask_shape: shape of the mask, only written together with mask_file
+        :param int_method: integration method, a pyFAI method name or tuple, written as readable name
+        """
+        if os.path.dirname(filename) != '':
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.filename = filename
+        self.num_written = 0
+
+        self._file = h5py.File(filename, mode='w', libver='latest')
+        self._file.attrs['default'] = 'processed'
+
+        nxentry = self._file.create_group('processed')
+        nxentry.attrs["NX_class"] = 'NXentry'
+        nxentry.attrs['default'] = 'result'
+
+        nxdata = nxentry.create_group('result')
+        nxdata.attrs["NX_class"] = 'NXdata'
+        nxdata.attrs["signal"] = 'data'
+        nxdata.attrs["axes"] = ['.', 'binning']
+        self._data = nxdata.create_dataset("data", shape=(0, 0), maxshape=(None, None), chunks=(16, 1024),
+                                           dtype=np.float64)
+        self._binning = nxdata.create_dataset("binning", shape=(0,), maxshape=(None,), chunks=(1024,),
+                                              dtype=np.float64)
+        self._binning.attrs["unit"] = 'deg'
+        self._binning.attrs['long_name'] = 'two_theta (degrees)'
+
+        nxprocess = nxentry.create_group('process')
+        nxprocess.attrs["NX_class"] = 'NXprocess'
+        if cal_file is not None:
+            nxprocess['cal_file'] = str(cal_file)
+        if mask_file is not None:
+            nxprocess["mask_file"] = str(mask_file)
+            nxprocess['mask_shape'] = mask_shape
+        nxprocess['int_method'] = get_method_name(int_method)
+        nxprocess['int_unit'] = '2th_deg'
+        self._num_points = nxprocess.create_dataset('num_points', data=0)
+
+        self._pos_map = nxprocess.create_dataset("pos_map", shape=(0, 2), maxshape=(None, 2), chunks=(1024, 2),
+                                                 dtype=np.int64)
+        self._file_map = nxprocess.create_dataset("file_map", shape=(len(files) + 1,), dtype=np.int64)
+        nxprocess.create_dataset("files", data=np.array(files).astype('S'))
+
+        self._reductions = {}
+        if reduction_names:
+            names = list(reduction_names)
+            nxreductions = nxentry.create_group('reductions')
+            nxreductions.attrs["NX_class"] = 'NXdata'
+            nxreductions.attrs["signal"] = names[0]
+            if len(names) > 1:
+                nxreductions.attrs["auxiliary_signals"] = names[1:]
+            nxreductions.attrs["axes"] = 'frame'
+            for name in names:
+                self._reductions[name] = nxreductions.create_dataset(name, shape=(0,), maxshape=(None,),
+                                                                     chunks=(1024,), dtype=np.float64)
+            self._frame = nxreductions.create_dataset("frame", shape=(0,), maxshape=(None,), chunks=(1024,),
+                                                      dtype=np.int64)
+
+        self._file.swmr_mode = True
+
+    def append(self, data, binning, pos_map, file_map, reduction_data=None):
+        """
+        Writes all frames, which have not been written yet. Rows written before are not touched, if the patterns got
+        longer they are padded with zeros.
+
+        :param data: all patterns of the batch (n_img, n_bins)
+        :param binning: binning of the patterns
+        :param pos_map: (file index, position) of every pattern
+        :param file_map: index of the first image of every file
+        :param reduction_data: dictionary with the per-frame reductions of all patterns
+        """
+        n_img, n_bins = data.shape
+        start = self.num_written
+        if n_img <= start:
+            return
+
+        self._data.resize((n_img, max(n_bins, self._data.shape[1])))
+        self._data[start:n_img, :n_bins] = data[start:]
+        self._binning.resize((len(binning),))
+        self._binning[:] = binning
+        self._num_points[()] = len(binning)
+
+        self._pos_map.resize((n_img, 2))
+        self._pos_map[start:n_img] = pos_map[start:]
+        self._file_map[:] = file_map
+
+        for name, dataset in self._reductions.items():
+            dataset.resize((n_img,))
+            if reduction_data is not None and name in reduction_data:
+                dataset[start:n_img] = reduction_data[name][start:]
+        if self._reductions:
+            self._frame.resize((n_img,))
+            self._frame[start:n_img] = np.arange(start, n_img)
+
+        self._file.flush()
+        self.num_written = n_img
+
+    def close(self):
+        self._file.close()
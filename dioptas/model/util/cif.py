@@ -21,13 +21,11 @@
 from __future__ import division, unicode_literals
 
 import os
-import itertools
 try:
     from urllib import pathname2url
 except ImportError:
     from urllib.request import pathname2url
 
-from math import degrees
 
 from CifFile import ReadCif
 from .jcpds import jcpds
@@ -46,6 +44,8 @@ with open(os.path.join(data_path, "periodic_table.json")) as f:
 class CifConverter(object):
     # Tolerance in which to treat two peaks as having the same two theta.
     TWO_THETA_TOL = 1e-5
+    # Number of reflections for which the structure factors are calculated at once
+    CHUNK_SIZE = 4096
 
     def __init__(self, wavelength, min_d_spacing=0.5, min_intensity=0.5):
         """
@@ -84,16 +84,15 @@ class CifConverter(object):
         :return: converted jcpds object
         :rtype: jcpds
         """
-        reflections = self._calculate_hkl_within_sphere_and_min_d_spacing(cif_phase)
-        xrd_reflections = self._calculate_reflection_intensities(cif_phase, reflections)
+        hkl, d_hkl = self._calculate_hkl_within_sphere_and_min_d_spacing(cif_phase)
+        xrd_reflections = self._calculate_reflection_intensities(cif_phase, hkl, d_hkl)
         jcpds_phase = self._create_jcpds_from_cif_parameters(cif_phase)
 
-        for reflection in xrd_reflections:
-            jcpds_phase.add_reflection(reflection.h,
-                                       reflection.k,
-                                       reflection.l,
-                                       reflection.intensity,
-                                       reflection.d_spacing)
+        jcpds_phase.add_reflections([reflection.h for reflection in xrd_reflections],
+                                    [reflection.k for reflection in xrd_reflections],
+                                    [reflection.l for reflection in xrd_reflections],
+                                    [reflection.intensity for reflection in xrd_reflections],
+                                    [reflection.d_spacing for reflection in xrd_reflections])
         return jcpds_phase
 
     def _create_jcpds_from_cif_parameters(self, cif_phase):
@@ -120,111 +119,105 @@ class CifConverter(object):
 
     def _calculate_hkl_within_sphere_and_min_d_spacing(self, cif_phase):
         """
-        Generates a list of hkl reflections which can satisfy the diffraction condition using the given wavelength and
-        also the minimum d spacing
-        :return: list of reflections
-        :rtype: list[Reflection]
+        Generates all hkl reflections which can satisfy the diffraction condition using the given wavelength and
+        also the minimum d spacing. The hkl cube is limited to the extent of the reciprocal space sphere with radius
+        1/d_min (|h| <= a/d_min, as h = g * a), before the d-spacings are calculated for all hkl at once.
+        :return: hkl array with shape (n, 3) and the corresponding d-spacings, the reflections are ordered by
+                 descending h, k and l
         """
-        max_h = np.floor(2 * cif_phase.a / self.wavelength)
-        max_k = np.floor(2 * cif_phase.b / self.wavelength)
-        max_l = np.floor(2 * cif_phase.c / self.wavelength)
-
-        h = reversed(np.arange(-max_h + 1, max_h, 1))
-        k = reversed(np.arange(-max_k + 1, max_k, 1))
-        l = reversed(np.arange(-max_l + 1, max_l, 1))
-        s = [h, k, l]
-
-        reciprocal_hkl = np.array(list(itertools.product(*s)))
-        h = reciprocal_hkl[:, 0]
-        k = reciprocal_hkl[:, 1]
-        l = reciprocal_hkl[:, 2]
+        g_max = min(2. / self.wavelength, 1. / self.min_d_spacing)
+        max_h = np.floor(g_max * cif_phase.a)
+        max_k = np.floor(g_max * cif_phase.b)
+        max_l = np.floor(g_max * cif_phase.c)
 
-        d_hkl = compute_d_hkl(h, k, l, cif_phase)
-        good_indices = np.argwhere(d_hkl > self.min_d_spacing)
+        h = np.arange(max_h, -max_h - 1, -1)[:, None, None]
+        k = np.arange(max_k, -max_k - 1, -1)[None, :, None]
+        l = np.arange(max_l, -max_l - 1, -1)[None, None, :]
 
-        reflections = []
-        for i in good_indices:
-            reflections.append(Reflection(int(h[i][0]), int(k[i][0]), int(l[i][0]), d_hkl[i][0]))
+        with np.errstate(divide='ignore'):
+            d_hkl = compute_d_hkl(h, k, l, cif_phase)
+        d_hkl = np.broadcast_to(d_hkl, (h.size, k.size, l.size))
+        valid = (d_hkl > self.min_d_spacing) & (d_hkl >= 0.5 * self.wavelength) & np.isfinite(d_hkl)
 
-        return reflections
+        h_ind, k_ind, l_ind = np.nonzero(valid)
+        hkl = np.stack((h.ravel()[h_ind], k.ravel()[k_ind], l.ravel()[l_ind]), axis=1).astype(int)
+        return hkl, d_hkl[valid]
 
-    def _calculate_reflection_intensities(self, cif_phase, base_reflections):
+    def _calculate_reflection_intensities(self, cif_phase, hkl, d_hkl):
         """
+        Calculates the intensities of all reflections. The structure factors are obtained from one matrix product
+        of the phase factors of all atoms with their occupancies per element. Reflections with the same two theta
+        (within TWO_THETA_TOL) are merged into a single peak, represented by the first given hkl.
         :param cif_phase:
-        :param base_reflections:
-        :return:
+        :param hkl: hkl array with shape (n, 3)
+        :param d_hkl: d-spacings of the reflections
+        :return: list of reflections sorted by two theta
+        :rtype: list[Reflection]
         """
-        # provide atom parameters as lists
+        # provide atom parameters per element
+        elements = sorted(set(atom[0] for atom in cif_phase.atoms))
         atom_numbers = []
         form_coefficients = []
-        fractional_coordinates = []
-        occupancies = []
-        for atom in cif_phase.atoms:
-            atom_numbers.append(PERIODIC_TABLE[atom[0]]['Atomic no'])
+        for element in elements:
+            atom_numbers.append(PERIODIC_TABLE[element]['Atomic no'])
             try:
-                c = ATOMIC_SCATTERING_PARAMS[atom[0]]
+                form_coefficients.append(ATOMIC_SCATTERING_PARAMS[element])
             except KeyError:
                 raise ValueError("Unable to calculate XRD pattern as "
                                  "there is no scattering coefficients for"
-                                 " %s." % atom[0])
-            form_coefficients.append(c)
-            fractional_coordinates.append(atom[1:4])
-            occupancies.append(atom[4])
-
+                                 " %s." % element)
         atom_numbers = np.array(atom_numbers)
         form_coefficients = np.array(form_coefficients)
-        fractional_coordinates = np.array(fractional_coordinates)
-        occupancies = np.array(occupancies)
-
-        two_thetas = []
-        peaks = {}
-
-        for reflection in base_reflections:
-            d_hkl = reflection.d_spacing
-            g_hkl = 1. / d_hkl
-            if g_hkl != 0:
-                hkl = np.array([reflection.h, reflection.k, reflection.l])
-
-                s = g_hkl * 0.5
-                s2 = s ** 2
 
-                theta = np.arcsin(self.wavelength * g_hkl * 0.5)
-                two_theta = degrees(2 * theta)
-
-                g_dot_r = np.dot(fractional_coordinates, np.transpose([hkl])).T[0]
-
-                fs = atom_numbers - 41.78214 * s2 * np.sum(
-                    form_coefficients[:, :, 0] * np.exp(-form_coefficients[:, :, 1] * s2), axis=1)
-                f_hkl = np.sum(fs * occupancies * np.exp(2j * np.pi * g_dot_r))
-                i_hkl = (f_hkl * f_hkl.conjugate()).real
-
-                ind = np.where(np.abs(np.subtract(two_thetas, two_theta)) < CifConverter.TWO_THETA_TOL)
-
-                lorentz_factor = (1 + np.cos(2 * theta) ** 2) / (np.sin(theta) ** 2 * np.cos(theta))
-
-                if len(ind[0]) > 0:
-                    peak_ind = two_thetas[ind[0][0]]
-                    peaks[peak_ind][0] += i_hkl * lorentz_factor
-                    peaks[peak_ind][1].append(tuple(hkl))
-                else:
-                    peaks[two_theta] = [i_hkl * lorentz_factor, [tuple(hkl)], d_hkl]
-                    two_thetas.append(two_theta)
-
-        max_intensity = max([v[0] for v in peaks.values()])
+        fractional_coordinates = np.array([atom[1:4] for atom in cif_phase.atoms])
+        occupancies = np.zeros((len(cif_phase.atoms), len(elements)))
+        for ind, atom in enumerate(cif_phase.atoms):
+            occupancies[ind, elements.index(atom[0])] = atom[4]
+
+        s2 = (0.5 / d_hkl) ** 2
+        theta = np.arcsin(self.wavelength * 0.5 / d_hkl)
+        two_theta = np.degrees(2 * theta)
+
+        intensities = np.zeros(len(hkl))
+        for start in range(0, len(hkl), self.CHUNK_SIZE):
+            chunk = slice(start, start + self.CHUNK_SIZE)
+            # atomic form factors, shape (reflections, elements)
+            fs = atom_numbers - 41.78214 * s2[chunk, None] * np.sum(
+                form_coefficients[None, :, :, 0] * np.exp(-form_coefficients[None, :, :, 1] *
+                                                          s2[chunk, None, None]), axis=2)
+            phase_factors = np.exp(2j * np.pi * np.dot(hkl[chunk], fractional_coordinates.T))
+            f_hkl = np.sum(fs * np.dot(phase_factors, occupancies), axis=1)
+            intensities[chunk] = (f_hkl * f_hkl.conjugate()).real
+
+        lorentz_factor = (1 + np.cos(2 * theta) ** 2) / (np.sin(theta) ** 2 * np.cos(theta))
+        intensities *= lorentz_factor
+
+        # group reflections with the same two theta, the stable sort keeps the given order within a peak
+        order = np.argsort(two_theta, kind='stable')
+        new_peak = np.concatenate(([True], np.diff(two_theta[order]) >= CifConverter.TWO_THETA_TOL))
+        peak_starts = np.nonzero(new_peak)[0]
+        peak_ids = np.cumsum(new_peak) - 1
+
+        peak_intensities = np.add.reduceat(intensities[order], peak_starts)
+        first_reflections = np.minimum.reduceat(order, peak_starts)
+
+        # multiplicity of the family (permutations of |h|, |k|, |l|) of the first reflection in each peak
+        families = np.sort(np.abs(hkl), axis=1)
+        same_family = np.all(families[order] == families[first_reflections][peak_ids], axis=1)
+        multiplicities = np.bincount(peak_ids, weights=same_family).astype(int)
+
+        scaled_intensities = peak_intensities / np.max(peak_intensities) * 100
         calculated_reflections = []
-        for k in sorted(peaks.keys()):
-            v = peaks[k]
-            scaled_intensity = v[0] / max_intensity * 100
-            fam = get_unique_families(v[1])
-            if scaled_intensity > self.min_intensity:
-                calculated_reflections.append(
-                    Reflection(
-                        *list(fam.keys())[0],
-                        d_spacing=v[2],
-                        intensity=scaled_intensity,
-                        multiplicity=fam[list(fam.keys())[0]]
-                    )
+        for peak in np.nonzero(scaled_intensities > self.min_intensity)[0]:
+            ind = first_reflections[peak]
+            calculated_reflections.append(
+                Reflection(
+                    *hkl[ind].tolist(),
+                    d_spacing=d_hkl[ind],
+                    intensity=scaled_intensities[peak],
+                    multiplicity=int(multiplicities[peak])
                 )
+            )
 
         return calculated_reflections
 
@@ -303,22 +296,15 @@ def get_unique_families(hkls):
         {hkl: multiplicity}: A dict with unique hkl and multiplicity.
     """
 
-    # TODO: Definitely can be sped up.
-    def is_perm(hkl1, hkl2):
-        h1 = map(abs, hkl1)
-        h2 = map(abs, hkl2)
-        return all([i == j for i, j in zip(sorted(h1), sorted(h2))])
-
     unique = {}
-    for hkl1 in hkls:
-        found = False
-        for hkl2 in unique.keys():
-            if is_perm(hkl1, hkl2):
-                found = True
-                unique[hkl2] += 1
-                break
-        if not found:
-            unique[hkl1] = 1
+    family_members = {}
+    for hkl in hkls:
+        family = tuple(sorted(map(abs, hkl)))
+        if family in family_members:
+            unique[family_members[family]] += 1
+        else:
+            family_members[family] = hkl
+            unique[hkl] = 1
 
     return unique
 
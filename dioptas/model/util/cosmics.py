@@ -59,9 +59,11 @@ Malte Tewes, January 2010
 __version__ = '0.4'
 
 import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import math
-import scipy.signal as signal
 import scipy.ndimage as ndimage
 
 
@@ -236,11 +238,6 @@ class cosmicsimage:
             "Cleaning cosmic affected pixels ..."
 
         # So... mask is a 2D array containing False and True, where True means "here is a cosmic"
-        # We want to loop through these cosmics one by one.
-        cosmicindices = np.argwhere(mask)
-        # This is a list of the indices of cosmic affected pixels.
-        # print cosmicindices
-
         # We put cosmic ray pixels to np.Inf to flag them :
         self.cleanarray[mask] = np.Inf
 
@@ -256,35 +253,25 @@ class cosmicsimage:
         # np.Inf, if available :
         if self.satstars is not None:
             padarray[2:w + 2, 2:h + 2][self.satstars] = np.Inf
-            # Viva python, I tested this one, it works...
-
-        # A loop through every cosmic pixel :
-        for cosmicpos in cosmicindices:
-            x = cosmicpos[0]
-            y = cosmicpos[1]
-            # remember the shift due to the padding !
-            cutout = padarray[x:x + 5, y:y + 5].ravel()
-            # print cutout
-            # Now we have our 25 pixels, some of them are np.Inf, and we want
-            # to take the median
-            goodcutout = cutout[cutout != np.Inf]
-            # print np.alen(goodcutout)
-
-            if np.alen(goodcutout) >= 25:
-                # This never happened, but you never know ...
-                raise RuntimeError("Mega error in clean !")
-            elif np.alen(goodcutout) > 0:
-                replacementvalue = np.median(goodcutout)
-            else:
-                # i.e. no good pixels : Shit, a huge cosmic, we will have to
-                # improvise ...
-                print("OH NO, I HAVE A HUUUUUUUGE COSMIC !!!!!")
-                replacementvalue = self.guessbackgroundlevel()
+
+        # Instead of looping through every cosmic pixel, the 5x5 cutouts around all of them are gathered at once
+        # (remember the shift due to the padding, the cutout of pixel x, y starts at padarray[x, y]) :
+        cosmicindices = np.argwhere(mask)
+        if len(cosmicindices) > 0:
+            windows = np.lib.stride_tricks.sliding_window_view(padarray, (5, 5))
+            cutouts = windows[cosmicindices[:, 0], cosmicindices[:, 1]].reshape(-1, 25)
+            cutouts = np.where(cutouts == np.Inf, np.nan, cutouts)
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN cutouts are handled below
+                replacementvalues = np.nanmedian(cutouts, axis=1)
+            # no good pixels : a huge cosmic, we will have to improvise ...
+            replacementvalues[np.all(np.isnan(cutouts), axis=1)] = self.guessbackgroundlevel()
 
             # We update the cleanarray,
             # but measure the medians in the padarray, so to not mix things
             # up...
-            self.cleanarray[x, y] = replacementvalue
+            self.cleanarray[mask] = replacementvalues
 
         # That's it.
         if verbose:
@@ -331,7 +318,7 @@ class cosmicsimage:
 
         # We build a smoothed version of the image to look for large stars and
         # their support :
-        m5 = ndimage.filters.median_filter(
+        m5 = ndimage.median_filter(
             self.rawarray, size=5, mode='mirror')
         # We look where this is above half the satlevel
         largestruct = m5 > (self.satlevel / 2.0)
@@ -443,21 +430,15 @@ class cosmicsimage:
             "Convolving image with Laplacian kernel ..."
 
         # We subsample, convolve, clip negative values, and rebin to original
-        # size
-        subsam = subsample(self.cleanarray)
-        conved = signal.convolve2d(
-            subsam, laplkernel, mode="same", boundary="symm")
-        cliped = conved.clip(min=0.0)
-        # cliped = np.abs(conved) # unfortunately this does not work to find
-        # holes as well ...
-        lplus = rebin2x2(cliped)
+        # size (all in one go, see laplacian_plus)
+        lplus = laplacian_plus(self.cleanarray)
 
         if verbose:
             print()
             "Creating noise model ..."
 
         # We build a custom noise map, so to compare the laplacian to
-        m5 = ndimage.filters.median_filter(
+        m5 = ndimage.median_filter(
             self.cleanarray, size=5, mode='mirror')
         # We keep this m5, as I will use it later for the interpolation.
         m5clipped = m5.clip(min=0.00001)  # As we will take the sqrt
@@ -473,7 +454,7 @@ class cosmicsimage:
         # This s is called sigmap in the original lacosmic.cl
 
         # We remove the large structures (s prime) :
-        sp = s - ndimage.filters.median_filter(s, size=5, mode='mirror')
+        sp = s - ndimage.median_filter(s, size=5, mode='mirror')
 
         if verbose:
             print()
@@ -506,9 +487,9 @@ class cosmicsimage:
             "Building fine structure image ..."
 
         # We build the fine structure image :
-        m3 = ndimage.filters.median_filter(
+        m3 = ndimage.median_filter(
             self.cleanarray, size=3, mode='mirror')
-        m37 = ndimage.filters.median_filter(m3, size=7, mode='mirror')
+        m37 = ndimage.median_filter(m3, size=7, mode='mirror')
         f = m3 - m37
         # In the article that's it, but in lacosmic.cl f is divided by the noise...
         # Ok I understand why, it depends on if you use sp/f or L+/f as criterion.
@@ -541,8 +522,7 @@ class cosmicsimage:
 
         # We grow these cosmics a first time to determine the immediate
         # neighborhod  :
-        growcosmics = np.cast['bool'](
-            signal.convolve2d(np.cast['float32'](cosmics), growkernel, mode="same", boundary="symm"))
+        growcosmics = ndimage.binary_dilation(cosmics, structure=growkernel)
 
         # From this grown set, we keep those that have sp > sigmalim
         # so obviously not requiring sp/f > objlim, otherwise it would be
@@ -552,8 +532,7 @@ class cosmicsimage:
         # Now we repeat this procedure, but lower the detection limit to
         # sigmalimlow :
 
-        finalsel = np.cast['bool'](
-            signal.convolve2d(np.cast['float32'](growcosmics), growkernel, mode="same", boundary="symm"))
+        finalsel = ndimage.binary_dilation(growcosmics, structure=growkernel)
         finalsel = np.logical_and(sp > self.sigcliplow, finalsel)
 
         # Again, we have to kick out pixels on saturated stars :
@@ -600,7 +579,7 @@ class cosmicsimage:
         if verbose :
             print "Finding holes ..."
 
-        m3 = ndimage.filters.median_filter(self.cleanarray, size=3, mode='mirror')
+        m3 = ndimage.median_filter(self.cleanarray, size=3, mode='mirror')
         h = (m3 - self.cleanarray).clip(min=0.0)
         
         tofits("h.fits", h)
@@ -618,7 +597,7 @@ class cosmicsimage:
         
         tofits("lplus.fits", lplus)
         
-        m5 = ndimage.filters.median_filter(self.cleanarray, size=5, mode='mirror')
+        m5 = ndimage.median_filter(self.cleanarray, size=5, mode='mirror')
         m5clipped = m5.clip(min=0.00001)
         noise = (1.0/self.gain) * np.sqrt(self.gain*m5clipped + self.readnoise*self.readnoise)
  
@@ -626,7 +605,7 @@ class cosmicsimage:
         # This s is called sigmap in the original lacosmic.cl
         
         # We remove the large structures (s prime) :
-        sp = s - ndimage.filters.median_filter(s, size=5, mode='mirror')
+        sp = s - ndimage.median_filter(s, size=5, mode='mirror')
         
         holes = sp > self.sigclip   
         """
@@ -678,6 +657,57 @@ class cosmicsimage:
 
 # Top-level functions
 
+# tiles are processed concurrently, most of the time is spent in numpy and scipy routines
+_cosmics_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# number of pixels a single L.A.Cosmic iteration (detection and cleaning) looks around a pixel
+ITERATION_MARGIN = 8
+
+
+def find_cosmics(img, sigclip=3.0, sigfrac=0.3, objlim=3.0, gain=2.2, readnoise=10.0, iterations=2,
+                 tile_size=1024):
+    """
+    Runs several L.A.Cosmic iterations (including the cleaning in between) on an image and returns the mask of
+    detected cosmic ray pixels.
+    The image is split into tiles, which overlap by the distance a pixel is influenced by its neighbours in the given
+    number of iterations, and the tiles are processed concurrently. The result is the same as running cosmicsimage
+    on the whole image.
+
+    :param img: 2D image array
+    :param iterations: number of L.A.Cosmic iterations
+    :param tile_size: size of the tiles in pixels, without the overlap
+    :return: boolean mask with the same shape as img
+    """
+    img = np.asarray(img, dtype=np.float64)
+    backgroundlevel = np.median(img)  # used for filling huge cosmics, has to be the same for all tiles
+    margin = ITERATION_MARGIN * iterations
+
+    futures = []
+    for row in range(0, img.shape[0], tile_size):
+        for col in range(0, img.shape[1], tile_size):
+            row_start, col_start = max(0, row - margin), max(0, col - margin)
+            tile = img[row_start:row + tile_size + margin, col_start:col + tile_size + margin]
+            future = _cosmics_executor.submit(_find_cosmics_in_tile, tile, backgroundlevel, iterations,
+                                              sigclip=sigclip, sigfrac=sigfrac, objlim=objlim, gain=gain,
+                                              readnoise=readnoise)
+            futures.append((row, col, row - row_start, col - col_start, future))
+
+    mask = np.zeros(img.shape, dtype=bool)
+    for row, col, row_offset, col_offset, future in futures:
+        tile_mask = future.result()
+        mask[row:row + tile_size, col:col + tile_size] = \
+            tile_mask[row_offset:row_offset + tile_size, col_offset:col_offset + tile_size]
+    return mask
+
+
+def _find_cosmics_in_tile(tile, backgroundlevel, iterations, **kwargs):
+    cosmic_img = cosmicsimage(tile, verbose=False, **kwargs)
+    cosmic_img.backgroundlevel = backgroundlevel
+    for _ in range(iterations):
+        cosmic_img.lacosmiciteration()
+        cosmic_img.clean()
+    return cosmic_img.mask
+
 
 # def fullarray(verbose = False):
 #   """
@@ -694,6 +724,25 @@ class cosmicsimage:
 
 # Array manipulation
 
+def laplacian_plus(a):
+    """
+    Returns the positive part of the Laplacian of the 2x2-subsampled array a, rebinned to the original size, i.e. the
+    same as rebin2x2(signal.convolve2d(subsample(a), laplkernel, mode="same", boundary="symm").clip(min=0.0)).
+    Every subsampled pixel sees its original pixel and one neighbour along each axis, so the four subsampled pixels
+    can be calculated directly from the shifted array, without creating the 4 times larger subsampled array.
+    """
+    padarray = np.pad(a, 1, mode='edge')  # equals the symmetric boundary of the subsampled array
+    row_neighbours = (padarray[:-2, 1:-1], padarray[2:, 1:-1])
+    col_neighbours = (padarray[1:-1, :-2], padarray[1:-1, 2:])
+
+    lplus = np.zeros(a.shape)
+    for row_neighbour in row_neighbours:
+        diff = 2.0 * a - row_neighbour
+        for col_neighbour in col_neighbours:
+            lplus += (diff - col_neighbour).clip(min=0.0)
+    return lplus / 4.0
+
+
 def subsample(a):  # this is more a generic function then a method ...
     """
     Returns a 2x2-subsampled version of array a (no interpolation, just cutting pixels in 4).
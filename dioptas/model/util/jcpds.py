@@ -39,7 +39,6 @@ logger = logging.getLogger(__name__)
 
 import string
 import numpy as np
-from scipy.optimize import minimize
 import os
 
 
@@ -68,6 +67,11 @@ class jcpds_reflection:
         return "{:2d},{:2d},{:2d}\t{:.2f}\t{:.3f}".format(self.h, self.k, self.l, self.intensity, self.d0)
 
 
+# record layout of the reflections stored in a jcpds object
+REFLECTION_DTYPE = np.dtype([('h', np.int64), ('k', np.int64), ('l', np.int64),
+                             ('intensity', np.float64), ('d0', np.float64), ('d', np.float64)])
+
+
 class MyDict(dict):
     def __init__(self):
         super(MyDict, self).__init__()
@@ -113,7 +117,7 @@ class jcpds(object):
         self.params['v'] = 0.
         self.params['pressure'] = 0.
         self.params['temperature'] = 298.
-        self.reflections = []
+        self.reflection_data = np.zeros(0, dtype=REFLECTION_DTYPE)
         self.params['modified'] = False
 
     def load_file(self, filename):
@@ -196,7 +200,7 @@ class jcpds(object):
         if (pos >= 0): name = name[0:pos]
         self._name = name
         self.params['comments'] = []
-        self.reflections = []
+        reflections = []
 
         # Determine what version JCPDS file this is
         # In current files have the first line starts with the string VERSION:
@@ -247,13 +251,7 @@ class jcpds(object):
                 elif tag == 'DIHKL:':
                     dtemp = value.split()
                     dtemp = list(map(float, dtemp))
-                    reflection = jcpds_reflection()
-                    reflection.d0 = dtemp[0]
-                    reflection.intensity = dtemp[1]
-                    reflection.h = int(dtemp[2])
-                    reflection.k = int(dtemp[3])
-                    reflection.l = int(dtemp[4])
-                    self.reflections.append(reflection)
+                    reflections.append((int(dtemp[2]), int(dtemp[3]), int(dtemp[4]), dtemp[1], dtemp[0], dtemp[0]))
         else:
             # This is an old format JCPDS file
             self.version = 1.
@@ -282,15 +280,10 @@ class jcpds(object):
                 if line == '': break
                 dtemp = line.split()
                 dtemp = list(map(float, dtemp))
-                reflection = jcpds_reflection()
-                reflection.d0 = dtemp[0]
-                reflection.intensity = dtemp[1]
-                reflection.h = int(dtemp[2])
-                reflection.k = int(dtemp[3])
-                reflection.l = int(dtemp[4])
-                self.reflections.append(reflection)
+                reflections.append((int(dtemp[2]), int(dtemp[3]), int(dtemp[4]), dtemp[1], dtemp[0], dtemp[0]))
 
         fp.close()
+        self.reflection_data = np.array(reflections, dtype=REFLECTION_DTYPE)
         self.compute_v0()
         self.params['a'] = self.params['a0']
         self.params['b'] = self.params['b0']
@@ -302,8 +295,7 @@ class jcpds(object):
         # Compute D spacings, make sure they are consistent with the input values
 
         self.compute_d()
-        for reflection in self.reflections:
-            reflection.d0 = reflection.d
+        self.reflection_data['d0'] = self.reflection_data['d']
 
         self.params['modified'] = False
 
@@ -487,8 +479,8 @@ class jcpds(object):
               2) Computes volume at zero-pressure and the specified temperature
                  if ALPHAT0 is non-zero.
               3) Computes the volume at the specified pressure if K0 is non-zero.
-                 The routine uses the IDL function FX_ROOT to solve the third
-                 order Birch-Murnaghan equation of state.
+                 The third order Birch-Murnaghan equation of state is solved
+                 with birch_murnaghan_inverse.
 
         Example:
            Compute the unit cell volume of alumina at 100 GPa and 2500 K.
@@ -510,34 +502,67 @@ class jcpds(object):
         # Assume 0 K really means room T
         if temperature == 0: temperature = 298.
 
-        # Compute values of K0, K0P and alphat at this temperature
+        # Compute values of K0P and alphat at this temperature
         self.params['alpha_t'] = self.params['alpha_t0'] + self.params['d_alpha_dt'] * (temperature - 298.)
         self.params['k0p'] = self.params['k0p0'] + self.params['dk0pdt'] * (temperature - 298.)
 
-        k0 = self.params['k0'] + self.params['dk0dt'] * (temperature - 298.)
-        k0p = self.params['k0p']
-
-        if pressure == 0.:
-            self.params['v'] = self.params['v0'] * (1 + self.params['alpha_t'] * (temperature - 298.))
-        if pressure < 0:
-            if self.params['k0'] <= 0.:
-                logger.info('K0 is zero, computing zero pressure volume')
-                self.params['v'] = self.params['v0']
-            else:
-                self.params['v'] = self.params['v0'] * (1 - pressure / self.params['k0'])
-        else:
-            if self.params['k0'] <= 0.:
-                logger.info('K0 is zero, computing zero pressure volume')
-                self.params['v'] = self.params['v0']
-            else:
-                self.mod_pressure = pressure - \
-                                    self.params['alpha_t'] * k0 * (temperature - 298.)
-                res = minimize(self.bm3_inverse, 1.,
-                               args=(k0, k0p, self.mod_pressure),
-                               method='Nelder-Mead')
-                if not res.success:
-                    raise ArithmeticError("minimize didn't find a minimum!\n" + str(res))
-                self.params['v'] = self.params['v0'] / np.float(res.x)
+        if self.params['k0'] <= 0.:
+            logger.info('K0 is zero, computing zero pressure volume')
+
+        volume = self.compute_volumes(pressure, temperature)[0]
+        if not np.isfinite(volume):
+            raise ArithmeticError("Unable to solve the Birch-Murnaghan equation of state for {} GPa".format(pressure))
+        self.params['v'] = float(volume)
+
+    def compute_volumes(self, pressures, temperatures=None):
+        """
+        Computes the unit cell volumes for many pressure and temperature conditions at once, following the same
+        procedure as compute_volume. In contrast to compute_volume, the parameters of the jcpds object are not changed.
+
+        :param pressures: pressures in GPa, scalar or array
+        :param temperatures: temperatures in K, scalar or array (broadcast against pressures). If None, the current
+                             temperature of the jcpds is used.
+        :return: array of unit cell volumes
+        """
+        if temperatures is None:
+            temperatures = self.params['temperature']
+        pressures, temperatures = np.broadcast_arrays(np.atleast_1d(np.asarray(pressures, dtype=float)),
+                                                      np.atleast_1d(np.asarray(temperatures, dtype=float)))
+        # Assume 0 K really means room T
+        temperatures = np.where(temperatures == 0, 298., temperatures)
+
+        v0 = self.params['v0']
+        if self.params['k0'] <= 0.:
+            return np.full(pressures.shape, float(v0))
+
+        delta_t = temperatures - 298.
+        alpha_t = self.params['alpha_t0'] + self.params['d_alpha_dt'] * delta_t
+        k0p = self.params['k0p0'] + self.params['dk0pdt'] * delta_t
+        k0 = self.params['k0'] + self.params['dk0dt'] * delta_t
+
+        mod_pressures = pressures - alpha_t * k0 * delta_t
+        volumes = v0 / birch_murnaghan_inverse(mod_pressures, k0, k0p)
+        negative = pressures < 0
+        volumes[negative] = v0 * (1 - pressures[negative] / self.params['k0'])
+        return volumes
+
+    def compute_d_spacings(self, pressures, temperatures=None):
+        """
+        Computes the d spacings of all reflections for many pressure and temperature conditions at once. The
+        parameters of the jcpds object and the d spacings stored in the reflections are not changed.
+
+        :param pressures: pressures in GPa, scalar or array
+        :param temperatures: temperatures in K, scalar or array (broadcast against pressures). If None, the current
+                             temperature of the jcpds is used.
+        :return: d spacing array with shape (number of conditions, number of reflections)
+        """
+        ratios = (self.compute_volumes(pressures, temperatures) / self.params['v0']) ** (1.0 / 3.0)
+        degree_to_radians = np.pi / 180.
+        d_spacings = self._calculate_d_spacings(self.params['a0'], self.params['b0'], self.params['c0'],
+                                                self.params['alpha0'] * degree_to_radians,
+                                                self.params['beta0'] * degree_to_radians,
+                                                self.params['gamma0'] * degree_to_radians)
+        return ratios[:, np.newaxis] * d_spacings[np.newaxis, :]
 
     def bm3_inverse(self, v0_v, k0, k0p, pressure):
         """
@@ -584,55 +609,7 @@ class jcpds(object):
         beta = self.params['beta0'] * degree_to_radians
         gamma = self.params['gamma0'] * degree_to_radians
 
-        h = np.zeros(len(self.reflections))
-        k = np.zeros(len(self.reflections))
-        l = np.zeros(len(self.reflections))
-
-        for ind, reflection in enumerate(self.reflections):
-            h[ind] = reflection.h
-            k[ind] = reflection.k
-            l[ind] = reflection.l
-
-        if self.params['symmetry'] == 'CUBIC':
-            d2inv = (h ** 2 + k ** 2 + l ** 2) / a ** 2
-        elif self.params['symmetry'] == 'TETRAGONAL':
-            d2inv = (h ** 2 + k ** 2) / a ** 2 + l ** 2 / c ** 2
-        elif self.params['symmetry'] == 'ORTHORHOMBIC':
-            d2inv = h ** 2 / a ** 2 + k ** 2 / b ** 2 + l ** 2 / c ** 2
-        elif self.params['symmetry'] == 'HEXAGONAL' or self.params['symmetry'] == 'TRIGONAL':
-            d2inv = (h ** 2 + h * k + k ** 2) * 4. / 3. / a ** 2 + l ** 2 / c ** 2
-        elif self.params['symmetry'] == 'RHOMBOHEDRAL':
-            d2inv = (((1. + np.cos(alpha)) * ((h ** 2 + k ** 2 + l ** 2) -
-                                              (1 - np.tan(0.5 * alpha) ** 2) * (h * k + k * l + l * h))) /
-                     (a ** 2 * (1 + np.cos(alpha) - 2 * np.cos(alpha) ** 2)))
-        elif self.params['symmetry'] == 'MONOCLINIC':
-            d2inv = (h ** 2 / np.sin(beta) ** 2 / a ** 2 +
-                     k ** 2 / b ** 2 +
-                     l ** 2 / np.sin(beta) ** 2 / c ** 2 +
-                     2 * h * l * np.cos(beta) / (a * c * np.sin(beta) ** 2))
-        elif self.params['symmetry'] == 'TRICLINIC':
-            V = (a * b * c *
-                 np.sqrt(1. - np.cos(alpha) ** 2 - np.cos(beta) ** 2 -
-                         np.cos(gamma) ** 2 +
-                         2 * np.cos(alpha) * np.cos(beta) * np.cos(gamma)))
-            s11 = b ** 2 * c ** 2 * np.sin(alpha) ** 2
-            s22 = a ** 2 * c ** 2 * np.sin(beta) ** 2
-            s33 = a ** 2 * b ** 2 * np.sin(gamma) ** 2
-            s12 = a * b * c ** 2 * (np.cos(alpha) * np.cos(beta) -
-                                    np.cos(gamma))
-            s23 = a ** 2 * b * c * (np.cos(beta) * np.cos(gamma) -
-                                    np.cos(alpha))
-            s31 = a * b ** 2 * c * (np.cos(gamma) * np.cos(alpha) -
-                                    np.cos(beta))
-            d2inv = (s11 * h ** 2 + s22 * k ** 2 + s33 * l ** 2 +
-                     2. * s12 * h * k + 2. * s23 * k * l + 2. * s31 * l * h) / V ** 2
-        else:
-            logger.error(('Unknown crystal symmetry = ' + self.params['symmetry']))
-            d2inv = 1
-        d_spacings = np.sqrt(1. / d2inv)
-
-        for ind in range(len(self.reflections)):
-            self.reflections[ind].d0 = d_spacings[ind]
+        self.reflection_data['d0'] = self._calculate_d_spacings(a, b, c, alpha, beta, gamma)
 
     def compute_d(self, pressure=None, temperature=None):
         """
@@ -674,7 +651,7 @@ class jcpds(object):
 
         # Assume each cell dimension changes by the same fractional amount = cube
         # root of volume change ratio
-        ratio = np.float((self.params['v'] / self.params['v0']) ** (1.0 / 3.0))
+        ratio = float((self.params['v'] / self.params['v0']) ** (1.0 / 3.0))
         self.params['a'] = self.params['a0'] * ratio
         self.params['b'] = self.params['b0'] * ratio
         self.params['c'] = self.params['c0'] * ratio
@@ -687,33 +664,47 @@ class jcpds(object):
         beta = self.params['beta0'] * dtor
         gamma = self.params['gamma0'] * dtor
 
-        h = np.zeros(len(self.reflections))
-        k = np.zeros(len(self.reflections))
-        l = np.zeros(len(self.reflections))
-
-        for ind, reflection in enumerate(self.reflections):
-            h[ind] = reflection.h
-            k[ind] = reflection.k
-            l[ind] = reflection.l
+        self.reflection_data['d'] = self._calculate_d_spacings(a, b, c, alpha, beta, gamma)
 
-        if self.params['symmetry'] == 'CUBIC':
-            d2inv = (h ** 2 + k ** 2 + l ** 2) / a ** 2
-        elif self.params['symmetry'] == 'TETRAGONAL':
-            d2inv = (h ** 2 + k ** 2) / a ** 2 + l ** 2 / c ** 2
-        elif self.params['symmetry'] == 'ORTHORHOMBIC':
-            d2inv = h ** 2 / a ** 2 + k ** 2 / b ** 2 + l ** 2 / c ** 2
-        elif self.params['symmetry'] == 'HEXAGONAL' or self.params['symmetry'] == 'TRIGONAL':
-            d2inv = (h ** 2 + h * k + k ** 2) * 4. / 3. / a ** 2 + l ** 2 / c ** 2
-        elif self.params['symmetry'] == 'RHOMBOHEDRAL':
-            d2inv = (((1. + np.cos(alpha)) * ((h ** 2 + k ** 2 + l ** 2) -
-                                              (1 - np.tan(0.5 * alpha) ** 2) * (h * k + k * l + l * h))) /
-                     (a ** 2 * (1 + np.cos(alpha) - 2 * np.cos(alpha) ** 2)))
-        elif self.params['symmetry'] == 'MONOCLINIC':
-            d2inv = (h ** 2 / (np.sin(beta) ** 2 * a ** 2) +
-                     k ** 2 / b ** 2 +
-                     l ** 2 / (np.sin(beta) ** 2 * c ** 2) -
-                     2 * h * l * np.cos(beta) / (a * c * np.sin(beta) ** 2))
-        elif self.params['symmetry'] == 'TRICLINIC':
+    def _calculate_d_spacings(self, a, b, c, alpha, beta, gamma):
+        """
+        Calculates the d spacings of all reflections for the given lattice parameters (angles in radians). The
+        symmetry specific formula is expressed as quadratic form 1/d^2 = c1*h^2 + c2*k^2 + c3*l^2 + c4*hk + c5*kl + c6*lh,
+        so that only the six coefficients depend on the lattice and all reflections are calculated in one dot product.
+        """
+        coefficients = self._get_d2inv_coefficients(a, b, c, alpha, beta, gamma)
+        if coefficients is None:
+            return np.ones(len(self.reflection_data))
+        h = self.reflection_data['h']
+        k = self.reflection_data['k']
+        l = self.reflection_data['l']
+        hkl_terms = np.stack((h * h, k * k, l * l, h * k, k * l, l * h), axis=1)
+        return np.sqrt(1. / np.dot(hkl_terms, coefficients))
+
+    def _get_d2inv_coefficients(self, a, b, c, alpha, beta, gamma):
+        """
+        :return: coefficients of the h^2, k^2, l^2, hk, kl and lh terms of 1/d^2 for the current symmetry
+        """
+        symmetry = self.params['symmetry']
+        if symmetry == 'CUBIC':
+            return np.array([1., 1., 1., 0., 0., 0.]) / a ** 2
+        elif symmetry == 'TETRAGONAL':
+            return np.array([1. / a ** 2, 1. / a ** 2, 1. / c ** 2, 0., 0., 0.])
+        elif symmetry == 'ORTHORHOMBIC':
+            return np.array([1. / a ** 2, 1. / b ** 2, 1. / c ** 2, 0., 0., 0.])
+        elif symmetry == 'HEXAGONAL' or symmetry == 'TRIGONAL':
+            return np.array([4. / 3. / a ** 2, 4. / 3. / a ** 2, 1. / c ** 2, 4. / 3. / a ** 2, 0., 0.])
+        elif symmetry == 'RHOMBOHEDRAL':
+            square = (1. + np.cos(alpha)) / (a ** 2 * (1 + np.cos(alpha) - 2 * np.cos(alpha) ** 2))
+            mixed = -square * (1 - np.tan(0.5 * alpha) ** 2)
+            return np.array([square, square, square, mixed, mixed, mixed])
+        elif symmetry == 'MONOCLINIC':
+            return np.array([1. / (np.sin(beta) ** 2 * a ** 2),
+                             1. / b ** 2,
+                             1. / (np.sin(beta) ** 2 * c ** 2),
+                             0., 0.,
+                             -2 * np.cos(beta) / (a * c * np.sin(beta) ** 2)])
+        elif symmetry == 'TRICLINIC':
             V = (a * b * c *
                  np.sqrt(1. - np.cos(alpha) ** 2 - np.cos(beta) ** 2 -
                          np.cos(gamma) ** 2 +
@@ -727,22 +718,62 @@ class jcpds(object):
                                     np.cos(alpha))
             s31 = a * b ** 2 * c * (np.cos(gamma) * np.cos(alpha) -
                                     np.cos(beta))
-            d2inv = (s11 * h ** 2 + s22 * k ** 2 + s33 * l ** 2 +
-                     2. * s12 * h * k + 2. * s23 * k * l + 2. * s31 * l * h) / V ** 2
+            return np.array([s11, s22, s33, 2. * s12, 2. * s23, 2. * s31]) / V ** 2
         else:
-            logger.error(('Unknown crystal symmetry = ' + self.params['symmetry']))
-            d2inv = 1
-        d_spacings = np.sqrt(1. / d2inv)
-        for ind in range(len(self.reflections)):
-            self.reflections[ind].d = d_spacings[ind]
+            logger.error(('Unknown crystal symmetry = ' + symmetry))
+            return None
+
+    @property
+    def reflections(self):
+        """
+        List of the reflections as jcpds_reflection objects. These are copies of the reflection data, changes have to
+        be set with set_reflection.
+        """
+        reflections = []
+        for h, k, l, intensity, d0, d in self.reflection_data.tolist():
+            reflection = jcpds_reflection(h, k, l, intensity, d0)
+            reflection.d = d
+            reflections.append(reflection)
+        return reflections
+
+    @reflections.setter
+    def reflections(self, reflections):
+        self.reflection_data = np.array([(r.h, r.k, r.l, r.intensity, r.d0, r.d) for r in reflections],
+                                        dtype=REFLECTION_DTYPE)
 
     def add_reflection(self, h=0., k=0., l=0., intensity=0., d=0.):
-        new_reflection = jcpds_reflection(h, k, l, intensity, d)
-        self.reflections.append(new_reflection)
+        self.add_reflections([h], [k], [l], [intensity], [d])
+
+    def add_reflections(self, h, k, l, intensity, d):
+        """
+        Adds several reflections at once.
+        :param h: h indices
+        :param k: k indices
+        :param l: l indices
+        :param intensity: relative intensities
+        :param d: d spacings
+        """
+        new_reflections = np.zeros(len(h), dtype=REFLECTION_DTYPE)
+        new_reflections['h'] = h
+        new_reflections['k'] = k
+        new_reflections['l'] = l
+        new_reflections['intensity'] = intensity
+        new_reflections['d0'] = d
+        new_reflections['d'] = d
+        self.reflection_data = np.concatenate((self.reflection_data, new_reflections))
+        self.params['modified'] = True
+
+    def set_reflection(self, ind, reflection):
+        """
+        Replaces the reflection with index ind.
+        :type reflection: jcpds_reflection
+        """
+        self.reflection_data[ind] = (reflection.h, reflection.k, reflection.l,
+                                     reflection.intensity, reflection.d0, reflection.d)
         self.params['modified'] = True
 
     def delete_reflection(self, ind):
-        del self.reflections[ind]
+        self.reflection_data = np.delete(self.reflection_data, ind)
         self.params['modified'] = True
 
     def get_reflections(self):
@@ -755,53 +786,71 @@ class jcpds(object):
     def reorder_reflections_by_index(self, ind_list, reversed_toggle=False):
         if reversed_toggle:
             ind_list = ind_list[::-1]
-        new_reflections = []
-        for ind in ind_list:
-            new_reflections.append(self.reflections[ind])
-
-        modified_flag = self.params['modified']
-        self.reflections = new_reflections
-        self.params['modified'] = modified_flag
+        self.reflection_data = self.reflection_data[ind_list]
 
     def sort_reflections_by_h(self, reversed_toggle=False):
-        h_list = []
-        for reflection in self.reflections:
-            h_list.append(reflection.h)
-        sorted_ind = np.argsort(h_list)
+        sorted_ind = np.argsort(self.reflection_data['h'])
         self.reorder_reflections_by_index(sorted_ind, reversed_toggle)
 
     def sort_reflections_by_k(self, reversed_toggle=False):
-        k_list = []
-        for reflection in self.reflections:
-            k_list.append(reflection.k)
-        sorted_ind = np.argsort(k_list)
+        sorted_ind = np.argsort(self.reflection_data['k'])
         self.reorder_reflections_by_index(sorted_ind, reversed_toggle)
 
     def sort_reflections_by_l(self, reversed_toggle=False):
-        l_list = []
-        for reflection in self.reflections:
-            l_list.append(reflection.l)
-        sorted_ind = np.argsort(l_list)
+        sorted_ind = np.argsort(self.reflection_data['l'])
         self.reorder_reflections_by_index(sorted_ind, reversed_toggle)
 
     def sort_reflections_by_intensity(self, reversed_toggle=False):
-        intensity_list = []
-        for reflection in self.reflections:
-            intensity_list.append(reflection.intensity)
-        sorted_ind = np.argsort(intensity_list)
+        sorted_ind = np.argsort(self.reflection_data['intensity'])
         self.reorder_reflections_by_index(sorted_ind, reversed_toggle)
 
     def sort_reflections_by_d(self, reversed_toggle=False):
-        d_list = []
-        for reflection in self.reflections:
-            d_list.append(reflection.d0)
-        sorted_ind = np.argsort(d_list)
+        sorted_ind = np.argsort(self.reflection_data['d0'])
         self.reorder_reflections_by_index(sorted_ind, reversed_toggle)
 
     def has_thermal_expansion(self):
         return (self.params['alpha_t0'] != 0) or (self.params['d_alpha_dt'] != 0)
 
 
+def birch_murnaghan_inverse(pressure, k0, k0p, max_iterations=50):
+    """
+    Solves the third order Birch-Murnaghan equation of state for V0/V. The solution of the Murnaghan equation
+    (1 + K0' P / K0)^(1/K0') is used as starting value for Newton iterations on f = (V0/V)^(2/3), which usually
+    converge in a few steps. All inputs can be scalars or arrays and are broadcast against each other.
+
+    :param pressure: pressure in GPa
+    :param k0: bulk modulus in GPa
+    :param k0p: pressure derivative of the bulk modulus
+    :param max_iterations: maximum number of Newton iterations
+    :return: V0/V, a float for scalar input, otherwise an array
+    """
+    pressure, k0, k0p = np.broadcast_arrays(np.asarray(pressure, dtype=float),
+                                            np.asarray(k0, dtype=float),
+                                            np.asarray(k0p, dtype=float))
+    c = 0.75 * (k0p - 4.)
+
+    # closed form seed from the Murnaghan equation of state
+    base = 1 + k0p * pressure / k0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v0_v = np.where((base > 0) & (k0p != 0), base ** (1. / k0p), np.exp(pressure / k0))
+    f = np.where(np.isfinite(v0_v) & (v0_v > 0), v0_v, 1.) ** (2. / 3.)
+
+    for _ in range(max_iterations):
+        f25 = f ** 2.5
+        f35 = f25 * f
+        residual = 1.5 * k0 * (f35 - f25) * (1 + c * (f - 1)) - pressure
+        derivative = 1.5 * k0 * ((3.5 * f35 - 2.5 * f25) / f * (1 + c * (f - 1)) + (f35 - f25) * c)
+        step = residual / derivative
+        f = np.clip(f - step, 0.5 * f, 2 * f)
+        if np.all(np.abs(step) <= 1e-14 * f):
+            break
+
+    v0_v = f ** 1.5
+    if v0_v.ndim == 0:
+        return float(v0_v)
+    return v0_v
+
+
 def lookup_jcpds_line(in_string,
                       pressure=0.,
                       temperature=0.,
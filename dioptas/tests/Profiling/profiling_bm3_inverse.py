@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Compares the previous scalar Nelder-Mead inversion of the Birch-Murnaghan equation of state with the vectorized
+# Newton solver used by jcpds.compute_volume and jcpds.compute_volumes.
+
+import os
+import time
+
+import numpy as np
+from scipy.optimize import minimize
+
+from dioptas.model.util.jcpds import jcpds, birch_murnaghan_inverse
+
+jcpds_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'jcpds')
+
+k0 = 166.65
+k0p = 5.4823
+pressures = np.linspace(0, 300, 2000)
+
+
+def bm3_residual(v0_v, k0, k0p, pressure):
+    return (1.5 * k0 * (v0_v ** (7. / 3.) - v0_v ** (5. / 3.)) *
+            (1 + 0.75 * (k0p - 4.) * (v0_v ** (2. / 3.) - 1.0)) - pressure) ** 2
+
+
+def bm3_pressure(v0_v):
+    return 1.5 * k0 * (v0_v ** (7. / 3.) - v0_v ** (5. / 3.)) * (1 + 0.75 * (k0p - 4.) * (v0_v ** (2. / 3.) - 1))
+
+
+t1 = time.time()
+v0_v_minimize = np.array([minimize(bm3_residual, 1., args=(k0, k0p, pressure), method='Nelder-Mead').x[0]
+                          for pressure in pressures])
+time_minimize = time.time() - t1
+
+t1 = time.time()
+v0_v_scalar = np.array([birch_murnaghan_inverse(pressure, k0, k0p) for pressure in pressures])
+time_scalar = time.time() - t1
+
+t1 = time.time()
+v0_v_vectorized = birch_murnaghan_inverse(pressures, k0, k0p)
+time_vectorized = time.time() - t1
+
+print('{} pressures'.format(len(pressures)))
+print('scipy minimize (previous): {:.4f} s, max pressure error {:.2e} GPa'.format(
+    time_minimize, np.max(np.abs(bm3_pressure(v0_v_minimize) - pressures))))
+print('Newton, scalar calls:      {:.4f} s, max pressure error {:.2e} GPa'.format(
+    time_scalar, np.max(np.abs(bm3_pressure(v0_v_scalar) - pressures))))
+print('Newton, vectorized:        {:.4f} s, max pressure error {:.2e} GPa'.format(
+    time_vectorized, np.max(np.abs(bm3_pressure(v0_v_vectorized) - pressures))))
+
+phase = jcpds()
+phase.load_file(os.path.join(jcpds_path, 'au_Anderson.jcpds'))
+temperatures = np.linspace(298, 3000, len(pressures))
+
+t1 = time.time()
+for pressure, temperature in zip(pressures, temperatures):
+    phase.compute_d(pressure, temperature)
+time_compute_d = time.time() - t1
+
+t1 = time.time()
+phase.compute_d_spacings(pressures, temperatures)
+time_compute_d_spacings = time.time() - t1
+
+print('jcpds.compute_d loop:      {:.4f} s'.format(time_compute_d))
+print('jcpds.compute_d_spacings:  {:.4f} s'.format(time_compute_d_spacings))
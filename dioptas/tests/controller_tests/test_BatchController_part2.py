@@ -1,6 +1,7 @@
 import os
 import gc
 import shutil
+import numpy as np
 from mock import MagicMock
 
 from ..utility import QtTest
@@ -11,6 +12,7 @@ from ...widgets.integration import IntegrationWidget
 from ...widgets.plot_widgets.ImgWidget import MyRectangle
 from ...controller.integration.BatchController import BatchController
 from ...model.DioptasModel import DioptasModel
+from ...model.util.CakeStack import CakeStackWriter
 from dioptas.controller.integration.phase.PhaseController import PhaseController
 
 unittest_data_path = os.path.join(os.path.dirname(__file__), '../data')
@@ -145,6 +147,24 @@ class BatchControllerTest(QtTest):
         self.assertEqual(self.widget.batch_widget.surf_view.data.shape, (31, 4038))
         self.assertEqual(len(self.widget.batch_widget.surf_view.axis.ticks), 1)
 
+    def test_plot_batch_3d_decimated(self):
+        surf_view = self.widget.batch_widget.surf_view
+        surf_view.max_vertices = 10000
+        self.widget.batch_widget.step_series_widget.start_txt.setValue(10)
+        self.widget.batch_widget.step_series_widget.stop_txt.setValue(40)
+        self.widget.batch_widget.view_3d_btn.setChecked(True)
+        self.controller.plot_batch()
+
+        self.assertEqual(self.widget.batch_widget.step_series_widget.step_txt.value(), 1)
+        self.assertLessEqual(surf_view.data.size, 10000)
+        self.assertEqual(surf_view.data.shape[0], 31)  # no patterns are dropped
+        self.assertAlmostEqual(np.nanmax(surf_view.data),
+                               np.nanmax(self.controller.scale(self.model.batch_model.data[10:41])))
+
+        vertexes = surf_view.surf_view_item._vertexes
+        surf_view.img_histogram_LUT_horizontal.setLevels(0.1, 0.5)
+        self.assertIs(surf_view.surf_view_item._vertexes, vertexes)
+
     def test_img_mouse_click(self):
         # Test only image loading. Waterfall is already tested
         self.controller.img_mouse_click(10, 15)
@@ -156,6 +176,113 @@ class BatchControllerTest(QtTest):
         filename = os.path.join(unittest_data_path, 'lambda', 'testasapo1_1009_00002_m1_part00001.nxs')
         self.assertEqual(self.widget.batch_widget.windowTitle(), f"Batch widget. {filename} - 5")
 
+    def test_plot_image_from_cake_stack(self):
+        cake_file = os.path.join(unittest_data_path, 'test_batch_cakes.h5')
+        writer = CakeStackWriter(cake_file, self.model.batch_model.n_img)
+        for i in range(self.model.batch_model.n_img):
+            writer.add(i, np.ones((10, 20)) * i)
+        writer.close(np.arange(20), np.arange(10))
+        self.model.batch_model.cake_file = cake_file
+
+        self.model.current_configuration.auto_integrate_cake = True
+        self.model.calibration_model.integrate_2d = MagicMock()
+        self.model.calibration_model.integrate_1d_and_2d = MagicMock()
+        self.controller.plot_image(15)
+        os.remove(cake_file)
+
+        self.model.calibration_model.integrate_2d.assert_not_called()
+        self.model.calibration_model.integrate_1d_and_2d.assert_not_called()
+        self.assertEqual(self.model.calibration_model.cake_img.shape, (10, 20))
+        self.assertEqual(self.model.calibration_model.cake_img[0, 0], 15)
+        self.assertTrue(self.model.current_configuration.auto_integrate_cake)
+
+    def test_plot_reduction(self):
+        n_img = self.model.batch_model.n_img
+        self.model.batch_model.reduction_data = {'total_counts': np.arange(n_img) * 2.}
+        self.controller.update_reduction_channels()
+        reduction_cb = self.widget.batch_widget.reduction_cb
+        self.assertEqual(reduction_cb.count(), 2)
+        self.assertTrue(self.widget.batch_widget.reduction_plot.isHidden())
+
+        reduction_cb.setCurrentIndex(1)
+        self.assertFalse(self.widget.batch_widget.reduction_plot.isHidden())
+        x, y = self.widget.batch_widget.reduction_curve.getData()
+        self.assertEqual(len(x), n_img)
+        self.assertEqual(y[3], 6)
+
+        self.controller.plot_image(5)
+        self.assertEqual(self.widget.batch_widget.reduction_frame_line.value(), 5)
+
+        reduction_cb.setCurrentIndex(0)
+        self.assertTrue(self.widget.batch_widget.reduction_plot.isHidden())
+
+    def test_configure_reductions(self):
+        reductions_widget = self.widget.batch_widget.reductions_widget
+        batch_model = self.model.batch_model
+        self.assertTrue(reductions_widget.total_counts_cb.isChecked())
+        self.assertTrue(reductions_widget.max_pixel_cb.isChecked())
+        self.assertFalse(reductions_widget.saturated_pixels_cb.isChecked())
+
+        reductions_widget.max_pixel_cb.setChecked(False)
+        reductions_widget.saturated_pixels_cb.setChecked(True)  # no threshold yet
+        self.assertEqual(set(batch_model.reductions), {'total_counts'})
+
+        reductions_widget.saturation_threshold_txt.setText('100')
+        reductions_widget.saturation_threshold_txt.editingFinished.emit()
+        reductions_widget.roi_sum_cb.setChecked(True)
+        reductions_widget.roi_row_max_sb.setValue(200)
+        reductions_widget.peak_tth_min_txt.setText('10')
+        reductions_widget.peak_tth_max_txt.setText('5')
+        reductions_widget.peak_integral_cb.setChecked(True)
+        self.assertEqual(set(batch_model.reductions), {'total_counts', 'saturated_pixels', 'roi_sum', 'peak_integral'})
+        self.assertEqual(batch_model.reductions['saturated_pixels'].threshold, 100)
+        self.assertEqual(batch_model.reductions['roi_sum'].row_max, 200)
+        self.assertEqual(batch_model.reductions['peak_integral'].tth_min, 5)
+
+        batch_model.integrate_raw_data(num_points=100, start=0, stop=2, step=1, use_all=True)
+        self.controller.update_reduction_channels()
+        self.assertEqual(self.widget.batch_widget.reduction_cb.count(), 5)
+        self.assertEqual(len(batch_model.reduction_data['roi_sum']), 2)
+
+        batch_model.remove_reduction('roi_sum')
+        self.controller.update_reductions_widget()
+        self.assertFalse(reductions_widget.roi_sum_cb.isChecked())
+        self.assertTrue(reductions_widget.saturated_pixels_cb.isChecked())
+
+    def test_update_live_appends_rows(self):
+        batch_model = self.model.batch_model
+        data = batch_model.data
+        n_img = batch_model.n_img
+        batch_model.data = data[:n_img - 5]
+        batch_model.n_img = n_img - 5
+        self.widget.batch_widget.step_series_widget.stop_txt.setValue(n_img - 6)
+        self.widget.batch_widget.view_2d_btn.setChecked(True)
+        self.controller.change_view()
+        img_view = self.widget.batch_widget.img_view
+        plotted_img = img_view.data_img_item.image
+        n_items = len(img_view.img_view_box.addedItems)
+
+        def integrate_new_frames(*args, **kwargs):
+            batch_model.n_img += 1
+            batch_model.data = data[:batch_model.n_img]
+            return 1
+
+        batch_model.update_image_files = MagicMock(return_value=1)
+        batch_model.integrate_new_frames = MagicMock(side_effect=integrate_new_frames)
+        for _ in range(5):
+            self.controller.update_live()
+
+        self.assertIs(img_view.data_img_item.image, plotted_img)  # already plotted rows are not plotted again
+        self.assertEqual(len(img_view.img_view_box.addedItems), n_items)  # all rows in the same appended item
+        self.assertEqual(img_view.appended_img_item.image.shape[1], 5)
+        self.assertEqual(img_view.n_rows, n_img)
+        self.assertEqual(self.widget.batch_widget.step_series_widget.stop_txt.value(), n_img - 1)
+        self.assertEqual(self.widget.batch_widget.step_series_widget.slider.maximum(), n_img - 1)
+
+        self.controller.plot_batch()
+        self.assertIsNone(img_view.appended_img_item.image)
+        self.assertEqual(img_view.img_data.shape[0], n_img)
+
     def test_process_waterfall(self):
         self.controller.process_waterfall(5, 7)
         self.assertEqual(self.controller.rect.rect().left(), 5)
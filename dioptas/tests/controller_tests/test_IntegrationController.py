@@ -144,6 +144,10 @@ class IntegrationControllerTest(QtTest):
         click_checkbox(self.widget.integration_control_widget.integration_options_widget.correct_solid_angle_cb)
         self.assertFalse(self.model.calibration_model.correct_solid_angle)
 
+    def test_apply_corrections_in_integrator(self):
+        self.widget.integration_control_widget.integration_options_widget.corrections_in_integrator_cb.setChecked(True)
+        self.assertTrue(self.model.calibration_model.apply_corrections_in_integrator)
+
     @unittest.skip("Axes are currently not used for 'Image' mode")
     def test_cake_zoom_changes_axes_scale(self):
         self.widget.integration_image_widget.mode_btn.click()
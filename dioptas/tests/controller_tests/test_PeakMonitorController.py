@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import gc
+
+from mock import MagicMock
+from qtpy import QtWidgets
+
+from ..utility import QtTest, click_button, delete_if_exists
+from ...widgets.integration import IntegrationWidget
+from ...controller.integration.PeakMonitorController import PeakMonitorController
+from ...model.DioptasModel import DioptasModel
+
+unittest_data_path = os.path.join(os.path.dirname(__file__), '../data')
+monitor_file = os.path.join(unittest_data_path, 'test_peak_monitor.txt')
+
+
+class PeakMonitorControllerTest(QtTest):
+    def setUp(self):
+        self.widget = IntegrationWidget()
+        self.model = DioptasModel()
+        self.model.calibration_model.load(os.path.join(unittest_data_path, 'CeO2_Pilatus1M.poni'))
+        self.controller = PeakMonitorController(self.widget, self.model)
+        self.peak_monitor_widget = self.widget.peak_monitor_widget
+
+    def tearDown(self):
+        self.model.peak_monitor_model.stop()
+        delete_if_exists(monitor_file)
+        del self.controller
+        del self.model
+        del self.widget
+        gc.collect()
+
+    def add_window(self, name, tth_min, tth_max):
+        self.peak_monitor_widget.name_txt.setText(name)
+        self.peak_monitor_widget.tth_min_txt.setText(str(tth_min))
+        self.peak_monitor_widget.tth_max_txt.setText(str(tth_max))
+        click_button(self.peak_monitor_widget.add_btn)
+
+    def test_add_and_delete_windows(self):
+        self.add_window('ring 1', 7, 8)
+        self.add_window('ring 2', 9, 10)
+        self.assertEqual(len(self.model.peak_monitor_model.windows), 2)
+        self.assertIsNone(self.model.peak_monitor_model.windows[0].azi_min)
+        self.assertEqual(self.peak_monitor_widget.windows_tw.rowCount(), 2)
+        self.assertEqual(len(self.peak_monitor_widget.curves), 2)
+
+        self.peak_monitor_widget.windows_tw.selectRow(0)
+        click_button(self.peak_monitor_widget.delete_btn)
+        self.assertEqual(self.model.peak_monitor_model.windows[0].name, 'ring 2')
+        self.assertEqual(self.peak_monitor_widget.windows_tw.rowCount(), 1)
+
+    def test_monitor_and_stream_to_file(self):
+        self.add_window('ring', 7, 8)
+        self.peak_monitor_widget.stream_cb.setChecked(True)
+        QtWidgets.QFileDialog.getSaveFileName = MagicMock(return_value=monitor_file)
+        click_button(self.peak_monitor_widget.start_btn)
+        self.assertTrue(self.model.peak_monitor_model.running)
+
+        self.model.img_model.load(os.path.join(unittest_data_path, 'CeO2_Pilatus1M.tif'))
+        x, y = self.peak_monitor_widget.curves[0].getData()
+        self.assertEqual(len(y), 1)
+        self.assertTrue(os.path.exists(monitor_file))
+
+        click_button(self.peak_monitor_widget.start_btn)
+        self.assertFalse(self.model.peak_monitor_model.running)
+
+    def test_suspend_integration_while_monitoring(self):
+        self.add_window('ring', 7, 8)
+        self.model.calibration_model.integrate_1d = MagicMock(wraps=self.model.calibration_model.integrate_1d)
+        self.assertTrue(self.peak_monitor_widget.suspend_integration_cb.isChecked())
+        click_button(self.peak_monitor_widget.start_btn)
+
+        self.model.img_model.load(os.path.join(unittest_data_path, 'CeO2_Pilatus1M.tif'))
+        self.assertEqual(len(self.model.peak_monitor_model.frames), 1)
+        self.model.calibration_model.integrate_1d.assert_not_called()
+
+        click_button(self.peak_monitor_widget.start_btn)  # the last image is integrated when the monitor stops
+        self.assertEqual(self.model.calibration_model.integrate_1d.call_count, 1)
+
+        self.peak_monitor_widget.suspend_integration_cb.setChecked(False)
+        self.assertFalse(self.model.peak_monitor_model.suspend_integration)
+        click_button(self.peak_monitor_widget.start_btn)
+        self.model.img_model.load(os.path.join(unittest_data_path, 'CeO2_Pilatus1M.tif'))
+        self.assertEqual(len(self.model.peak_monitor_model.frames), 2)
+        self.assertEqual(self.model.calibration_model.integrate_1d.call_count, 2)
+
+        click_button(self.peak_monitor_widget.start_btn)  # nothing was skipped, so nothing is integrated again
+        self.assertEqual(self.model.calibration_model.integrate_1d.call_count, 2)
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+from subprocess import run, PIPE
+
+# optional budget for the summed import time of the main controller in seconds, wall-clock times depend on the
+# machine, therefore the budget is only checked if it is given, e.g. DIOPTAS_IMPORT_TIME_BUDGET=6
+IMPORT_TIME_BUDGET = os.environ.get('DIOPTAS_IMPORT_TIME_BUDGET')
+
+# modules which should only be imported when the respective feature is used
+LAZY_MODULES = ['pyqtgraph.opengl', 'epics', 'extra_data', 'CifFile', 'pyximport', 'matplotlib']
+
+
+def profile_import(statement):
+    """
+    Runs the statement in a fresh interpreter with -X importtime and parses the report.
+    :return: dictionary with module names as keys and a tuple of (self, cumulative) import time in seconds as values
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    proc = run([sys.executable, '-X', 'importtime', '-c', statement], stdout=PIPE, stderr=PIPE, env=env,
+               universal_newlines=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            self_time, cumulative_time = int(fields[0]), int(fields[1])
+        except ValueError:  # header line
+            continue
+        times[fields[2].strip()] = (self_time * 1e-6, cumulative_time * 1e-6)
+    return times
+
+
+def import_time_digest(times, num=15):
+    lines = ['{:>8s} {:>8s}  {}'.format('self', 'cumul.', 'module')]
+    for name, (self_time, cumulative_time) in sorted(times.items(), key=lambda item: -item[1][0])[:num]:
+        lines.append('{:8.3f} {:8.3f}  {}'.format(self_time, cumulative_time, name))
+    return '\n'.join(lines)
+
+
+class ImportTimeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.times = profile_import('from dioptas.controller.MainController import MainController')
+
+    def test_main_controller_is_imported(self):
+        self.assertIn('dioptas.controller.MainController', self.times)
+
+    def test_optional_modules_are_not_imported_at_startup(self):
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, self.times,
+                             '{} is imported at startup\n{}'.format(module, import_time_digest(self.times)))
+
+    @unittest.skipIf(IMPORT_TIME_BUDGET is None, 'DIOPTAS_IMPORT_TIME_BUDGET not set')
+    def test_import_time_is_within_budget(self):
+        total = sum(self_time for self_time, _ in self.times.values())
+        self.assertLess(total, float(IMPORT_TIME_BUDGET), '\n' + import_time_digest(self.times))
@@ -1,12 +1,17 @@
 import os
 
+import h5py
 import numpy as np
+from mock import MagicMock
 
 from ..utility import QtTest, delete_if_exists
 from ...model.CalibrationModel import CalibrationModel
 from ...model.ImgModel import ImgModel
 from ...model.MaskModel import MaskModel
 from ...model.BatchModel import BatchModel
+from ...model.util.CakeStack import CAKE_STACK_GROUP
+from ...model.util.IntegrationMethodTuner import get_method_name
+from ...model.util.FrameReductions import SaturatedPixels, RoiSum, PeakIntegral
 
 import gc
 
@@ -17,6 +22,31 @@ files = [os.path.join(data_path, 'lambda/testasapo1_1009_00002_m1_part00000.nxs'
 
 cal_file = os.path.join(data_path, 'lambda/L2.poni')
 
+live_files = [os.path.join(data_path, 'lambda/live_m{}.nxs'.format(module)) for module in (1, 2, 3)]
+
+
+def create_growing_lambda_files(n_img):
+    """
+    Copies the first images of the lambda modules into files with resizable image datasets, which are kept open for
+    writing in SWMR mode, like by the detector during an acquisition.
+    :return: list of (open file, image data of the module)
+    """
+    detector_path = 'entry/instrument/detector'
+    writers = []
+    for module, live_file in enumerate(live_files):
+        with h5py.File(files[0].replace('_m1_', '_m{}_'.format(module + 1)), 'r') as source:
+            module_data = source[detector_path + '/data'][()]
+            target = h5py.File(live_file, 'w', libver='latest')
+            detector = target.create_group(detector_path)
+            for name in ('description', 'sequence_number'):
+                source.copy(source[detector_path + '/' + name], detector, name)
+            source.copy(source[detector_path + '/translation'], detector, 'translation')
+        detector.create_dataset('data', data=module_data[:n_img], maxshape=(None,) + module_data.shape[1:],
+                                chunks=(1,) + module_data.shape[1:])
+        target.swmr_mode = True
+        writers.append((target, module_data))
+    return writers
+
 
 class BatchModelTest(QtTest):
     def setUp(self):
@@ -31,6 +61,10 @@ class BatchModelTest(QtTest):
     def tearDown(self):
         delete_if_exists(os.path.join(data_path, 'detector_with_spline.h5'))
         delete_if_exists(os.path.join(data_path, "test_save_proc.nxs"))
+        delete_if_exists(os.path.join(data_path, "test_cakes.h5"))
+        delete_if_exists(os.path.join(data_path, "test_live_proc.nxs"))
+        for live_file in live_files:
+            delete_if_exists(live_file)
         del self.img_model
         del self.calibration_model.pattern_geometry
         del self.calibration_model
@@ -57,6 +91,131 @@ class BatchModelTest(QtTest):
         self.assertTrue(np.all(self.batch_model.pos_map[0] == [0, 2]))
         self.assertEqual(self.batch_model.pos_map.shape, (8, 2))
 
+    def test_integrate_raw_data_with_cosmic_removal(self):
+        self.batch_model.integrate_raw_data(num_points=1500, start=2, stop=6, step=2, use_all=True,
+                                            remove_cosmics=True)
+
+        self.assertEqual(self.batch_model.data.shape[0], 2)
+        self.assertEqual(self.batch_model.pos_map.shape, (2, 2))
+
+    def test_integrate_raw_data_in_sectors(self):
+        self.batch_model.integrate_raw_data(num_points=1000, start=2, stop=6, step=2, use_all=True, num_sectors=12)
+
+        self.assertEqual(self.batch_model.sector_data.shape, (2, 12, 1000))
+        self.assertEqual(self.batch_model.sector_azimuth.shape, (12,))
+        self.assertEqual(self.batch_model.data.shape, (2, 1000))
+
+        self.batch_model.save_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
+        self.batch_model.reset_data()
+        self.assertIsNone(self.batch_model.sector_data)
+        self.batch_model.load_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
+        self.assertEqual(self.batch_model.sector_data.shape, (2, 12, 1000))
+        self.assertEqual(self.batch_model.sector_azimuth.shape, (12,))
+
+    def test_integrate_raw_data_with_cake_stack(self):
+        cake_file = os.path.join(data_path, "test_cakes.h5")
+        self.batch_model.integrate_raw_data(num_points=1000, start=2, stop=8, step=2, use_all=True,
+                                            cake_filename=cake_file, azimuth_points=90)
+        self.assertEqual(self.batch_model.data.shape[0], 3)
+
+        cake, binning, azimuth = self.batch_model.get_cake(2)
+        self.assertEqual(cake.shape, (90, 1000))
+        self.assertEqual(len(binning), 1000)
+        self.assertEqual(len(azimuth), 90)
+
+        self.assertTrue(np.allclose(cake, self.calibration_model.cake_img))  # last integrated cake
+
+        self.batch_model.save_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
+        self.batch_model.reset_data()
+        self.assertIsNone(self.batch_model.get_cake(0))
+        self.batch_model.load_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
+        self.assertEqual(os.path.abspath(self.batch_model.cake_file), os.path.abspath(cake_file))
+        self.assertEqual(self.batch_model.get_cake(0)[0].shape, (90, 1000))
+
+    def test_integrate_raw_data_in_sectors_with_cake_stack(self):
+        cake_file = os.path.join(data_path, "test_cakes.h5")
+        self.calibration_model.integration_method = 'csr'  # no timing of the integration methods
+        self.calibration_model.cake_geometry.integrate2d = MagicMock(
+            wraps=self.calibration_model.cake_geometry.integrate2d)
+        self.batch_model.integrate_raw_data(num_points=1000, start=2, stop=6, step=2, use_all=True,
+                                            num_sectors=12, cake_filename=cake_file, azimuth_points=100)
+        self.assertEqual(self.calibration_model.cake_geometry.integrate2d.call_count, 2)  # one cake per image
+        self.assertEqual(self.batch_model.sector_data.shape, (2, 12, 1000))
+        self.assertEqual(self.batch_model.get_cake(1)[0].shape, (108, 1000))  # multiple of the number of sectors
+
+    def test_cake_file_is_closed_if_integration_fails(self):
+        cake_file = os.path.join(data_path, "test_cakes.h5")
+        self.batch_model.add_reduction('broken', MagicMock(side_effect=ValueError))
+        with self.assertRaises(ValueError):
+            self.batch_model.integrate_raw_data(num_points=1000, start=2, stop=6, step=2, use_all=True,
+                                                cake_filename=cake_file, azimuth_points=90)
+        with h5py.File(cake_file, "a") as cake_stack:  # fails if the file is still open
+            self.assertEqual(cake_stack[CAKE_STACK_GROUP]['data'].shape[0], 1)
+
+    def test_integrate_raw_data_with_reductions(self):
+        self.batch_model.add_reduction('saturated', SaturatedPixels(100))
+        self.batch_model.add_reduction('roi', RoiSum(100, 200, 300, 400))
+        self.batch_model.add_reduction('peak', PeakIntegral(5, 10))
+        self.batch_model.integrate_raw_data(num_points=1000, start=2, stop=8, step=2, use_all=True)
+
+        reduction_data = self.batch_model.reduction_data
+        self.assertEqual(set(reduction_data), {'total_counts', 'max_pixel', 'saturated', 'roi', 'peak'})
+        for values in reduction_data.values():
+            self.assertEqual(values.shape, (3,))
+
+        img_data = self.img_model.raw_img_data  # last integrated frame
+        self.assertAlmostEqual(reduction_data['total_counts'][-1], np.sum(img_data, dtype=np.float64))
+        self.assertEqual(reduction_data['max_pixel'][-1], np.max(img_data))
+        self.assertEqual(reduction_data['saturated'][-1], np.sum(img_data >= 100))
+        self.assertAlmostEqual(reduction_data['roi'][-1], np.sum(img_data[100:200, 300:400], dtype=np.float64))
+
+        self.batch_model.save_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
+        self.batch_model.reset_data()
+        self.assertEqual(self.batch_model.reduction_data, {})
+        self.batch_model.load_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
+        self.assertEqual(set(self.batch_model.reduction_data), set(reduction_data))
+        np.testing.assert_array_almost_equal(self.batch_model.reduction_data['peak'], reduction_data['peak'])
+
+    def test_integrate_new_frames_of_growing_files(self):
+        writers = create_growing_lambda_files(3)
+        self.batch_model.reset_data()
+        self.batch_model.set_image_files(live_files[:1], live=True)
+        self.assertEqual(self.batch_model.n_img_all, 3)
+
+        live_proc_file = os.path.join(data_path, "test_live_proc.nxs")
+        self.batch_model.open_live_output(live_proc_file)
+        self.assertEqual(self.batch_model.integrate_new_frames(num_points=1000), 3)
+        self.assertEqual(self.batch_model.data.shape, (3, len(self.batch_model.binning)))
+
+        for target, module_data in writers:  # the detector writes two more images
+            dataset = target['entry/instrument/detector/data']
+            dataset.resize(5, axis=0)
+            dataset[3:5] = module_data[3:5]
+            target.flush()
+
+        self.assertEqual(self.batch_model.update_image_files(), 2)
+        self.assertEqual(self.batch_model.n_img_all, 5)
+        self.assertEqual(self.batch_model.integrate_new_frames(num_points=1000), 2)
+        self.assertEqual(self.batch_model.integrate_new_frames(num_points=1000), 0)
+
+        self.assertEqual(self.batch_model.data.shape, (5, len(self.batch_model.binning)))
+        self.assertEqual(list(self.batch_model.pos_map[:, 1]), [0, 1, 2, 3, 4])
+        self.assertEqual(self.batch_model.reduction_data['total_counts'].shape, (5,))
+        data = np.copy(self.batch_model.data)
+
+        # the output file can be read while it is still open for appending
+        self.batch_model.live_writer, live_writer = None, self.batch_model.live_writer
+        self.batch_model.reset_data()
+        self.batch_model.load_proc_data(live_proc_file)
+        self.assertTrue(np.allclose(self.batch_model.data, data))
+        self.assertEqual(self.batch_model.pos_map.shape, (5, 2))
+        self.assertTrue(np.all(self.batch_model.file_map == [0, 5]))
+        self.assertEqual(self.batch_model.reduction_data['total_counts'].shape, (5,))
+
+        live_writer.close()
+        for target, _ in writers:
+            target.close()
+
     def test_get_image_info(self):
         image = 10
         name, pos = self.batch_model.get_image_info(image, use_all=True)
@@ -76,6 +235,10 @@ class BatchModelTest(QtTest):
 
         self.batch_model.integrate_raw_data(num_points, start, stop, step, use_all=True)
         self.batch_model.save_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
+        with h5py.File(os.path.join(data_path, "test_save_proc.nxs"), "r") as f:
+            int_method = f['processed/process/int_method'][()].decode()
+        self.assertEqual(int_method, get_method_name(self.calibration_model.last_integration_method))
+        self.assertNotIn('(', int_method)
         self.batch_model.reset_data()
         self.batch_model.load_proc_data(os.path.join(data_path, "test_save_proc.nxs"))
 
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+import h5py
+import numpy as np
+
+from ..utility import delete_if_exists
+from ...model.util.CakeStack import CakeStackWriter, read_cake
+
+unittest_path = os.path.dirname(__file__)
+data_path = os.path.join(unittest_path, '../data')
+cake_file = os.path.join(data_path, 'test_cake_stack.h5')
+
+
+class CakeStackTest(unittest.TestCase):
+    def tearDown(self):
+        delete_if_exists(cake_file)
+
+    def test_write_and_read_cakes(self):
+        cakes = np.random.random((5, 36, 100)).astype(np.float32)
+        binning = np.linspace(1, 30, 100)
+        azimuth = np.linspace(-175, 175, 36)
+
+        writer = CakeStackWriter(cake_file, 5, max_workers=2)
+        for i, cake in enumerate(cakes):
+            writer.add(i, cake)
+        writer.close(binning, azimuth)
+
+        for i in range(5):
+            cake, cake_binning, cake_azimuth = read_cake(cake_file, i)
+            np.testing.assert_array_equal(cake, cakes[i])
+        np.testing.assert_array_equal(cake_binning, binning)
+        np.testing.assert_array_equal(cake_azimuth, azimuth)
+
+        with h5py.File(cake_file, 'r') as f:
+            dataset = f['cakes/data']
+            self.assertEqual(dataset.chunks, (1, 36, 100))
+            self.assertEqual(dataset.compression, 'gzip')
+
+    def test_stack_is_shrunk_to_written_cakes(self):
+        writer = CakeStackWriter(cake_file, 10)
+        for i in range(3):
+            writer.add(i, np.ones((20, 50)) * i)
+        writer.close(np.arange(50), np.arange(20))
+
+        with h5py.File(cake_file, 'r') as f:
+            self.assertEqual(f['cakes/data'].shape, (3, 20, 50))
+        self.assertEqual(read_cake(cake_file, 2)[0][0, 0], 2)
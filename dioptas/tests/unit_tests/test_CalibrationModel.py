@@ -29,6 +29,8 @@ from pyFAI.detectors import Detector
 from ..utility import QtTest, delete_if_exists
 from ...model.CalibrationModel import CalibrationModel, get_available_detectors, DetectorModes, DetectorShapeError
 from ...model.ImgModel import ImgModel
+from ...model.util.ImgCorrection import DummyCorrection
+from ...model.util.IntegrationMethodTuner import IntegrationMethodTuner
 from ... import calibrants_path
 import gc
 
@@ -243,6 +245,149 @@ class CalibrationModelTest(QtTest):
         self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
         self.calibration_model.integrate_2d()
 
+    def _load_image_with_background(self):
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.img_model.background_data = np.flipud(self.img_model.raw_img_data) * 0.5
+
+    def _change_linear_parameters(self):
+        self.img_model.background_scaling = 0.7
+        self.img_model.background_offset = 20
+        self.img_model.factor = 2
+
+    def test_integrate_1d_with_changed_background_parameters(self):
+        self._load_image_with_background()
+        self.calibration_model.integrate_1d()
+        self._change_linear_parameters()
+        x, y = self.calibration_model.integrate_1d()
+
+        self.calibration_model._pattern_integration_cache.clear()
+        x_full, y_full = self.calibration_model.integrate_1d()
+        np.testing.assert_array_almost_equal(x, x_full)
+        np.testing.assert_allclose(y, y_full, rtol=1e-4, atol=1e-3 * np.max(np.abs(y_full)))
+
+    def test_integrate_2d_with_changed_background_parameters(self):
+        self._load_image_with_background()
+        self.calibration_model.integrate_2d()
+        self._change_linear_parameters()
+        cake = self.calibration_model.integrate_2d()
+
+        self.calibration_model._cake_integration_cache.clear()
+        cake_full = self.calibration_model.integrate_2d()
+        np.testing.assert_allclose(cake, cake_full, rtol=1e-4, atol=1e-3 * np.max(np.abs(cake_full)))
+
+    def test_changing_background_parameters_does_not_integrate_again(self):
+        self._load_image_with_background()
+        self.calibration_model.integrate_1d()
+        self.img_model.background_scaling = 0.5
+        self.calibration_model.integrate_1d()  # integrates image, background and unity image once
+
+        self.calibration_model.pattern_geometry.integrate1d = MagicMock()
+        self._change_linear_parameters()
+        self.calibration_model.integrate_1d()
+        self.calibration_model.pattern_geometry.integrate1d.assert_not_called()
+
+    def test_apply_corrections_in_integrator(self):
+        self._load_image_with_background()
+        self.img_model.add_img_correction(DummyCorrection(self.img_model.img_data.shape, 0.4))
+        self._change_linear_parameters()
+        _, y = self.calibration_model.integrate_1d()
+        cake = np.copy(self.calibration_model.integrate_2d())
+
+        self.calibration_model.apply_corrections_in_integrator = True
+        _, y_integrator = self.calibration_model.integrate_1d()
+        cake_integrator = self.calibration_model.integrate_2d()
+        np.testing.assert_allclose(y_integrator, y, atol=1e-5 * np.max(np.abs(y)))
+        np.testing.assert_allclose(cake_integrator, cake, atol=1e-5 * np.max(np.abs(cake)))
+
+    def test_integration_method_is_tuned_once(self):
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        tuner = IntegrationMethodTuner()
+        tuner.tune = MagicMock(side_effect=lambda key, dim, integrate: tuner.methods.setdefault(key, 'csr'))
+        self.calibration_model.integration_method_tuner = tuner
+
+        self.calibration_model.integrate_1d(num_points=1000)
+        self.calibration_model.integrate_1d(num_points=1000)
+        self.calibration_model.integrate_1d(num_points=500, unit='q_A^-1')  # the binning does not start a new timing
+        tuner.tune.assert_called_once()
+        self.assertEqual(self.calibration_model.last_integration_method, 'csr')
+
+    def test_manual_integration_method(self):
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.calibration_model.integration_method_tuner = MagicMock()
+        self.calibration_model.integration_method = 'lut'
+        _, y_lut = self.calibration_model.integrate_1d(num_points=1000)
+        self.calibration_model.integration_method = 'csr'
+        _, y_csr = self.calibration_model.integrate_1d(num_points=1000)
+
+        self.calibration_model.integration_method_tuner.tune.assert_not_called()
+        self.assertEqual(self.calibration_model.last_integration_method, 'csr')
+        np.testing.assert_allclose(y_lut, y_csr, rtol=1e-4)
+
+    def test_integrate_1d_and_2d(self):
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        mask = np.zeros(self.img_model.img_data.shape, dtype=bool)
+        mask[100:300, 200:400] = True
+
+        for unit in ['2th_deg', 'q_A^-1', 'd_A']:
+            x, y = self.calibration_model.integrate_1d(mask=mask, unit=unit)
+            cake = np.copy(self.calibration_model.integrate_2d(mask=mask))
+
+            x_fused, y_fused, cake_fused = self.calibration_model.integrate_1d_and_2d(mask=mask, unit=unit)
+            np.testing.assert_array_almost_equal(x_fused, x)
+            np.testing.assert_allclose(y_fused, y, atol=1e-6 * np.max(y))
+            np.testing.assert_array_almost_equal(cake_fused, cake)
+
+    def test_integrate_1d_and_2d_derives_pattern_from_cake(self):
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.calibration_model.pattern_geometry.integrate1d = MagicMock(
+            wraps=self.calibration_model.pattern_geometry.integrate1d)
+        self.calibration_model.integrate_1d_and_2d()
+        self.calibration_model.pattern_geometry.integrate1d.assert_not_called()
+
+        self.calibration_model.integrate_1d_and_2d(azi_range=(0, 90))
+        self.calibration_model.pattern_geometry.integrate1d.assert_called()
+
+    def test_integrate_sectors(self):
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.calibration_model.integration_method = 'csr'  # no timing of the integration methods
+        self.calibration_model.cake_geometry.integrate2d = MagicMock(
+            wraps=self.calibration_model.cake_geometry.integrate2d)
+        x, azi, intensity = self.calibration_model.integrate_sectors(8, num_points=1000)
+        self.assertEqual(intensity.shape, (8, 1000))
+        self.assertEqual(len(x), 1000)
+        self.assertEqual(len(azi), 8)
+        self.calibration_model.cake_geometry.integrate2d.assert_called_once()
+
+        tth, pattern = self.calibration_model.integrate_1d(num_points=1000)
+        x_sectors, pattern_sectors = self.calibration_model.derive_pattern_from_sectors()
+        self.assertAlmostEqual(np.max(np.abs(pattern_sectors[:len(pattern)] - pattern)) / np.max(pattern), 0,
+                               places=5)
+
+        x, azi, intensity = self.calibration_model.integrate_sectors(4, num_points=500, azimuth_range=(0, 90))
+        self.assertEqual(intensity.shape, (4, 500))
+        self.assertAlmostEqual(azi[0], 11.25, places=2)
+
+    def test_derive_sectors_from_cake(self):
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.calibration_model.integration_method = 'csr'  # no timing of the integration methods
+        x, azi, intensity = self.calibration_model.integrate_sectors(8, num_points=1000)
+
+        self.calibration_model.integrate_2d(rad_points=1000, azimuth_points=360)
+        x_cake, azi_cake, intensity_cake = self.calibration_model.derive_sectors_from_cake(8)
+        np.testing.assert_array_almost_equal(x_cake, x)
+        np.testing.assert_array_almost_equal(azi_cake, azi)
+        np.testing.assert_allclose(intensity_cake, intensity, rtol=1e-5, atol=1e-5 * np.max(intensity))
+
+        with self.assertRaises(ValueError):
+            self.calibration_model.derive_sectors_from_cake(7)
+
     def test_correct_solid_angle(self):
         self.calibration_model.load(os.path.join(data_path, 'LaB6_40keV_MarCCD.poni'))
         self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
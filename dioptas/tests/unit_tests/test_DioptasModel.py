@@ -36,6 +36,7 @@ class DioptasModelTest(QtTest):
 
     def tearDown(self):
         delete_if_exists(os.path.join(data_path, 'empty.dio'))
+        delete_if_exists(os.path.join(data_path, 'lazy.dio'))
 
     def test_add_configuration(self):
         self.model.img_model.load(os.path.join(data_path, "image_001.tif"))
@@ -105,6 +106,18 @@ class DioptasModelTest(QtTest):
         self.assertFalse(np.array_equal(self.model.current_configuration.cake_img,
                                         np.zeros((2048, 2048))))
 
+    def test_integrate_pattern_and_cake_in_single_step(self):
+        self.model.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.model.current_configuration.auto_integrate_cake = True
+        self.model.calibration_model.integrate_1d = MagicMock()
+        self.model.calibration_model.integrate_2d = MagicMock()
+
+        self.model.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.model.calibration_model.integrate_1d.assert_not_called()
+        self.model.calibration_model.integrate_2d.assert_not_called()
+        pattern_x = self.model.pattern.x
+        np.testing.assert_array_almost_equal(pattern_x, self.model.calibration_model.cake_tth[:len(pattern_x)])
+
     def test_integrate_cake_with_mask(self):
         self.model.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
         self.model.current_configuration.auto_integrate_cake = True
@@ -249,6 +262,67 @@ class DioptasModelTest(QtTest):
     def test_save_empty_configuration(self):
         self.model.save(os.path.join(data_path, 'empty.dio'))
 
+    def test_save_and_load_corrections_in_integrator(self):
+        filename = os.path.join(data_path, 'lazy.dio')
+        self.model.current_configuration.apply_corrections_in_integrator = True
+        self.model.save(filename)
+        self.model.current_configuration.apply_corrections_in_integrator = False
+        self.model.load(filename)
+        self.assertTrue(self.model.calibration_model.apply_corrections_in_integrator)
+
+    def test_integrate_after_loading_cake_azimuth_range(self):
+        self.model.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.model.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.model.current_configuration.cake_azimuth_range = (-90, 90)
+        self.model.current_configuration.auto_integrate_cake = True
+        filename = os.path.join(data_path, 'lazy.dio')
+        self.model.save(filename)
+
+        self.model.load(filename)
+        self.assertEqual(self.model.current_configuration.cake_azimuth_range, (-90, 90))
+        self.model.current_configuration.integrate_image()
+        self.assertGreaterEqual(np.min(self.model.calibration_model.cake_azi), -90)
+        self.model.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+
+    def _save_two_configuration_project(self):
+        self.model.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.model.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.model.add_configuration()
+        self.model.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.model.img_model.factor = 2
+        self.model.mask_model.mask_below_threshold(self.model.img_data, 1)
+        self.model.select_configuration(0)
+        filename = os.path.join(data_path, 'lazy.dio')
+        self.model.save(filename)
+        return filename
+
+    def test_load_project_lazily(self):
+        filename = self._save_two_configuration_project()
+        mask = np.copy(self.model.configurations[1].mask_model.get_mask())
+        img_data = np.copy(self.model.configurations[1].img_model.img_data)
+
+        self.model.load(filename)
+        self.assertFalse(self.model.configurations[0].has_pending_data)
+        self.assertTrue(self.model.configurations[1].has_pending_data)
+        self.assertEqual(self.model.configurations[1].img_model.factor, 2)
+        self.assertIsNotNone(self.model._project_file)
+
+        self.model.select_configuration(1)
+        self.assertFalse(self.model.configurations[1].has_pending_data)
+        self.assertIsNone(self.model._project_file)
+        self.assertTrue(np.array_equal(self.model.mask_model.get_mask(), mask))
+        self.assertTrue(np.allclose(self.model.img_data, img_data))
+
+    def test_load_project_lazily_and_save(self):
+        filename = self._save_two_configuration_project()
+        self.model.load(filename)
+        self.model.save(filename)
+        self.assertFalse(self.model.configurations[1].has_pending_data)
+
+        self.model.load(filename, lazy=False)
+        self.assertFalse(self.model.configurations[1].has_pending_data)
+        self.assertIsNone(self.model._project_file)
+
     def test_clear_model(self):
         self.model.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
         self.model.img_model.load(os.path.join(data_path, "image_001.tif"))
@@ -22,7 +22,7 @@ import os
 import numpy as np
 
 from ..utility import QtTest
-from ...model.util.HelperModule import get_partial_index, FileNameIterator
+from ...model.util.HelperModule import get_partial_index, get_partial_indices, FileNameIterator
 
 unittest_path = os.path.dirname(__file__)
 data_path = os.path.join(unittest_path, '../data', 'FileIterator')
@@ -35,6 +35,17 @@ class HelperModuleTest(QtTest):
         self.assertEqual(get_partial_index(data, value), 2.5)
         self.assertEqual(get_partial_index(data, data[4]), 4)
 
+    def test_get_partial_indices(self):
+        data = np.linspace(3, 20, 300) ** 1.2
+        values = np.array([-1, data[0], 10.3, data[100], 31.7, data[-1], 100, np.nan])
+        partial_indices = get_partial_indices(data, values)
+        for value, partial_index in zip(values, partial_indices):
+            expected = get_partial_index(data, value)
+            if expected is None:
+                self.assertTrue(np.isnan(partial_index))
+            else:
+                self.assertAlmostEqual(partial_index, expected)
+
     def test_get_next_filename(self):
         filename = os.path.join(data_path, "dummy1_1.txt")
         self.file_iterator = FileNameIterator(filename)
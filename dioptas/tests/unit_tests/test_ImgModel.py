@@ -134,6 +134,55 @@ class ImgModelTest(QtTest):
         self.assertTrue(np.array_equal(self.img_model.img_data,
                                        self.img_model._img_data - (2.3 * self.img_model._background_data + 100)))
 
+    def test_linear_components(self):
+        self.img_model.load_background(os.path.join(data_path, 'image_002.tif'))
+        self.img_model.add_img_correction(DummyCorrection(self.img_model.img_data.shape, 0.4))
+        self.img_model.background_scaling = 2.3
+        self.img_model.background_offset = 100.0
+        self.img_model.factor = 1.5
+
+        linear_combination = sum(coefficient * component for coefficient, component in
+                                 zip(self.img_model.linear_coefficients, self.img_model.linear_components))
+        np.testing.assert_array_almost_equal(linear_combination, self.img_model.img_data)
+
+    def test_integration_dark_and_flat(self):
+        self.assertIsNone(self.img_model.integration_dark)
+        self.assertIsNone(self.img_model.integration_flat)
+
+        self.img_model.load_background(os.path.join(data_path, 'image_002.tif'))
+        self.img_model.add_img_correction(DummyCorrection(self.img_model.img_data.shape, 0.4))
+        self.img_model.background_scaling = 2.3
+        self.img_model.background_offset = 100.0
+
+        dark = self.img_model.integration_dark
+        np.testing.assert_array_almost_equal(dark, 2.3 * self.img_model.background_data + 100)
+        self.assertIs(self.img_model.integration_dark, dark)
+        np.testing.assert_array_almost_equal(self.img_model.integration_flat, 0.4)
+
+        np.testing.assert_array_almost_equal((self.img_model.raw_img_data - self.img_model.integration_dark) /
+                                             self.img_model.integration_flat, self.img_model.img_data)
+
+    def test_background_subtracted_image_is_calculated_on_request(self):
+        self.img_model.load_background(os.path.join(data_path, 'image_002.tif'))
+        self.assertIsNone(self.img_model._compound_img_data)
+
+        img_data = self.img_model.img_data
+        np.testing.assert_array_almost_equal(img_data, self.img_model.raw_img_data - self.img_model.background_data)
+        self.img_model.background_offset = 100.0
+        self.assertIsNone(self.img_model._compound_img_data)
+        np.testing.assert_array_almost_equal(self.img_model.img_data, img_data - 100.0)
+
+    def test_img_data_version_does_not_change_with_linear_parameters(self):
+        version = self.img_model.img_data_version
+        self.img_model.load_background(os.path.join(data_path, 'image_002.tif'))
+        self.assertGreater(self.img_model.img_data_version, version)
+
+        version = self.img_model.img_data_version
+        self.img_model.background_scaling = 2.3
+        self.img_model.background_offset = 100.0
+        self.img_model.factor = 1.5
+        self.assertEqual(self.img_model.img_data_version, version)
+
     def test_background_with_different_shape(self):
         with self.assertRaises(BackgroundDimensionWrongException):
             self.img_model.load_background(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
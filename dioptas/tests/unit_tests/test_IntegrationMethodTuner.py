@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import time
+
+from mock import MagicMock
+from pyFAI.detectors import Detector
+
+from ..utility import QtTest, delete_if_exists
+from ...model.util.IntegrationMethodTuner import IntegrationMethodTuner, get_method_name, parse_method_name
+
+unittest_path = os.path.dirname(__file__)
+data_path = os.path.join(unittest_path, '../data')
+
+
+class IntegrationMethodTunerTest(QtTest):
+    def setUp(self):
+        self.tuner = IntegrationMethodTuner()
+        self.key = self.tuner.create_key(1, Detector(pixel1=79e-6, pixel2=79e-6), (100, 200))
+
+    def tearDown(self):
+        delete_if_exists(os.path.join(data_path, 'integration_methods.json'))
+
+    def test_candidates(self):
+        candidates = self.tuner.get_candidates(1)
+        self.assertIn(('bbox', 'csr', 'cython', None), candidates)
+        for split, algo, impl, target in candidates:
+            self.assertEqual(split, 'bbox')
+
+    def test_tune_selects_fastest_method(self):
+        def integrate(method):
+            if method[1] != 'lut':
+                time.sleep(0.01)
+
+        self.assertFalse(self.tuner.has_method(self.key))
+        self.assertEqual(self.tuner.get_method(self.key), 'csr')
+        self.assertEqual(self.tuner.tune(self.key, 1, integrate), ('bbox', 'lut', 'cython', None))
+        self.assertTrue(self.tuner.has_method(self.key))
+        self.assertEqual(self.tuner.get_method(self.key), ('bbox', 'lut', 'cython', None))
+
+    def test_tune_skips_failing_methods(self):
+        def integrate(method):
+            if method[1] != 'histogram':
+                raise RuntimeError
+        self.assertEqual(self.tuner.tune(self.key, 1, integrate)[1], 'histogram')
+
+    def test_save_and_load(self):
+        filename = os.path.join(data_path, 'integration_methods.json')
+        self.tuner.load(filename)
+        self.tuner.tune(self.key, 1, MagicMock())
+
+        tuner = IntegrationMethodTuner(filename)
+        self.assertEqual(tuner.get_method(self.key), self.tuner.get_method(self.key))
+
+    def test_method_names(self):
+        self.assertEqual(get_method_name(('bbox', 'csr', 'cython', None)), 'bbox_csr_cython')
+        self.assertEqual(parse_method_name('bbox_csr_cython'), ('bbox', 'csr', 'cython'))
+        self.assertEqual(get_method_name('csr'), 'csr')
+        self.assertEqual(parse_method_name('csr'), 'csr')
@@ -20,7 +20,12 @@
 import unittest
 import gc
 import os
+
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
 from ...model.util import jcpds
+from ...model.util.jcpds import jcpds_reflection, birch_murnaghan_inverse
 
 unittest_path = os.path.dirname(__file__)
 data_path = os.path.join(unittest_path, '../data')
@@ -99,6 +104,62 @@ class JcpdsUnitTest(unittest.TestCase):
         self.assertAlmostEqual(d1_mon, d1_tri)
         self.assertAlmostEqual(d2_mon, d2_tri)
 
+    def test_compute_d0_is_consistent_with_compute_d(self):
+        self.jcpds.load_file(os.path.join(jcpds_path, 'FeGeO3_cpx.jcpds'))
+        self.jcpds.compute_d(0, 298)
+        d = self.jcpds.reflection_data['d'].copy()
+        self.jcpds.reflection_data['d0'] = 0
+        self.jcpds.compute_d0()
+        assert_array_almost_equal(self.jcpds.reflection_data['d0'], d)
+
+    def test_compute_d_scales_with_volume(self):
+        self.jcpds.load_file(os.path.join(jcpds_path, 'FeGeO3_cpx.jcpds'))
+        self.jcpds.compute_d(20, 298)
+        ratio = (self.jcpds.params['v'] / self.jcpds.params['v0']) ** (1. / 3.)
+        assert_array_almost_equal(self.jcpds.reflection_data['d'], self.jcpds.reflection_data['d0'] * ratio)
+
+    def test_compute_volumes_for_multiple_conditions(self):
+        self.jcpds.load_file(os.path.join(jcpds_path, 'au_Anderson.jcpds'))
+        pressures = [-1, 0, 10, 100, 300]
+        temperatures = [298, 1000, 0, 2500, 3000]
+        volumes = self.jcpds.compute_volumes(pressures, temperatures)
+        d_spacings = self.jcpds.compute_d_spacings(pressures, temperatures)
+        self.assertEqual(d_spacings.shape, (5, len(self.jcpds.reflection_data)))
+
+        for ind, (pressure, temperature) in enumerate(zip(pressures, temperatures)):
+            self.jcpds.compute_d(pressure, temperature)
+            self.assertAlmostEqual(volumes[ind] / self.jcpds.params['v'], 1, places=4)
+            assert_array_almost_equal(d_spacings[ind] / self.jcpds.reflection_data['d'], 1, decimal=4)
+
+    def test_birch_murnaghan_inverse(self):
+        def bm3_pressure(v0_v, k0, k0p):
+            return 1.5 * k0 * (v0_v ** (7. / 3.) - v0_v ** (5. / 3.)) * (1 + 0.75 * (k0p - 4.) * (v0_v ** (2. / 3.) - 1))
+
+        pressures = np.linspace(-2, 400, 1000)
+        for k0, k0p in [(166.65, 5.48), (100, 4), (300, 3.5), (30, 8)]:
+            v0_v = birch_murnaghan_inverse(pressures, k0, k0p)
+            assert_array_almost_equal(bm3_pressure(v0_v, k0, k0p), pressures, decimal=8)
+
+        self.assertAlmostEqual(birch_murnaghan_inverse(0, 166.65, 5.48), 1)
+        self.assertIsInstance(birch_murnaghan_inverse(10, 166.65, 5.48), float)
+        assert_array_almost_equal(birch_murnaghan_inverse(10, [100, 200], [4, 5]),
+                                  [birch_murnaghan_inverse(10, 100, 4), birch_murnaghan_inverse(10, 200, 5)])
+
+    def test_set_reflection(self):
+        self.jcpds.add_reflections([1, 1, 2], [0, 1, 0], [0, 1, 0], [100, 50, 20], [4.0, 2.3, 2.0])
+        self.assertEqual(len(self.jcpds.reflections), 3)
+
+        reflection = self.jcpds.reflections[1]
+        reflection.h = 3
+        reflection.intensity = 70
+        self.jcpds.set_reflection(1, reflection)
+        self.assertEqual(self.jcpds.reflections[1].h, 3)
+        self.assertEqual(self.jcpds.reflections[1].intensity, 70)
+
+        self.jcpds.reflections = [jcpds_reflection(1, 1, 1, 10, 2.5)]
+        self.assertEqual(len(self.jcpds.reflection_data), 1)
+        self.assertEqual(self.jcpds.reflection_data['d0'][0], 2.5)
+
     def test_using_negative_pressures(self):
         self.jcpds.load_file(os.path.join(jcpds_path, 'au_Anderson.jcpds'))
         self.jcpds.pressure = -1.
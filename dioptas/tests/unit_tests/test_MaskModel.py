@@ -22,10 +22,13 @@ import unittest
 import gc
 import os
 import numpy as np
+from scipy import signal
+import skimage.draw
 from math import sqrt, atan2, cos, sin
 from qtpy import QtCore
 
-from ...model.MaskModel import MaskModel
+from ...model.MaskModel import MaskModel, rasterize_polygon, rasterize_ellipse
+from ...model.util.cosmics import find_cosmics, laplacian_plus, subsample, rebin2x2, laplkernel
 
 from ..utility import delete_if_exists
 
@@ -106,6 +109,124 @@ class MaskModelTest(unittest.TestCase):
 
         self.assertEqual(np.sum(self.mask_model._mask_data), 0)
 
+    def test_undo_and_redo(self):
+        self.mask_model.set_dimension((100, 100))
+        self.mask_model.mask_rect(10, 10, 20, 20)
+        first_mask = np.copy(self.mask_model.get_img())
+        self.mask_model.mask_ellipse(50, 50, 10, 5)
+        second_mask = np.copy(self.mask_model.get_img())
+        self.mask_model.invert_mask()
+        third_mask = np.copy(self.mask_model.get_img())
+
+        self.mask_model.undo()
+        self.assertTrue(np.array_equal(self.mask_model.get_img(), second_mask))
+        self.mask_model.undo()
+        self.assertTrue(np.array_equal(self.mask_model.get_img(), first_mask))
+        self.mask_model.undo()
+        self.assertEqual(np.sum(self.mask_model.get_img()), 0)
+        self.mask_model.undo()  # nothing left to undo
+        self.assertEqual(np.sum(self.mask_model.get_img()), 0)
+
+        self.mask_model.redo()
+        self.assertTrue(np.array_equal(self.mask_model.get_img(), first_mask))
+        self.mask_model.redo()
+        self.mask_model.redo()
+        self.assertTrue(np.array_equal(self.mask_model.get_img(), third_mask))
+        self.mask_model.redo()  # nothing left to redo
+        self.assertTrue(np.array_equal(self.mask_model.get_img(), third_mask))
+
+        self.mask_model.undo()
+        self.mask_model.mask_rect(80, 80, 5, 5)  # new action clears the redo steps
+        self.mask_model.redo()
+        self.assertFalse(np.array_equal(self.mask_model.get_img(), third_mask))
+        self.mask_model.undo()
+        self.assertTrue(np.array_equal(self.mask_model.get_img(), second_mask))
+
+    def test_undo_history_is_compressed(self):
+        self.mask_model.set_dimension((2048, 2048))
+        for i in range(60):
+            self.mask_model.mask_rect(i * 10, i * 10, 5, 5)
+
+        history = self.mask_model._history
+        self.assertEqual(history.num_undo, 50)
+        self.assertLess(history.nbytes, 2048 * 2048 / 4)
+
+        for i in range(50):
+            self.mask_model.undo()
+        self.assertEqual(np.sum(self.mask_model.get_img()), 10 * 25)
+
+    def test_remove_cosmic(self):
+        img = np.random.poisson(100, (300, 200)).astype(float)
+        img[[10, 150, 299], [20, 100, 199]] += 5000
+        self.mask_model.set_dimension(img.shape)
+        self.mask_model.remove_cosmic(img)
+
+        mask = self.mask_model.get_img()
+        self.assertTrue(np.all(mask[[10, 150, 299], [20, 100, 199]]))
+        self.assertTrue(np.array_equal(find_cosmics(img, tile_size=64), mask))
+
+    def test_laplacian_plus(self):
+        img = np.random.random((30, 41))
+        expected = rebin2x2(signal.convolve2d(subsample(img), laplkernel, mode="same", boundary="symm").clip(min=0))
+        self.assertTrue(np.allclose(laplacian_plus(img), expected))
+
+    def test_mask_polygon(self):
+        self.mask_model.set_dimension((100, 130))
+        x = np.array([-10.3, 80.5, 140.2, 60.7, 20.1])
+        y = np.array([5.5, -3.2, 50.4, 110.9, 60.3])
+        self.mask_model.mask_polygon(x, y)
+
+        rr, cc = skimage.draw.polygon(y, x, (100, 130))
+        expected = np.zeros((100, 130), dtype=bool)
+        expected[rr, cc] = True
+        self.assertTrue(np.array_equal(self.mask_model.get_img(), expected))
+
+        self.mask_model.set_mode(False)
+        self.mask_model.mask_polygon(x, y)
+        self.assertEqual(np.sum(self.mask_model.get_img()), 0)
+
+    def test_rasterize_polygon_includes_boundary(self):
+        rows, cols, inside = rasterize_polygon([1, 2, 8], [1, 7, 4], (10, 10))
+        mask = np.zeros((10, 10), dtype=bool)
+        mask[rows, cols] = inside
+        self.assertTrue(mask[1, 1])
+        self.assertTrue(mask[8, 4])
+        self.assertTrue(np.all(mask[2, 2:8]))
+        self.assertIsNone(rasterize_polygon([-5, -3, -8], [1, 7, 4], (10, 10)))
+
+    def test_mask_ellipse(self):
+        self.mask_model.set_dimension((100, 130))
+        for cx, cy, x_radius, y_radius in [(50, 40, 30, 20), (120, -5, 20, 25), (60, 50, -10, 5)]:
+            self.mask_model.clear_mask()
+            self.mask_model.mask_ellipse(cx, cy, x_radius, y_radius)
+
+            rr, cc = skimage.draw.ellipse(cy, cx, y_radius, x_radius, shape=(100, 130))
+            expected = np.zeros((100, 130), dtype=bool)
+            expected[rr, cc] = True
+            self.assertTrue(np.array_equal(self.mask_model.get_img(), expected))
+        self.assertIsNone(rasterize_ellipse(200, 200, 10, 10, (100, 130)))
+
+    def test_roi_mask_is_cached(self):
+        self.mask_model.roi = [2, 5, 3, 7]
+        roi_mask = self.mask_model.roi_mask
+        self.assertEqual(roi_mask.dtype, bool)
+        self.assertIs(self.mask_model.roi_mask, roi_mask)
+        self.assertIs(self.mask_model.get_mask(), self.mask_model.get_mask())
+
+        self.mask_model.mask_rect(0, 0, 1, 1)
+        self.assertTrue(self.mask_model.get_mask()[0, 0])
+        self.mask_model.undo()
+        self.assertTrue(self.mask_model.get_mask()[0, 0])  # outside of roi
+        self.assertFalse(self.mask_model.get_mask()[3, 4])
+
+        self.mask_model.mask_rect(3, 4, 1, 1)
+        self.assertTrue(self.mask_model.get_mask()[3, 4])
+        self.mask_model.undo()
+        self.assertFalse(self.mask_model.get_mask()[3, 4])
+
+        self.mask_model.roi = [0, 10, 0, 10]
+        self.assertEqual(np.sum(self.mask_model.get_mask()), 0)
+
     def test_saving_and_loading(self):
         self.mask_model.mask_ellipse(1024, 1024, 100, 100)
         self.mask_model.set_dimension((2048, 2048))
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+from importlib.util import find_spec
+
+import h5py
+import numpy as np
+
+from ..utility import delete_if_exists
+from ...model.util.NeXusLoader import NeXusImage
+
+if find_spec('hdf5plugin') is not None:
+    import hdf5plugin
+
+unittest_path = os.path.dirname(__file__)
+data_path = os.path.join(unittest_path, '../data')
+master_file = os.path.join(data_path, 'test_series_master.h5')
+data_files = [os.path.join(data_path, 'test_series_data_00000{}.h5'.format(ind)) for ind in (1, 2)]
+nexus_file = os.path.join(data_path, 'test_series.nxs')
+
+
+def create_eiger_files(frames, **dataset_kwargs):
+    """
+    Writes the frames into two data files, which are referenced by relative external links in the master file.
+    """
+    n_first = len(frames) // 2
+    for data_file, data in zip(data_files, (frames[:n_first], frames[n_first:])):
+        with h5py.File(data_file, 'w') as f:
+            f.create_dataset('entry/data/data', data=data, **dataset_kwargs)
+    with h5py.File(master_file, 'w') as f:
+        data_group = f.create_group('entry/data')
+        for ind, data_file in enumerate(data_files):
+            data_group['data_{:06d}'.format(ind + 1)] = h5py.ExternalLink(os.path.basename(data_file),
+                                                                          'entry/data/data')
+
+
+class NeXusImageTest(unittest.TestCase):
+    def setUp(self):
+        self.frames = np.random.poisson(10, (10, 50, 60)).astype(np.uint32)
+
+    def tearDown(self):
+        for filename in [master_file, nexus_file] + data_files:
+            delete_if_exists(filename)
+
+    def test_read_compressed_eiger_series(self):
+        create_eiger_files(self.frames, chunks=(1, 50, 60), compression='gzip', shuffle=True)
+        nexus_image = NeXusImage(master_file)
+        self.assertEqual(nexus_image.series_max, 10)
+        self.assertIsNotNone(nexus_image._filters[0])  # chunks are decompressed in the worker threads
+
+        for image_nr in (0, 1, 7, 3, 9, 4):
+            np.testing.assert_array_equal(nexus_image.get_image(image_nr), self.frames[image_nr][::-1])
+        self.assertLessEqual(len(nexus_image._frames), 2 * nexus_image.prefetch)
+        nexus_image.close()
+
+    @unittest.skipIf(find_spec('hdf5plugin') is None or find_spec('lz4') is None, 'hdf5plugin or lz4 not installed')
+    def test_read_lz4_compressed_eiger_series(self):
+        # small blocks, so that the incompressible last frame is stored in uncompressed blocks
+        self.frames[-1] = np.random.randint(0, 2 ** 32, (50, 60), dtype=np.uint32)
+        create_eiger_files(self.frames, chunks=(1, 50, 60), **hdf5plugin.LZ4(nbytes=1024))
+        self._compare_with_hdf5_reading()
+
+    @unittest.skipIf(find_spec('hdf5plugin') is None or find_spec('bitshuffle') is None,
+                     'hdf5plugin or bitshuffle not installed')
+    def test_read_bitshuffle_compressed_eiger_series(self):
+        create_eiger_files(self.frames, chunks=(1, 50, 60), **hdf5plugin.Bitshuffle(nelems=256, cname='lz4'))
+        self._compare_with_hdf5_reading()
+
+    def _compare_with_hdf5_reading(self):
+        nexus_image = NeXusImage(master_file)
+        self.assertIsNotNone(nexus_image._filters[0])
+        for image_nr in range(nexus_image.series_max):
+            dataset_ind, pos = nexus_image._locate(image_nr)
+            np.testing.assert_array_equal(nexus_image.get_image(image_nr),
+                                          nexus_image._datasets[dataset_ind][pos][::-1])
+            np.testing.assert_array_equal(nexus_image.get_image(image_nr), self.frames[image_nr][::-1])
+        nexus_image.close()
+
+    def test_prefetch_following_frames(self):
+        create_eiger_files(self.frames, chunks=(1, 50, 60), compression='gzip')
+        nexus_image = NeXusImage(master_file)
+        nexus_image.get_image(0)
+        self.assertEqual(set(nexus_image._frames), set(range(1, 9)))
+        np.testing.assert_array_equal(nexus_image.get_image(1), self.frames[1][::-1])
+        self.assertNotIn(1, nexus_image._frames)
+        nexus_image.close()
+
+    def test_fall_back_to_hdf5_reading(self):
+        create_eiger_files(self.frames, chunks=(2, 25, 60), compression='gzip')
+        nexus_image = NeXusImage(master_file)
+        self.assertIsNone(nexus_image._filters[0])
+        np.testing.assert_array_equal(nexus_image.get_image(6), self.frames[6][::-1])
+        self.assertEqual(len(nexus_image._frames), 0)
+        nexus_image.close()
+
+    def test_missing_data_file(self):
+        create_eiger_files(self.frames)
+        os.remove(data_files[1])
+        nexus_image = NeXusImage(master_file)
+        self.assertEqual(nexus_image.series_max, 5)
+        nexus_image.close()
+
+    def test_read_default_signal(self):
+        with h5py.File(nexus_file, 'w') as f:
+            f.attrs['default'] = 'entry'
+            entry = f.create_group('entry')
+            entry.attrs['default'] = 'result'
+            result = entry.create_group('result')
+            result.attrs['signal'] = 'images'
+            result.create_dataset('images', data=self.frames)
+        nexus_image = NeXusImage(nexus_file)
+        self.assertEqual(nexus_image.series_max, 10)
+        np.testing.assert_array_equal(nexus_image.get_image(2), self.frames[2][::-1])
+        nexus_image.close()
+
+    def test_no_image_series(self):
+        with h5py.File(nexus_file, 'w') as f:
+            f.create_dataset('entry/pattern', data=np.arange(10))
+        self.assertRaises(IOError, NeXusImage, nexus_file)
+        self.assertRaises(IOError, NeXusImage, os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
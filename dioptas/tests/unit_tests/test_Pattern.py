@@ -20,10 +20,12 @@
 
 import unittest
 import os
+import sys
 
 import numpy as np
+from mock import patch
 
-from ...model.util.Pattern import BkgNotInRangeError
+from ...model.util.Pattern import BkgNotInRangeError, extract_background
 from ...model.util import Pattern
 from ...model.util.PeakShapes import gaussian
 
@@ -210,6 +212,38 @@ class PatternTest(unittest.TestCase):
 
         # self.array_almost_equal(y_spec, y)
 
+    def test_scaling_with_background_pattern_with_different_spacing(self):
+        x = np.linspace(-5, 5, 100)
+        x_bkg = np.linspace(-5, 5, 99)
+
+        spec = Pattern(x, x ** 2)
+        spec.background_pattern = Pattern(x_bkg, x_bkg)
+        spec.scaling = 2
+        spec.offset = 1
+
+        self.array_almost_equal(spec.y, 2 * x ** 2 + 1 - x)
+
+    def test_only_changed_stages_are_recalculated(self):
+        x = np.linspace(0, 24, 2500)
+        y = gaussian(x, 10, 3, 0.1) + x * 0.4 + 5.0
+        pattern = Pattern(x, y)
+
+        pattern_module = sys.modules[Pattern.__module__]
+        with patch.object(pattern_module, 'extract_background', side_effect=extract_background) as extract_mock:
+            pattern.set_auto_background_subtraction([2, 50, 50])
+            self.assertEqual(extract_mock.call_count, 1)
+            y_auto_bkg = pattern.auto_background_pattern.y
+
+            pattern.set_smoothing(2)
+            pattern.set_smoothing(0)
+            self.assertEqual(extract_mock.call_count, 1)
+            self.assertIs(pattern.auto_background_pattern.y, y_auto_bkg)
+
+            pattern.scaling = 2
+            self.assertEqual(extract_mock.call_count, 2)
+            pattern.set_auto_background_subtraction([2, 40, 50])
+            self.assertEqual(extract_mock.call_count, 3)
+
     def test_setting_new_data(self):
         spec = Pattern()
         x = np.linspace(0, 10)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import os
+import shutil
+import tempfile
+from math import sqrt
+
+import numpy as np
+import h5py
+from numpy.testing import assert_array_almost_equal
+
+from ...model.util.PatternWriter import format_pattern, PatternWriter, PatternStackWriter
+from ...model.BatchModel import BatchModel
+from ...model.CalibrationModel import CalibrationModel
+from ...model.ImgModel import ImgModel
+from ...model.MaskModel import MaskModel
+
+
+class PatternWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.x = np.linspace(0.1, 15, 100)
+        self.y = np.sin(self.x) * 1000
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_format_xy(self):
+        expected = '# header\n' + ''.join('{0:.9E}  {1:.9E}\n'.format(x, y) for x, y in zip(self.x, self.y))
+        self.assertEqual(format_pattern('test.xy', self.x, self.y, '# header'), expected)
+
+    def test_format_chi(self):
+        expected = 'test.chi\n2th_deg\n\n       100\n' + \
+                   ''.join(' {0:.7E}  {1:.7E}\n'.format(x, y) for x, y in zip(self.x, self.y))
+        self.assertEqual(format_pattern('test.chi', self.x, self.y, unit='2th_deg'), expected)
+
+    def test_format_fxye(self):
+        header = 'BANK 1 NUM_POINTS MIN_X_VAL STEP_X_VAL'
+        content = format_pattern('test.fxye', self.x, self.y, header)
+
+        lines = content.split('\n')
+        self.assertEqual(lines[0], 'BANK 1 {0:.6g} {1:.6g} {2:.6g}'.format(100, 100 * self.x[0],
+                                                                          100 * (self.x[1] - self.x[0])))
+        expected = ''.join('\t{0:.6g}\t{1:.6g}\t{2:.6g}\n'.format(100 * x, y, sqrt(abs(y)))
+                           for x, y in zip(self.x, self.y))
+        self.assertEqual(content[len(lines[0]) + 1:], expected)
+
+    def test_write_in_background(self):
+        writer = PatternWriter()
+        filenames = [os.path.join(self.temp_dir, 'pattern_{}.xy'.format(i)) for i in range(10)]
+        for ind, filename in enumerate(filenames):
+            writer.write(filename, self.x, self.y * ind)
+        writer.flush()
+
+        for ind, filename in enumerate(filenames):
+            data = np.loadtxt(filename)
+            assert_array_almost_equal(data[:, 1], self.y * ind)
+
+    def test_failed_files_are_returned_by_flush(self):
+        writer = PatternWriter()
+        good_filename = os.path.join(self.temp_dir, 'pattern.xy')
+        bad_filename = os.path.join(self.temp_dir, 'missing_dir', 'pattern.xy')
+        writer.write(bad_filename, self.x, self.y)
+        writer.write(good_filename, self.x, self.y)
+        self.assertEqual(writer.flush(), [bad_filename])
+        self.assertTrue(os.path.exists(good_filename))
+        self.assertEqual(writer.flush(), [])
+
+    def test_writer_thread_stops_when_idle(self):
+        writer = PatternWriter()
+        writer.write(os.path.join(self.temp_dir, 'pattern.xy'), self.x, self.y)
+        thread = writer._thread
+        self.assertFalse(thread.daemon)  # queued patterns are written before the program exits
+        writer.flush()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+        writer.write(os.path.join(self.temp_dir, 'pattern_2.xy'), self.x, self.y)
+        writer.flush()
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'pattern_2.xy')))
+
+    def test_write_stack(self):
+        filename = os.path.join(self.temp_dir, 'stack.nxs')
+        with PatternStackWriter(filename, unit='2th_deg', chunk_size=4) as stack_writer:
+            for ind in range(10):
+                stack_writer.add(self.x, self.y * ind, 'image_{}.tif'.format(ind), background=self.y)
+
+        with h5py.File(filename, 'r') as f:
+            data = f['processed/result/data'][()]
+            self.assertEqual(data.shape, (10, 100))
+            assert_array_almost_equal(data[3], self.y * 3)
+            assert_array_almost_equal(f['processed/result/binning'][()], self.x)
+            self.assertEqual(f['processed/process/files'][5].decode(), 'image_5.tif')
+            self.assertEqual(f['processed/process/bkg'].shape, (10, 100))
+            self.assertEqual(f['processed/process/int_unit'][()].decode(), '2th_deg')
+
+    def test_load_stack_as_processed_batch_data(self):
+        filename = os.path.join(self.temp_dir, 'stack.nxs')
+        mask = np.zeros((20, 30), dtype=bool)
+        mask[5:10] = True
+        with PatternStackWriter(filename, unit='2th_deg', chunk_size=2, mask=mask) as stack_writer:
+            for ind in range(3):
+                stack_writer.add(self.x, self.y * ind, 'image_{}.tif'.format(ind), background=self.y)
+
+        batch_model = BatchModel(CalibrationModel(ImgModel()), MaskModel())
+        batch_model.load_proc_data(filename)
+        self.assertEqual(batch_model.data.shape, (3, 100))
+        assert_array_almost_equal(batch_model.data[2], self.y * 2)
+        self.assertEqual(list(batch_model.files), ['image_0.tif', 'image_1.tif', 'image_2.tif'])
+        self.assertEqual(list(batch_model.file_map), [0, 1, 2, 3])
+        self.assertEqual(batch_model.pos_map.tolist(), [[0, 0], [1, 0], [2, 0]])
+        self.assertEqual(batch_model.bkg.shape, (3, 100))
+        self.assertTrue(np.array_equal(batch_model.mask_model.get_mask(), mask))
+
+    def test_stack_with_background_of_later_patterns(self):
+        filename = os.path.join(self.temp_dir, 'stack.nxs')
+        with PatternStackWriter(filename, chunk_size=4) as stack_writer:
+            for ind in range(10):
+                stack_writer.add(self.x, self.y, background=self.y * ind if ind >= 6 else None)
+
+        with h5py.File(filename, 'r') as f:
+            bkg = f['processed/process/bkg'][()]
+        self.assertEqual(bkg.shape, (10, 100))
+        self.assertTrue(np.all(np.isnan(bkg[:6])))
+        assert_array_almost_equal(bkg[7], self.y * 7)
+
+    def test_stack_with_different_number_of_points(self):
+        stack_writer = PatternStackWriter(os.path.join(self.temp_dir, 'stack.nxs'))
+        stack_writer.add(self.x, self.y)
+        with self.assertRaises(ValueError):
+            stack_writer.add(self.x[:10], self.y[:10])
+        stack_writer.close()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import gc
+from mock import MagicMock
+
+import numpy as np
+
+from ..utility import QtTest, delete_if_exists
+from ...model.CalibrationModel import CalibrationModel
+from ...model.ImgModel import ImgModel
+from ...model.MaskModel import MaskModel
+from ...model.PeakMonitorModel import PeakMonitorModel
+
+unittest_path = os.path.dirname(__file__)
+data_path = os.path.join(unittest_path, '../data')
+monitor_file = os.path.join(data_path, 'test_peak_monitor.txt')
+
+
+class PeakMonitorModelTest(QtTest):
+    def setUp(self):
+        self.img_model = ImgModel()
+        self.calibration_model = CalibrationModel(self.img_model)
+        self.calibration_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.poni'))
+        self.mask_model = MaskModel()
+        self.peak_monitor_model = PeakMonitorModel(self.calibration_model, self.mask_model)
+
+    def tearDown(self):
+        self.peak_monitor_model.stop()
+        delete_if_exists(monitor_file)
+        del self.peak_monitor_model
+        del self.calibration_model
+        del self.img_model
+        gc.collect()
+
+    def test_evaluate_windows(self):
+        img_data = np.ones((1043, 981))
+        self.calibration_model.correct_solid_angle = False
+        self.calibration_model.polarization_factor = 0
+        tth = np.degrees(self.calibration_model.pattern_geometry.twoThetaArray(img_data.shape))
+        chi = np.degrees(self.calibration_model.pattern_geometry.chiArray(img_data.shape))
+
+        self.peak_monitor_model.add_window('full', 5, 6)
+        self.peak_monitor_model.add_window('sector', 5, 6, 0, 90)
+        self.peak_monitor_model.add_window('across 180', 5, 6, 170, -170)
+        values = self.peak_monitor_model.evaluate(img_data)
+
+        ring = (tth >= 5) & (tth < 6)
+        self.assertAlmostEqual(values[0] / np.sum(ring), 1, places=2)  # polarization of unpolarized beam is ~1
+        self.assertAlmostEqual(values[1] / np.sum(ring & (chi >= 0) & (chi < 90)), 1, places=2)
+        self.assertAlmostEqual(values[2] / np.sum(ring & ((chi >= 170) | (chi < -170))), 1, places=2)
+
+    def test_evaluate_equals_sum_of_corrected_pixels(self):
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.peak_monitor_model.add_window('ring', 7, 8)
+        value = self.peak_monitor_model.evaluate(self.img_model.raw_img_data)[0]
+
+        geometry = self.calibration_model.pattern_geometry
+        shape = self.img_model.raw_img_data.shape
+        tth = np.degrees(geometry.twoThetaArray(shape))
+        corrections = geometry.polarization(shape, self.calibration_model.polarization_factor) * \
+                      geometry.solidAngleArray(shape)
+        ring = (tth >= 7) & (tth < 8)
+        expected = np.sum(self.img_model.raw_img_data[ring] / corrections[ring])
+        self.assertAlmostEqual(value / expected, 1, places=6)
+
+    def test_monitor_new_images(self):
+        self.peak_monitor_model.add_window('ring', 7, 8)
+        self.peak_monitor_model.start(monitor_file)
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.assertEqual(self.peak_monitor_model.values.shape, (2, 1))
+        self.assertEqual(len(self.peak_monitor_model.frames), 2)
+
+        self.peak_monitor_model.stop()
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.assertEqual(self.peak_monitor_model.values.shape, (2, 1))
+
+        with open(monitor_file) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('#'))
+        self.assertAlmostEqual(float(lines[2].split('\t')[-1]) / self.peak_monitor_model.values[1, 0], 1,
+                               places=5)
+
+    def test_integration_resumed_only_after_skipped_images(self):
+        resumed = MagicMock()
+        self.peak_monitor_model.integration_resumed.connect(resumed)
+        self.peak_monitor_model.add_window('ring', 7, 8)
+
+        self.peak_monitor_model.start()
+        self.peak_monitor_model.stop()
+        resumed.assert_not_called()
+
+        self.peak_monitor_model.start()
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.peak_monitor_model.stop()
+        self.assertEqual(resumed.call_count, 1)
+
+        self.peak_monitor_model.start()
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.peak_monitor_model.suspend_integration = False
+        self.assertEqual(resumed.call_count, 2)
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.peak_monitor_model.stop()
+        self.assertEqual(resumed.call_count, 2)
+
+    def test_changing_windows_restarts_time_series(self):
+        self.peak_monitor_model.add_window('ring', 7, 8)
+        self.peak_monitor_model.start()
+        self.img_model.load(os.path.join(data_path, 'CeO2_Pilatus1M.tif'))
+        self.peak_monitor_model.add_window('ring 2', 9, 10)
+        self.assertEqual(self.peak_monitor_model.values.shape, (0, 2))
@@ -21,6 +21,9 @@
 import unittest
 import os
 
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
 from ...model.PhaseModel import PhaseModel
 
 unittest_path = os.path.dirname(__file__)
@@ -82,6 +85,38 @@ class PhaseModelTest(unittest.TestCase):
         # since there is no thermal expansion defined the temperature should stay at ambient
         self.assertEqual(self.phase_model.phases[0].params['temperature'], 298)
 
+    def test_get_lines_d_for_conditions(self):
+        self.load_phase('pt.jcpds')
+        pressures = np.linspace(0, 100, 20)
+        temperatures = np.linspace(298, 2000, 20)
+        lines_d = self.phase_model.reflections[0][:, 0].copy()
+
+        d_spacings = self.phase_model.get_lines_d_for_conditions(0, pressures, temperatures)
+        self.assertEqual(d_spacings.shape, (20, len(lines_d)))
+        # the current state of the phase is not changed
+        self.assertEqual(self.phase_model.phases[0].params['pressure'], 0)
+        assert_array_almost_equal(self.phase_model.reflections[0][:, 0], lines_d)
+
+        self.phase_model.set_pressure_temperature(0, pressures[7], temperatures[7])
+        assert_array_almost_equal(d_spacings[7] / self.phase_model.reflections[0][:, 0], 1, decimal=4)
+
+    def test_get_phase_line_indices(self):
+        self.load_phase('pt.jcpds')
+        tth = np.linspace(5, 25, 1000)
+        line_indices, intensities = self.phase_model.get_phase_line_indices(0, tth, 0.31)
+        positions = self.phase_model.get_phase_line_positions(0, 'tth', 0.31)
+        inside = (positions > tth[0]) & (positions <= tth[-1])
+        assert_array_almost_equal(np.isnan(line_indices), ~inside)
+        assert_array_almost_equal(np.interp(line_indices[inside], np.arange(len(tth)), tth), positions[inside])
+        assert_array_almost_equal(intensities, self.phase_model.reflections[0][:, 1])
+
+        # the mapping is cached until the binning, wavelength or phase changes
+        self.assertIs(self.phase_model.get_phase_line_indices(0, tth.copy(), 0.31)[0], line_indices)
+        self.assertIsNot(self.phase_model.get_phase_line_indices(0, tth, 0.3)[0], line_indices)
+        self.phase_model.set_pressure(0, 10)
+        new_line_indices = self.phase_model.get_phase_line_indices(0, tth, 0.31)[0]
+        self.assertGreater(np.nanmin(new_line_indices - line_indices), 0)
+
     def test_reload_phase(self):
         self.load_phase('ar.jcpds')
         num_refl = len(self.phase_model.reflections[0])
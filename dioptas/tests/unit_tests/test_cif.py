@@ -24,9 +24,10 @@ try:
 except ImportError:
     from urllib.request import pathname2url
 
+import numpy as np
 from CifFile import ReadCif
 
-from ...model.util.cif import CifPhase, CifConverter
+from ...model.util.cif import CifPhase, CifConverter, get_unique_families
 
 unittest_path = os.path.dirname(__file__)
 data_path = os.path.join(unittest_path, '../data')
@@ -111,3 +112,24 @@ class TestCifModule(unittest.TestCase):
 
 
 
+
+    def test_reflections_of_fcc_structure(self):
+        fcc_cif = ReadCif(get_cif_url('fcc.cif'))
+        cif_phase = CifPhase(fcc_cif[fcc_cif.keys()[0]])
+        cif_converter = CifConverter(0.31, min_d_spacing=1.0, min_intensity=0.01)
+        hkl, d_spacings = cif_converter._calculate_hkl_within_sphere_and_min_d_spacing(cif_phase)
+        self.assertTrue(np.all(d_spacings > 1.0))
+        self.assertFalse(np.any(np.all(hkl == 0, axis=1)))
+
+        reflections = cif_converter._calculate_reflection_intensities(cif_phase, hkl, d_spacings)
+        for reflection in reflections:
+            # mixed parity reflections are extinct in a face centered lattice
+            self.assertEqual(reflection.h % 2, reflection.k % 2)
+            self.assertEqual(reflection.k % 2, reflection.l % 2)
+        self.assertEqual(sorted(map(abs, (reflections[0].h, reflections[0].k, reflections[0].l))), [1, 1, 1])
+        self.assertEqual(reflections[0].multiplicity, 8)
+        self.assertEqual(reflections[1].multiplicity, 6)
+
+    def test_get_unique_families(self):
+        hkls = [(1, 0, 0), (0, 1, 0), (0, 0, -1), (1, 1, 0), (-1, 0, 1)]
+        self.assertEqual(get_unique_families(hkls), {(1, 0, 0): 3, (1, 1, 0): 2})
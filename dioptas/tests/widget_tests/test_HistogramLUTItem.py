@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import numpy as np
+from mock import MagicMock, PropertyMock, patch
+from qtpy import QtWidgets
+import pyqtgraph as pg
+
+from ..utility import QtTest
+from ...widgets.plot_widgets.HistogramLUTItem import HistogramLUTItem, ImageHistogram, calculate_histogram
+from ...widgets.plot_widgets.ImgWidget import ImgWidget
+
+
+def process_events_until(condition, timeout=2):
+    start_time = time.time()
+    while not condition() and time.time() - start_time < timeout:
+        QtWidgets.QApplication.processEvents()
+        time.sleep(0.01)
+
+
+class CalculateHistogramTest(QtTest):
+    def test_integer_image_with_small_range(self):
+        img_data = np.random.randint(10, 200, size=(100, 100)).astype(np.uint16)
+        hist_x, hist_y = calculate_histogram(img_data)
+
+        self.assertEqual(hist_x[0], img_data.min())
+        self.assertEqual(hist_x[-1], img_data.max())
+        self.assertEqual(np.sum(hist_y), img_data.size)
+        np.testing.assert_array_equal(hist_y, np.bincount(img_data.ravel())[img_data.min():])
+
+    def test_float_image(self):
+        img_data = np.random.random((100, 100)) * 1000
+        img_data[0, 0] = np.nan
+        img_data[0, 1] = np.inf
+        hist_x, hist_y = calculate_histogram(img_data, bins=100)
+
+        finite_data = img_data[np.isfinite(img_data)]
+        np_hist_y, np_hist_x = np.histogram(finite_data, bins=100)
+        np.testing.assert_array_almost_equal(hist_x, np_hist_x[:-1])
+        self.assertEqual(np.sum(hist_y), finite_data.size)
+        self.assertLessEqual(np.max(np.abs(hist_y - np_hist_y)), 2)  # edge pixels may fall into a neighbouring bin
+
+    def test_large_image_is_subsampled(self):
+        img_data = np.ones((2048, 2048), dtype=np.int32)
+        hist_x, hist_y = calculate_histogram(img_data, max_samples=2 ** 16)
+        self.assertLessEqual(np.sum(hist_y), 2 ** 16)
+
+    def test_empty_images(self):
+        self.assertEqual(calculate_histogram(None), (None, None))
+        self.assertEqual(calculate_histogram(np.ones((10, 10)) * np.nan), (None, None))
+
+
+class ImageHistogramTest(QtTest):
+    def setUp(self):
+        self.histogram = ImageHistogram()
+        self.img_data = np.random.randint(0, 100, size=(100, 100))
+
+    def test_same_image_is_only_calculated_once(self):
+        self.histogram.update(self.img_data)
+        hist = self.histogram.get_histogram()
+        self.histogram.update(self.img_data)
+        self.assertEqual(self.histogram.version, 1)
+        self.assertIs(self.histogram.get_histogram(), hist)
+
+        self.histogram.update(self.img_data.copy())
+        self.assertEqual(self.histogram.version, 2)
+
+    def test_calculated_signal_is_emitted_in_gui_thread(self):
+        callback = MagicMock()
+        self.histogram.calculated.connect(callback)
+        self.histogram.update(self.img_data)
+        process_events_until(lambda: callback.called)
+        callback.assert_called_once_with()
+
+    def test_histogram_lut_items_share_histogram(self):
+        img_item = pg.ImageItem()
+        lut_horizontal = HistogramLUTItem(img_item, histogram=self.histogram)
+        lut_vertical = HistogramLUTItem(img_item, orientation='vertical', histogram=self.histogram)
+
+        img_item.setImage(self.img_data)
+        self.assertEqual(self.histogram.version, 2)  # one for setting the empty image item
+
+        process_events_until(lambda: lut_horizontal.hist_x is not None and lut_vertical.hist_x is not None)
+        np.testing.assert_array_equal(lut_horizontal.hist_x, lut_vertical.hist_x)
+        self.assertEqual(np.sum(lut_horizontal.hist_y), self.img_data.size)
+
+
+class ImgWidgetAutoLevelTest(QtTest):
+    def setUp(self):
+        self.pg_layout = pg.GraphicsLayoutWidget()
+        self.img_widget = ImgWidget(self.pg_layout)
+        self.img_data = np.random.randint(1000, 2000, size=(1000, 1000))
+
+    def test_auto_level_is_applied_when_histogram_is_calculated(self):
+        self.img_widget.plot_image(self.img_data)
+        with patch.object(ImageHistogram, 'ready', new_callable=PropertyMock, return_value=False):
+            self.img_widget.auto_level()  # returns without waiting for the histogram
+        self.assertTrue(self.img_widget._auto_level_pending)
+
+        process_events_until(lambda: not self.img_widget._auto_level_pending)
+        self.assertFalse(self.img_widget._auto_level_pending)
+        min_level, max_level = self.img_widget.img_histogram_LUT_horizontal.getExpLevels()
+        self.assertGreaterEqual(min_level, 999)
+        self.assertLessEqual(max_level, 2000)
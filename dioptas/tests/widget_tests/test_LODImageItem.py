@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import numpy as np
+from qtpy import QtWidgets
+from pyqtgraph import GraphicsLayoutWidget
+
+from ..utility import QtTest
+from ...widgets.plot_widgets.ImgWidget import ImgWidget
+from ...widgets.plot_widgets.LODImageItem import downsample, calculate_pyramid
+
+
+class DownsampleTest(QtTest):
+    def test_max_reduction(self):
+        img_data = np.arange(12, dtype=float).reshape(3, 4)
+        img_data[0, 1] = np.nan
+        np.testing.assert_array_equal(downsample(img_data, 2, 1), [[0, 3], [5, 7], [9, 11]])
+        np.testing.assert_array_equal(downsample(img_data, 2, 0), [[4, 5, 6, 7], [8, 9, 10, 11]])
+
+    def test_mean_reduction(self):
+        img_data = np.arange(8, dtype=np.uint16).reshape(2, 4)
+        np.testing.assert_array_almost_equal(downsample(img_data, 2, 1, 'mean'), [[0.5, 2.5], [4.5, 6.5]])
+
+    def test_pyramid(self):
+        img_data = np.random.random((1001, 300))
+        img_data[1000, 299] = 10
+        pyramid = calculate_pyramid(img_data, min_size=100)
+
+        self.assertEqual([level.shape for level in pyramid], [(1001, 300), (501, 150), (251, 75), (126, 38),
+                                                              (63, 19)])
+        for level in pyramid:
+            self.assertEqual(np.max(level), 10)
+
+
+class LODImageItemTest(QtTest):
+    def setUp(self):
+        self.pg_layout = GraphicsLayoutWidget()
+        self.pg_layout.resize(400, 400)
+        self.img_widget = ImgWidget(self.pg_layout)
+        self.img_item = self.img_widget.data_img_item
+        self.pg_layout.show()
+        self.img_data = np.random.random((4000, 2000))
+
+    def tearDown(self):
+        self.pg_layout.close()
+        del self.img_widget
+
+    def render(self):
+        QtWidgets.QApplication.processEvents()
+        self.pg_layout.grab()
+
+    def wait_for_pyramid(self):
+        start_time = time.time()
+        while len(self.img_item._pyramid) == 0 and time.time() - start_time < 5:
+            QtWidgets.QApplication.processEvents()
+            time.sleep(0.01)
+
+    def test_zoomed_out_image_is_rendered_downsampled(self):
+        self.img_widget.plot_image(self.img_data, True)
+        self.wait_for_pyramid()
+        self.render()
+
+        level = self.img_item._render_region[0]
+        self.assertGreater(level, 0)
+        self.assertLess(self.img_item.qimage.width(), self.img_data.shape[1])
+        self.assertEqual(self.img_item._render_rect.width(), self.img_data.shape[1])
+        self.assertEqual(self.img_item._render_rect.height(), self.img_data.shape[0])
+
+    def test_zoomed_in_image_renders_only_visible_tiles(self):
+        self.img_widget.plot_image(self.img_data, True)
+        self.img_widget.img_view_box.setRange(xRange=(1000, 1100), yRange=(2000, 2100), padding=0)
+        self.render()
+
+        self.assertEqual(self.img_item._render_region[0], 0)
+        self.assertLessEqual(self.img_item.qimage.width(), 2 * self.img_item.tile_size)
+        self.assertLessEqual(self.img_item.qimage.height(), 2 * self.img_item.tile_size)
+        self.assertTrue(self.img_item._render_rect.contains(self.img_item.viewRect()))
+
+    def test_full_resolution_image_is_kept(self):
+        self.img_widget.plot_image(self.img_data, True)
+        self.wait_for_pyramid()
+        self.render()
+        self.assertIs(self.img_item.image.base, self.img_data)
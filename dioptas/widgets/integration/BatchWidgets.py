@@ -2,12 +2,13 @@ import os
 
 from qtpy import QtWidgets
 from qtpy import QtWidgets, QtCore, QtGui
-from pyqtgraph import GraphicsLayoutWidget, ColorButton
+from pyqtgraph import GraphicsLayoutWidget, ColorButton, PlotWidget, InfiniteLine
 
-from ..plot_widgets.ImgWidget import SurfWidget, IntegrationBatchWidget
+from ..plot_widgets.ImgWidget import IntegrationBatchWidget
 from .CustomWidgets import FlatButton, StepFrameWidget, StepBatchWidget, FileViewWidget
 from .CustomWidgets import MouseCurrentAndClickedWidget, MouseUnitCurrentAndClickedWidget
 from ..CustomWidgets import LabelAlignRight, FlatButton, CheckableFlatButton, HorizontalSpacerItem, VerticalSpacerItem
+from ..CustomWidgets import NumberTextField
 
 from . import CLICKED_COLOR
 from ... import icons_path
@@ -18,6 +19,8 @@ class BatchWidget(QtWidgets.QWidget):
     Class describe a widget for batch integration
     """
 
+    surf_view_created = QtCore.Signal()
+
     def __init__(self, parent=None):
         super(BatchWidget, self).__init__(parent)
 
@@ -98,10 +101,8 @@ class BatchWidget(QtWidgets.QWidget):
         self.img_view = IntegrationBatchWidget(self.img_pg_layout, orientation='horizontal')
         self._central_layout.addWidget(self.img_pg_layout)
 
-        self.surf_view = SurfWidget()
-        self.surf_pg_layout = self.surf_view.pg_layout
-        self._central_layout.addWidget(self.surf_view)
-        self.surf_view.hide()
+        # the 3D view needs OpenGL, it is only created when it is used the first time (see surf_view)
+        self._surf_view = None
 
         # Right control
         self.right_control_widget = QtWidgets.QWidget()
@@ -165,6 +166,16 @@ class BatchWidget(QtWidgets.QWidget):
         self._central_layout.addWidget(self.right_control_widget)
         self._frame_layout.addLayout(self._central_layout)
 
+        # per-frame reductions plotted against the frame index
+        self.reduction_plot = PlotWidget()
+        self.reduction_plot.setMaximumHeight(150)
+        self.reduction_plot.setLabel('bottom', 'Frame')
+        self.reduction_curve = self.reduction_plot.plot(pen='y')
+        self.reduction_frame_line = InfiniteLine(angle=90, pen=CLICKED_COLOR)
+        self.reduction_plot.addItem(self.reduction_frame_line)
+        self.reduction_plot.hide()
+        self._frame_layout.addWidget(self.reduction_plot)
+
         # Bottom control layout
         self.bottom_control_widget = QtWidgets.QWidget()
         self.bottom_control_widget.setObjectName('pattern_bottom_control_widget')
@@ -176,6 +187,19 @@ class BatchWidget(QtWidgets.QWidget):
         self.load_btn.setMaximumWidth(25)
 
         self.integrate_btn = FlatButton("Integrate")
+        self.cosmic_btn = CheckableFlatButton("Cosmic")
+        self.cosmic_btn.setToolTip("Mask cosmic rays in every image before integration")
+        self.cake_btn = CheckableFlatButton("Cake")
+        self.cake_btn.setToolTip("Write the cake of every image into a compressed stack file during integration")
+        self.sectors_sb = QtWidgets.QSpinBox()
+        self.sectors_sb.setRange(0, 360)
+        self.sectors_sb.setSpecialValueText("No sectors")
+        self.sectors_sb.setSuffix(" sectors")
+        self.sectors_sb.setToolTip("Integrate every image additionally into this number of azimuthal sectors\n"
+                                   "in a single pass (saved with the processed data)")
+        self.live_btn = CheckableFlatButton("Live")
+        self.live_btn.setToolTip("Follow the files while they are written by the detector and integrate new images\n"
+                                 "as they arrive (appended to a processed data file)")
         self.load_proc_btn = FlatButton("Load proc data")
 
         self.save_btn = FlatButton()
@@ -199,6 +223,12 @@ class BatchWidget(QtWidgets.QWidget):
         self.calc_bkg_btn = FlatButton("Calc bkg")
         self.calc_bkg_btn.setToolTip("Extract background")
 
+        self.reduction_cb = QtWidgets.QComboBox()
+        self.reduction_cb.setToolTip("Plot a per-frame reduction calculated during integration against the frame")
+        self.reductions_btn = FlatButton("Reductions")
+        self.reductions_btn.setToolTip("Select the per-frame reductions calculated during integration")
+        self.reductions_widget = ReductionsWidget(self)
+
         self.phases_btn = CheckableFlatButton('Show Phases')
         self.autoscale_btn = FlatButton("AutoScale")
 
@@ -207,10 +237,16 @@ class BatchWidget(QtWidgets.QWidget):
         self.bottom_control_layout.addWidget(self.save_btn)
 
         self.bottom_control_layout.addWidget(self.integrate_btn)
+        self.bottom_control_layout.addWidget(self.cosmic_btn)
+        self.bottom_control_layout.addWidget(self.sectors_sb)
+        self.bottom_control_layout.addWidget(self.cake_btn)
+        self.bottom_control_layout.addWidget(self.live_btn)
         self.bottom_control_layout.addWidget(self.calc_bkg_btn)
         self.bottom_control_layout.addWidget(self.waterfall_btn)
         self.bottom_control_layout.addWidget(self.phases_btn)
         self.bottom_control_layout.addWidget(self.autoscale_btn)
+        self.bottom_control_layout.addWidget(self.reductions_btn)
+        self.bottom_control_layout.addWidget(self.reduction_cb)
 
         self.bottom_control_layout.addSpacerItem(HorizontalSpacerItem())
         self.bottom_control_layout.addWidget(self.view_f_btn)
@@ -282,6 +318,100 @@ class BatchWidget(QtWidgets.QWidget):
                     }
         	    """)
 
+    @property
+    def surf_view(self):
+        """
+        3D surface view of the batch data. The widget is created on first access, since importing and initializing
+        OpenGL slows down the start of Dioptas considerably.
+        """
+        if self._surf_view is None:
+            from ..plot_widgets.SurfWidget import SurfWidget
+            self._surf_view = SurfWidget()
+            self._surf_view.hide()
+            self._central_layout.insertWidget(self._central_layout.indexOf(self.img_pg_layout) + 1, self._surf_view)
+            self.surf_view_created.emit()
+        return self._surf_view
+
+    @property
+    def surf_pg_layout(self):
+        return self.surf_view.pg_layout
+
+    def hide_surf_view(self):
+        """
+        Hides the 3D surface view, without creating it, if it does not exist yet.
+        """
+        if self._surf_view is not None:
+            self._surf_view.hide()
+
+    def raise_widget(self):
+        self.show()
+        self.setWindowState(self.windowState() & ~QtCore.Qt.WindowMinimized | QtCore.Qt.WindowActive)
+        self.activateWindow()
+        self.raise_()
+
+
+class ReductionsWidget(QtWidgets.QWidget):
+    """
+    Tool window for the selection of the per-frame reductions (see model.util.FrameReductions), which are calculated
+    during the batch integration.
+    """
+
+    def __init__(self, parent=None):
+        super(ReductionsWidget, self).__init__(parent)
+        self.setWindowTitle("Per-frame reductions")
+
+        self.total_counts_cb = QtWidgets.QCheckBox('total counts')
+        self.max_pixel_cb = QtWidgets.QCheckBox('max pixel')
+
+        self.saturated_pixels_cb = QtWidgets.QCheckBox('saturated pixels')
+        self.saturation_threshold_txt = NumberTextField()
+        self.saturation_threshold_txt.setToolTip("Pixels with an intensity equal or above are counted")
+
+        self.roi_sum_cb = QtWidgets.QCheckBox('ROI sum')
+        self.roi_row_min_sb = QtWidgets.QSpinBox()
+        self.roi_row_max_sb = QtWidgets.QSpinBox()
+        self.roi_col_min_sb = QtWidgets.QSpinBox()
+        self.roi_col_max_sb = QtWidgets.QSpinBox()
+        self.roi_sbs = (self.roi_row_min_sb, self.roi_row_max_sb, self.roi_col_min_sb, self.roi_col_max_sb)
+        for sb in self.roi_sbs:
+            sb.setRange(0, 100000)
+            sb.setKeyboardTracking(False)
+        self.roi_row_max_sb.setValue(100)
+        self.roi_col_max_sb.setValue(100)
+
+        self.peak_integral_cb = QtWidgets.QCheckBox('peak integral')
+        self.peak_tth_min_txt = NumberTextField()
+        self.peak_tth_max_txt = NumberTextField()
+
+        self._layout = QtWidgets.QGridLayout()
+        self._layout.setContentsMargins(5, 5, 5, 5)
+        self._layout.addWidget(self.total_counts_cb, 0, 0)
+        self._layout.addWidget(self.max_pixel_cb, 1, 0)
+        self._layout.addWidget(self.saturated_pixels_cb, 2, 0)
+        self._layout.addWidget(LabelAlignRight('threshold:'), 2, 1)
+        self._layout.addWidget(self.saturation_threshold_txt, 2, 2)
+        self._layout.addWidget(self.roi_sum_cb, 3, 0)
+        self._layout.addWidget(LabelAlignRight('rows:'), 3, 1)
+        self._layout.addWidget(self.roi_row_min_sb, 3, 2)
+        self._layout.addWidget(self.roi_row_max_sb, 3, 3)
+        self._layout.addWidget(LabelAlignRight('columns:'), 4, 1)
+        self._layout.addWidget(self.roi_col_min_sb, 4, 2)
+        self._layout.addWidget(self.roi_col_max_sb, 4, 3)
+        self._layout.addWidget(self.peak_integral_cb, 5, 0)
+        self._layout.addWidget(LabelAlignRight(u'2θ:'), 5, 1)
+        self._layout.addWidget(self.peak_tth_min_txt, 5, 2)
+        self._layout.addWidget(self.peak_tth_max_txt, 5, 3)
+        self.setLayout(self._layout)
+
+        self.checkboxes = (self.total_counts_cb, self.max_pixel_cb, self.saturated_pixels_cb, self.roi_sum_cb,
+                           self.peak_integral_cb)
+        self.text_fields = (self.saturation_threshold_txt, self.peak_tth_min_txt, self.peak_tth_max_txt)
+        for txt in self.text_fields:
+            txt.setMaximumWidth(70)
+
+        self.setWindowFlags(QtCore.Qt.Tool)
+        self.setAttribute(QtCore.Qt.WA_MacAlwaysShowToolWindow)
+
     def raise_widget(self):
         self.show()
         self.setWindowState(self.windowState() & ~QtCore.Qt.WindowMinimized | QtCore.Qt.WindowActive)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from qtpy import QtWidgets, QtCore
+from pyqtgraph import PlotWidget, intColor
+
+from ..CustomWidgets import FlatButton, CheckableFlatButton, LabelAlignRight, NumberTextField, ListTableWidget, \
+    HorizontalSpacerItem
+
+
+class PeakMonitorWidget(QtWidgets.QWidget):
+    """
+    Tool window of the peak monitor: definition of the 2theta/azimuth windows and a live plot of their summed
+    intensities against the frame number.
+    """
+
+    def __init__(self, parent=None):
+        super(PeakMonitorWidget, self).__init__(parent)
+        self.setWindowTitle("Peak monitor")
+
+        self.name_txt = QtWidgets.QLineEdit()
+        self.name_txt.setPlaceholderText('name')
+        self.tth_min_txt = NumberTextField()
+        self.tth_max_txt = NumberTextField()
+        self.azi_min_txt = NumberTextField()
+        self.azi_max_txt = NumberTextField()
+        self.azi_min_txt.setPlaceholderText('all')
+        self.azi_max_txt.setPlaceholderText('all')
+        self.add_btn = FlatButton('Add')
+        self.delete_btn = FlatButton('Delete')
+
+        self.windows_tw = ListTableWidget(columns=5)
+
+        self.start_btn = CheckableFlatButton('Start')
+        self.start_btn.setToolTip("Evaluate the windows for every new image")
+        self.stream_cb = QtWidgets.QCheckBox('stream to file')
+        self.suspend_integration_cb = QtWidgets.QCheckBox('pause integration')
+        self.suspend_integration_cb.setToolTip("Do not integrate the new images while the monitor is running")
+        self.suspend_integration_cb.setChecked(True)
+        self.clear_btn = FlatButton('Clear')
+        self.file_lbl = QtWidgets.QLabel()
+
+        self.plot_widget = PlotWidget()
+        self.plot_widget.setLabel('bottom', 'Frame')
+        self.plot_widget.setLabel('left', 'Intensity')
+        self.legend = self.plot_widget.addLegend()
+        self.curves = []
+
+        self._window_layout = QtWidgets.QHBoxLayout()
+        self._window_layout.addWidget(self.name_txt)
+        self._window_layout.addWidget(LabelAlignRight(u'2θ:'))
+        self._window_layout.addWidget(self.tth_min_txt)
+        self._window_layout.addWidget(self.tth_max_txt)
+        self._window_layout.addWidget(LabelAlignRight(u'χ:'))
+        self._window_layout.addWidget(self.azi_min_txt)
+        self._window_layout.addWidget(self.azi_max_txt)
+        self._window_layout.addWidget(self.add_btn)
+        self._window_layout.addWidget(self.delete_btn)
+
+        self._control_layout = QtWidgets.QHBoxLayout()
+        self._control_layout.addWidget(self.start_btn)
+        self._control_layout.addWidget(self.stream_cb)
+        self._control_layout.addWidget(self.suspend_integration_cb)
+        self._control_layout.addWidget(self.clear_btn)
+        self._control_layout.addWidget(self.file_lbl)
+        self._control_layout.addSpacerItem(HorizontalSpacerItem())
+
+        self._layout = QtWidgets.QVBoxLayout()
+        self._layout.setContentsMargins(5, 5, 5, 5)
+        self._layout.addLayout(self._window_layout)
+        self._layout.addWidget(self.windows_tw)
+        self._layout.addLayout(self._control_layout)
+        self._layout.addWidget(self.plot_widget)
+        self.setLayout(self._layout)
+
+        for txt in (self.tth_min_txt, self.tth_max_txt, self.azi_min_txt, self.azi_max_txt):
+            txt.setMaximumWidth(60)
+        self.windows_tw.setMaximumHeight(100)
+
+        self.setWindowFlags(QtCore.Qt.Tool)
+        self.setAttribute(QtCore.Qt.WA_MacAlwaysShowToolWindow)
+
+    def set_windows(self, windows):
+        """
+        Shows the windows in the table and creates one curve per window.
+        :param windows: list of PeakMonitorModel.PeakWindow
+        """
+        self.windows_tw.setRowCount(len(windows))
+        for row, window in enumerate(windows):
+            azi_min = '' if window.azi_min is None else '{:g}'.format(window.azi_min)
+            azi_max = '' if window.azi_max is None else '{:g}'.format(window.azi_max)
+            for col, text in enumerate((window.name, '{:g}'.format(window.tth_min), '{:g}'.format(window.tth_max),
+                                        azi_min, azi_max)):
+                self.windows_tw.setItem(row, col, QtWidgets.QTableWidgetItem(text))
+
+        for curve in self.curves:
+            self.plot_widget.removeItem(curve)
+        self.legend.clear()
+        self.curves = [self.plot_widget.plot(pen=intColor(ind, len(windows)), name=window.name)
+                       for ind, window in enumerate(windows)]
+
+    def plot_values(self, values):
+        """
+        :param values: array with shape (number of frames, number of windows)
+        """
+        for ind, curve in enumerate(self.curves):
+            if ind < values.shape[1]:
+                curve.setData(values[:, ind])
+            else:
+                curve.setData([])
+
+    def raise_widget(self):
+        self.show()
+        self.setWindowState(self.windowState() & ~QtCore.Qt.WindowMinimized | QtCore.Qt.WindowActive)
+        self.activateWindow()
+        self.raise_()
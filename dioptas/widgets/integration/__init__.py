@@ -25,6 +25,7 @@ from qtpy import QtWidgets, QtCore
 from ..UtilityWidgets import FileInfoWidget
 from ..EpicsWidgets import MoveStageWidget
 from .BatchWidgets import BatchWidget
+from .PeakMonitorWidget import PeakMonitorWidget
 
 from .CustomWidgets import MouseCurrentAndClickedWidget, MouseUnitCurrentAndClickedWidget
 from .control import IntegrationControlWidget
@@ -86,6 +87,7 @@ class IntegrationWidget(QtWidgets.QWidget):
         self.file_info_widget = FileInfoWidget(self)
         self.move_widget = MoveStageWidget(self)
         self.batch_widget = BatchWidget(self)
+        self.peak_monitor_widget = PeakMonitorWidget(self)
 
         self.img_frame_size = QtCore.QSize(400, 500)
         self.img_frame_position = QtCore.QPoint(0, 0)
@@ -123,6 +125,7 @@ class IntegrationWidget(QtWidgets.QWidget):
         self.pattern_header_chi_cb = self.integration_control_widget.pattern_control_widget.chi_cb
         self.pattern_header_dat_cb = self.integration_control_widget.pattern_control_widget.dat_cb
         self.pattern_header_fxye_cb = self.integration_control_widget.pattern_control_widget.fxye_cb
+        self.pattern_stack_cb = self.integration_control_widget.pattern_control_widget.stack_cb
 
         phase_control_widget = self.integration_control_widget.phase_control_widget
         self.phase_widget = phase_control_widget
@@ -63,6 +63,11 @@ class OptionsWidget(QtWidgets.QWidget):
         self.supersampling_sb = SpinBoxAlignRight()
         self.correct_solid_angle_cb = QtWidgets.QCheckBox('correct Solid Angle')
         self.correct_solid_angle_cb.setChecked(True)
+        self.corrections_in_integrator_cb = QtWidgets.QCheckBox('Corrections in integrator')
+        self.corrections_in_integrator_cb.setToolTip('Background and image corrections are applied by pyFAI as dark '
+                                                     'and flat image during the integration')
+        self.integration_method_cb = QtWidgets.QComboBox()
+        self.integration_method_cb.addItems(['auto', 'csr', 'csc', 'lut', 'bbox', 'splitpixel', 'cython'])
 
         self._integration_gb_layout.addWidget(LabelAlignRight('Radial bins:'), 0, 0)
         self._integration_gb_layout.addWidget(LabelAlignRight('Supersampling:'), 1, 0)
@@ -75,6 +80,9 @@ class OptionsWidget(QtWidgets.QWidget):
         self._integration_gb_layout.addWidget(self.oned_azimuth_min_txt, 3, 1, 1, 1)
         self._integration_gb_layout.addWidget(self.oned_azimuth_max_txt, 3, 2, 1, 1)
         self._integration_gb_layout.addWidget(self.oned_full_toggle_btn, 4, 1, 1, 2)
+        self._integration_gb_layout.addWidget(LabelAlignRight('Method:'), 5, 0)
+        self._integration_gb_layout.addWidget(self.integration_method_cb, 5, 1, 1, 2)
+        self._integration_gb_layout.addWidget(self.corrections_in_integrator_cb, 6, 1, 1, 2)
 
         self.integration_gb.setLayout(self._integration_gb_layout)
 
@@ -154,6 +162,9 @@ class OptionsWidget(QtWidgets.QWidget):
         self.cake_save_integral_btn.setMaximumWidth(button_width)
 
     def set_tooltips(self):
+        self.integration_method_cb.setToolTip("pyFAI integration method used for patterns and cakes.\n"
+                                              "'auto' times the available methods once for each detector,\n"
+                                              "image shape and number of points and uses the fastest one.")
         self.cake_full_toggle_btn.setToolTip("Set to full available range")
         self.cake_save_integral_btn.setToolTip("Save the tth integral next to the cake image")
         self.cake_integral_width_sb.setToolTip("Sets the width used for the integral plot\nnext to the cake image.")
@@ -43,11 +43,14 @@ class PatternWidget(QtWidgets.QWidget):
         self.chi_cb = QtWidgets.QCheckBox('.chi')
         self.dat_cb = QtWidgets.QCheckBox('.dat')
         self.fxye_cb = QtWidgets.QCheckBox('.fxye')
+        self.stack_cb = QtWidgets.QCheckBox('.nxs stack')
+        self.stack_cb.setToolTip('Additionally saves all patterns of a batch integration into a single NeXus file')
         self._pattern_types_gb_layout = QtWidgets.QHBoxLayout()
         self._pattern_types_gb_layout.addWidget(self.xy_cb)
         self._pattern_types_gb_layout.addWidget(self.chi_cb)
         self._pattern_types_gb_layout.addWidget(self.dat_cb)
         self._pattern_types_gb_layout.addWidget(self.fxye_cb)
+        self._pattern_types_gb_layout.addWidget(self.stack_cb)
         self.pattern_types_gc.setLayout(self._pattern_types_gb_layout)
 
         self._pattern_types_layout = QtWidgets.QHBoxLayout()
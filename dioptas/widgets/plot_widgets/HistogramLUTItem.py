@@ -20,7 +20,9 @@
 
 from __future__ import absolute_import
 
-from qtpy import QtWidgets
+from concurrent.futures import ThreadPoolExecutor
+
+from qtpy import QtWidgets, QtCore
 from pyqtgraph.graphicsItems.GraphicsWidget import GraphicsWidget
 from pyqtgraph.graphicsItems.ViewBox import *
 from pyqtgraph.graphicsItems.GradientEditorItem import *
@@ -32,7 +34,7 @@ import pyqtgraph.functions as fn
 import pyqtgraph as pg
 import numpy as np
 
-__all__ = ['HistogramLUTItem']
+__all__ = ['HistogramLUTItem', 'ImageHistogram', 'calculate_histogram']
 
 # add grey_inverse to the list of color gradients:
 pyqtgraph.graphicsItems.GradientEditorItem.Gradients['grey_inverse'] = \
@@ -46,6 +48,112 @@ pyqtgraph.graphicsItems.GradientEditorItem.Gradients['jet'] = \
 # set the error handling for numpy
 np.seterr(divide='ignore', invalid='ignore')
 
+# histograms are calculated in a single worker thread, to not block the gui for large images
+_histogram_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def calculate_histogram(img_data, bins=3000, max_samples=2 ** 20):
+    """
+    Calculates the histogram of an image from a strided subsample with at most *max_samples* pixels. Pixels are
+    sorted into equally spaced bins with np.bincount, which is considerably faster than np.histogram. Integer images
+    with a value range smaller than *bins* get one bin per integer value.
+
+    :param img_data: 2d image array
+    :param bins: number of bins
+    :param max_samples: maximum number of pixels used for the histogram
+    :return: left bin edges and counts, (None, None) if the image has no finite values
+    """
+    if img_data is None or img_data.size == 0:
+        return None, None
+
+    step = max(1, int(np.ceil(np.sqrt(img_data.size / max_samples))))
+    data = np.ravel(img_data[::step, ::step])
+
+    integer_data = data.dtype.kind in 'ui'
+    if not integer_data:
+        data = data[np.isfinite(data)]
+        if data.size == 0:
+            return None, None
+
+    min_value, max_value = data.min(), data.max()
+
+    if integer_data and int(max_value) - int(min_value) < bins:
+        counts = np.bincount((data - min_value).astype(np.intp))
+        return np.arange(int(min_value), int(max_value) + 1), counts
+
+    min_value, max_value = float(min_value), float(max_value)
+    if max_value == min_value:
+        max_value += 1
+    scale = bins / (max_value - min_value)
+    bin_indices = ((data - min_value) * scale).astype(np.intp)
+    np.clip(bin_indices, 0, bins - 1, out=bin_indices)
+    counts = np.bincount(bin_indices, minlength=bins)
+    return min_value + np.arange(bins) / scale, counts
+
+
+class ImageHistogram(QtCore.QObject):
+    """
+    Calculates the histogram of images in a background thread. The result is cached for the current image version,
+    so that several HistogramLUTItems showing the same image (e.g. the horizontal and vertical one of an ImgWidget)
+    only calculate it once.
+
+    Typical usage::
+        histogram = ImageHistogram()
+        histogram.calculated.connect(lambda: print(histogram.get_histogram()))
+        histogram.update(img_data)
+    """
+    calculated = QtCore.Signal()
+    _calculated_qt = QtCore.Signal(int)  # used internally to get the result from the worker into the gui thread
+
+    def __init__(self):
+        super(ImageHistogram, self).__init__()
+        self.version = 0
+        self._img_data = None
+        self._future = None
+        self._calculated_qt.connect(self._on_calculated)
+
+    def update(self, img_data):
+        """
+        Starts the histogram calculation for a new image. Calling it again with the same image object does nothing.
+        """
+        if img_data is self._img_data and self.version > 0:
+            return
+        self._img_data = img_data
+        self.version += 1
+        version = self.version
+        self._future = _histogram_executor.submit(self._calculate, img_data, version)
+        self._future.add_done_callback(lambda _: self._emit_calculated(version))
+
+    @property
+    def ready(self):
+        """
+        True if the histogram of the current image has been calculated, get_histogram returns without waiting
+        """
+        return self._future is not None and self._future.done()
+
+    def get_histogram(self):
+        """
+        :return: left bin edges and counts of the current image, waits for a running calculation to finish
+        """
+        if self._future is None:
+            return None, None
+        return self._future.result()
+
+    def _calculate(self, img_data, version):
+        if version != self.version:  # a newer image has already arrived, no need to calculate this one
+            return None, None
+        return calculate_histogram(img_data)
+
+    def _emit_calculated(self, version):
+        try:
+            self._calculated_qt.emit(version)
+        except RuntimeError:  # underlying QObject has already been deleted
+            pass
+
+    def _on_calculated(self, version):
+        if version == self.version:
+            self.calculated.emit()
+
 
 class HistogramLUTItem(GraphicsWidget):
     """
@@ -61,14 +169,22 @@ class HistogramLUTItem(GraphicsWidget):
     sigLevelsChanged = QtCore.Signal(object)
     sigLevelChangeFinished = QtCore.Signal(object)
 
-    def __init__(self, image=None, fillHistogram=False, orientation='horizontal', autoLevel=None):
+    def __init__(self, image=None, fillHistogram=False, orientation='horizontal', autoLevel=None, histogram=None):
         """
         If *image* (ImageItem) is provided, then the control will be automatically linked to the image and changes to the control will be immediately reflected in the image's appearance.
         By default, the histogram is rendered with a fill. For performance, set *fillHistogram* = False.
+        An ImageHistogram can be given as *histogram* to share the histogram calculation with other items showing
+        the same image.
         """
         GraphicsWidget.__init__(self)
         self.lut = None
         self.imageItem = None
+        self.hist_x = None
+        self.hist_y = None
+        if histogram is None:
+            histogram = ImageHistogram()
+        self.histogram = histogram
+        self.histogram.calculated.connect(self.update_histogram_plot)
         self.first_image = True
         self.percentageLevel = False
         self.orientation = orientation
@@ -240,21 +356,30 @@ class HistogramLUTItem(GraphicsWidget):
         self.update()
 
     def imageChanged(self, autoRange=False, img_data=None):
+        """
+        Starts the calculation of the histogram in the background, the plot is updated when it is finished.
+        If *img_data* is not given, the image of the linked ImageItem is used.
+        """
+        if img_data is None:
+            img_data = self.imageItem.image
+        self.histogram.update(img_data)
 
-        if img_data is not None:
-            hist = np.histogram(img_data, bins=3000)
-            hist_x, hist_y = hist[1][:-1], hist[0]
-        else:
-            hist_x, hist_y = list(self.imageItem.getHistogram(bins=3000))
+    def get_histogram(self):
+        """
+        :return: positions and counts of all non-empty histogram bins of the current image. Waits for the histogram
+                 calculation if it has not yet finished.
+        """
+        hist_x, hist_y = self.histogram.get_histogram()
+        if hist_x is None:
+            return None, None
+        non_empty = hist_y > 0
+        return hist_x[non_empty], hist_y[non_empty]
 
+    def update_histogram_plot(self):
+        hist_x, hist_y = self.get_histogram()
         if hist_x is None:
             return
 
-        hist_x, hist_y = np.array(hist_x), np.array(hist_y)
-
-        hist_x = hist_x[np.where(hist_y>0)]
-        hist_y = hist_y[np.where(hist_y>0)]
-
         self.hist_x = hist_x
         self.hist_y = hist_y
 
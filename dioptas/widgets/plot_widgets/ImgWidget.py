@@ -20,20 +20,16 @@
 
 from __future__ import absolute_import
 
-from matplotlib import cm
 import pyqtgraph as pg
 from pyqtgraph import ViewBox
 from pyqtgraph.exporters.ImageExporter import ImageExporter
-from pyqtgraph.opengl import GLSurfacePlotItem
-from pyqtgraph.opengl import GLViewWidget, GLGridItem
-from pyqtgraph import GraphicsLayoutWidget
 
 import numpy as np
 from skimage.measure import find_contours
 from qtpy import QtCore, QtWidgets, QtGui
 
-from .HistogramLUTItem import HistogramLUTItem
-from .Custom3DAxis import Custom3DAxis
+from .HistogramLUTItem import HistogramLUTItem, ImageHistogram
+from .LODImageItem import LODImageItem
 from ...model.util.HelperModule import calculate_color
 
 
@@ -55,16 +51,21 @@ class ImgWidget(QtCore.QObject):
         self.mask_data = None
 
         self._max_range = True
+        self._auto_level_pending = False
+        self.img_histogram.calculated.connect(self._apply_pending_auto_level)
 
     def create_graphics(self):
         self.img_view_box = self.pg_layout.addViewBox(row=1, col=1)  # type: ViewBox
 
-        self.data_img_item = pg.ImageItem()
+        self.data_img_item = LODImageItem()
         self.img_view_box.addItem(self.data_img_item)
 
-        self.img_histogram_LUT_horizontal = HistogramLUTItem(self.data_img_item)
+        # both histogram items show the same image and share the histogram calculation
+        self.img_histogram = ImageHistogram()
+        self.img_histogram_LUT_horizontal = HistogramLUTItem(self.data_img_item, histogram=self.img_histogram)
         self.pg_layout.addItem(self.img_histogram_LUT_horizontal, row=0, col=1)
-        self.img_histogram_LUT_vertical = HistogramLUTItem(self.data_img_item, orientation='vertical')
+        self.img_histogram_LUT_vertical = HistogramLUTItem(self.data_img_item, orientation='vertical',
+                                                           histogram=self.img_histogram)
         self.pg_layout.addItem(self.img_histogram_LUT_vertical, row=1, col=2)
 
     def create_mouse_click_item(self):
@@ -102,6 +103,7 @@ class ImgWidget(QtCore.QObject):
 
     def plot_image(self, img_data, auto_level=False):
         self.img_data = img_data
+        self._auto_level_pending = False
         self.data_img_item.setImage(img_data.T, auto_level)
         if auto_level:
             self.auto_level()
@@ -135,7 +137,25 @@ class ImgWidget(QtCore.QObject):
             self.auto_range()
 
     def auto_level(self):
-        hist_x, hist_y = self.img_histogram_LUT_horizontal.hist_x, self.img_histogram_LUT_horizontal.hist_y
+        """
+        Sets the levels based on the histogram of the image. If the histogram is still being calculated in the
+        background, the levels are set as soon as it is finished instead of waiting for it in the gui thread.
+        """
+        if not self.img_histogram.ready:
+            self._auto_level_pending = True
+            return
+        self._auto_level_pending = False
+        self._set_auto_levels()
+
+    def _apply_pending_auto_level(self):
+        if self._auto_level_pending:
+            self._auto_level_pending = False
+            self._set_auto_levels()
+
+    def _set_auto_levels(self):
+        hist_x, hist_y = self.img_histogram_LUT_horizontal.get_histogram()
+        if hist_x is None:
+            return
 
         hist_y_cumsum = np.cumsum(hist_y)
         hist_y_sum = np.sum(hist_y)
@@ -524,143 +544,6 @@ class IntegrationCakeWidget(CalibrationCakeWidget):
             self.phases[ind].update_lines(positions, intensities)
 
 
-class SurfWidget(QtWidgets.QWidget):
-    iteration_name = ''
-
-    def __init__(self):
-        super(SurfWidget, self).__init__()
-
-        self.lut_pg_layout = GraphicsLayoutWidget()
-        self.pg_layout = GLViewWidget()
-        self.surf_view_item = None
-        self.pressed_key = None
-        self.show_range = np.array([0.0, 1.0])
-        self.show_scale = np.array([2., 2., 1.])
-        self.g_translate = 0
-        self.g_pos = 0
-        self.marker = 0
-        self.marker_color = [1, 0, 0]
-        self.marker_size = 5
-        self.data = None
-
-        self.create_graphics()
-
-        self._lut_lo = QtWidgets.QVBoxLayout()
-        self._lut_lo.setContentsMargins(0, 0, 0, 0)
-        self._lut_lo.addWidget(self.lut_pg_layout)
-
-        self._lut_w = QtWidgets.QWidget()
-        self._lut_w.setMaximumHeight(80)
-        self._lut_w.setLayout(self._lut_lo)
-
-        self._layout = QtWidgets.QVBoxLayout()
-        self._layout.setContentsMargins(0, 0, 0, 0)
-        self._layout.setSpacing(0)
-        self._layout.addWidget(self._lut_w)
-        self._layout.addWidget(self.pg_layout)
-
-        self.img_histogram_LUT_horizontal = HistogramLUTItem()
-        self.img_histogram_LUT_horizontal.gradient.loadPreset('jet')
-
-        self.img_histogram_LUT_horizontal.sigLevelsChanged.connect(self.update_color)
-        self.img_histogram_LUT_horizontal.sigLevelChangeFinished.connect(self.update_color)
-        self.img_histogram_LUT_horizontal.sigLookupTableChanged.connect(self.update_color)
-
-        self.lut_pg_layout.addItem(self.img_histogram_LUT_horizontal, 0, 1)
-
-        self.setLayout(self._layout)
-
-    def create_graphics(self):
-        self.g = GLGridItem()
-        self.g.rotate(90, 0, 1, 0)
-        self.g.setSize(1, 1, 0)
-        self.g.setSpacing(1, 0.1, 1)
-        self.g.setDepthValue(10)  # draw grid after surfaces since they may be translucent
-        self.pg_layout.addItem(self.g)
-
-        self.gx = GLGridItem()
-        self.gx.setSize(26, 4000, 0)
-        self.gx.setSpacing(1, 100, 1)
-        self.gx.setDepthValue(10)  # draw grid after surfaces since they may be translucent
-        self.pg_layout.addItem(self.gx)
-
-        self.axis = Custom3DAxis(self.pg_layout, color=(0.9, 0.9, 0.9, .6), axis=[False, True, False])
-        self.axis.add_labels(y_label=u'2θ')
-
-        self.surf_view_item = GLSurfacePlotItem(z=np.array([[0]]),
-                                                colors=np.array([[0, 0, 0, 0]]),
-                                                smooth=False)
-        self.surf_view_item.setGLOptions('translucent')
-        self.pg_layout.addItem(self.surf_view_item)
-
-    def update_color(self):
-        if self.data is not None:
-            colors = self.get_colors(self.data).reshape(-1, 4)
-            self.surf_view_item.setData(z=self.data, colors=colors)
-
-    def plot_surf(self, data, start, step):
-        self.g_pos = int((self.g_translate-start)/step)
-        colors = self.get_colors(data).reshape(-1, 4)
-
-        abs_range = self.show_range * (np.nanmax(data) - np.nanmin(data)) + np.nanmin(data)
-        self.data = np.copy(data)
-        self.data[self.data > abs_range[1]] = abs_range[1]
-        self.data[self.data < abs_range[0]] = abs_range[0]
-
-        self.surf_view_item.setData(z=self.data, colors=colors)
-
-        self.img_histogram_LUT_horizontal.imageChanged(img_data=self.data)
-        self.img_histogram_LUT_horizontal.setLevels(np.nanmin(self.data), np.nanmax(self.data))
-
-        self.g.setSize(np.nanmax(data), self.data.shape[1], 0)
-        self.gx.setSize(self.data.shape[0], self.data.shape[1], 0)
-        self.axis.setSize(*self.show_scale)
-
-        self.update_scale(data)
-
-    def update_scale(self, data):
-        self.surf_view_item.resetTransform()
-
-        scale = [self.show_scale[0] / data.shape[0],
-                 self.show_scale[1] / data.shape[1],
-                 self.show_scale[2] / np.nanmax(data)]
-
-        self.surf_view_item.scale(*scale, local=False)
-
-        self.g.resetTransform()
-        self.g.rotate(90, 0, 1, 0)
-        self.g.translate(self.g_pos, data.shape[1] / 2., np.nanmax(data) / 2.)
-        self.g.scale(*scale, local=False)
-
-        self.gx.resetTransform()
-        self.gx.translate(data.shape[0] / 2., data.shape[1] / 2., 0)
-        self.gx.scale(*scale, local=False)
-
-        self.axis.setSize(*self.show_scale)
-        self.axis.diff = [self.show_scale[0] * self.g_pos / data.shape[0], 0, 0]
-
-    def get_colors(self, data):
-        lut = self.img_histogram_LUT_horizontal.gradient.getLookupTable(256) / 256.
-
-        level = self.img_histogram_LUT_horizontal.getExpLevels()
-        # int_data = ((data - np.nanmin(data)) / (np.nanmax(data) - np.nanmin(data)) * 255).astype(int)
-        min = np.nanmin(data)
-        if level[0] > 1:
-            min = level[0]
-        int_data = ((data - min) / (level[1] - min) * 255).astype(int)
-        int_data[int_data > 255] = 255
-        int_data[int_data < 0] = 0
-        int_data = np.nan_to_num(int_data)
-        int_data[int_data < 0] = 0
-        colors_rgb = lut[int_data]
-        colors = np.ones((colors_rgb.shape[0], colors_rgb.shape[1], 4))
-        colors[..., :3] = colors_rgb
-
-        colors[:, int(self.marker):int(self.marker) + self.marker_size, :3] = self.marker_color
-        colors[self.g_pos, :, :3] = self.marker_color
-        return colors
-
-
 class IntegrationBatchWidget(IntegrationCakeWidget):
     """
     Class describe a widget for 2D image (Theta vs ImageNumber) of batch integration window.
@@ -671,6 +554,55 @@ class IntegrationBatchWidget(IntegrationCakeWidget):
         self.create_horizontal_line()
         self.mouse_left_clicked.connect(self.set_horizontal_line_pos)
 
+        # rows appended in live mode are shown by a second image item below the plotted image. Its rows are kept in a
+        # buffer, which grows by doubling, so that the already appended rows are not copied on every append.
+        self.appended_img_item = pg.ImageItem(autoDownsample=True)
+        self.img_view_box.addItem(self.appended_img_item)
+        self._appended_rows = None
+        self._n_appended = 0
+        self.n_rows = 0
+        for histogram_item in (self.img_histogram_LUT_horizontal, self.img_histogram_LUT_vertical):
+            histogram_item.sigLookupTableChanged.connect(self.update_appended_img_item)
+            histogram_item.sigLevelsChanged.connect(self.update_appended_img_item)
+
+    def plot_image(self, img_data, auto_level=False):
+        self.clear_appended_rows()
+        self.n_rows = img_data.shape[0]
+        super(IntegrationBatchWidget, self).plot_image(img_data, auto_level)
+
+    def append_rows(self, rows):
+        """
+        Appends rows below the plotted image, without updating the already plotted rows. The rows are shown with the
+        lookup table and levels of the plotted image.
+
+        :param rows: 2D array with the same number of columns as the plotted image
+        """
+        n_new = rows.shape[0]
+        if self._n_appended == 0:
+            self.appended_img_item.setPos(0, self.n_rows)
+        if self._appended_rows is None or self._n_appended + n_new > self._appended_rows.shape[0] or \
+                not np.can_cast(rows.dtype, self._appended_rows.dtype):
+            capacity = max(2 * self._n_appended, self._n_appended + n_new, 16)
+            dtype = rows.dtype if self._appended_rows is None else np.result_type(self._appended_rows, rows)
+            buffer = np.empty((capacity, rows.shape[1]), dtype=dtype)
+            if self._n_appended:
+                buffer[:self._n_appended] = self._appended_rows[:self._n_appended]
+            self._appended_rows = buffer
+        self._appended_rows[self._n_appended:self._n_appended + n_new] = rows
+        self._n_appended += n_new
+        self.n_rows += n_new
+        self.appended_img_item.setImage(self._appended_rows[:self._n_appended].T, autoLevels=False)
+        self.update_appended_img_item()
+
+    def update_appended_img_item(self):
+        self.appended_img_item.setLookupTable(self.data_img_item.lut)
+        self.appended_img_item.setLevels(self.data_img_item.levels)
+
+    def clear_appended_rows(self):
+        self.appended_img_item.clear()
+        self._appended_rows = None
+        self._n_appended = 0
+
     def move_image(self):
         pass
 
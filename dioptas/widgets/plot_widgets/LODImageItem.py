@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtCore
+
+# pyramid levels are calculated in a single worker thread, to not block the gui when a new image arrives
+_pyramid_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def downsample(img_data, factor, axis, reduction='max'):
+    """
+    Reduces an image by an integer factor along one axis. The image is padded with its edge values, if its size is
+    not a multiple of the factor.
+
+    :param img_data: image array
+    :param factor: integer reduction factor
+    :param axis: axis along which the image will be reduced
+    :param reduction: 'max' (preserves peaks, NaNs are ignored) or 'mean'
+    :return: reduced image
+    """
+    if factor == 1:
+        return img_data
+
+    remainder = img_data.shape[axis] % factor
+    if remainder:
+        pad_width = [(0, 0)] * img_data.ndim
+        pad_width[axis] = (0, factor - remainder)
+        img_data = np.pad(img_data, pad_width, mode='edge')
+
+    shape = img_data.shape[:axis] + (img_data.shape[axis] // factor, factor) + img_data.shape[axis + 1:]
+    img_data = img_data.reshape(shape)
+    if reduction == 'max':
+        return np.fmax.reduce(img_data, axis=axis + 1)
+    return np.mean(img_data, axis=axis + 1, dtype=np.float32)
+
+
+def calculate_pyramid(img_data, reduction='max', min_size=256):
+    """
+    Calculates a multi-resolution pyramid of an image, each level is reduced by a factor of 2 in both dimensions
+    with respect to the previous one, until the image is smaller than *min_size*.
+
+    :return: list of pyramid levels, the first one is img_data itself
+    """
+    levels = [img_data]
+    while max(levels[-1].shape[:2]) > min_size:
+        level = downsample(levels[-1], 2, 0, reduction)
+        levels.append(downsample(level, 2, 1, reduction))
+    return levels
+
+
+class LODImageItem(pg.ImageItem):
+    """
+    ImageItem with level-of-detail rendering for large images. When zoomed out, the image is rendered from a
+    downsampled pyramid level matching the screen resolution, when zoomed in only the visible tiles are rendered in
+    full resolution. The pyramid is calculated in a background thread whenever a new image is set.
+
+    The full resolution image is still available as *image*, so that histograms, pixel positions etc. are not
+    affected.
+    """
+    tile_size = 512  # in pixels of the pyramid level
+    min_level_size = 256  # smallest pyramid level
+
+    _pyramid_calculated = QtCore.Signal(object, object)  # used to get the pyramid from the worker into the gui thread
+
+    def __init__(self, image=None, reduction='max', **kargs):
+        """
+        :param reduction: 'max' or 'mean', method used for downsampling the image
+        """
+        if reduction not in ('max', 'mean'):
+            raise ValueError("reduction has to be either 'max' or 'mean'")
+        self.reduction = reduction
+        self._pyramid = []
+        self._render_region = None
+        self._render_rect = None
+        super(LODImageItem, self).__init__(image, **kargs)
+        self._pyramid_calculated.connect(self._set_pyramid)
+
+    def setImage(self, image=None, autoLevels=None, **kargs):
+        kargs.setdefault('autoDownsample', False)  # downsampling is done by the pyramid
+        super(LODImageItem, self).setImage(image, autoLevels, **kargs)
+
+        if image is None or self.image.ndim != 2:
+            return
+        self._pyramid = []
+        self._render_region = None
+        if max(self.image.shape) > self.min_level_size:
+            img_data = self.image
+            future = _pyramid_executor.submit(calculate_pyramid, img_data, self.reduction, self.min_level_size)
+            future.add_done_callback(lambda f: self._emit_pyramid_calculated(img_data, f))
+
+    def _emit_pyramid_calculated(self, img_data, future):
+        try:
+            self._pyramid_calculated.emit(img_data, future.result())
+        except RuntimeError:  # underlying QObject has already been deleted
+            pass
+
+    def _set_pyramid(self, img_data, pyramid):
+        if img_data is not self.image:  # a newer image has been set in the meantime
+            return
+        self._pyramid = pyramid
+        if self._render_region is not None and self._render_region[0] > 0:
+            self.qimage = None
+            self.update()
+
+    def get_pyramid_level(self, level):
+        """
+        :return: the image reduced by 2**level, falls back to a strided view of the image if the pyramid has not
+                 been calculated yet
+        """
+        if level < len(self._pyramid):
+            return self._pyramid[level]
+        factor = 2 ** level
+        return self.image[::factor, ::factor]
+
+    def _get_xy_shape(self):
+        return self.image.shape[:2] if self.axisOrder == 'col-major' else self.image.shape[:2][::-1]
+
+    def _get_render_region(self):
+        """
+        Determines which part of the image has to be rendered at which resolution.
+
+        :return: tuple of (pyramid level, x factor, y factor, x range, y range), the factors describe the additional
+                 reduction along the respective axis and the ranges are given in pixels of the pyramid level
+        """
+        width, height = self._get_xy_shape()
+        xds, yds = self._computeDownsampleFactors()
+        if xds is None:
+            return 0, 1, 1, (0, width), (0, height)
+
+        level = int(np.log2(min(xds, yds)))
+        while level > 0 and max(width, height) / 2 ** (level - 1) <= self.min_level_size:  # no such pyramid level
+            level -= 1
+        factor = 2 ** level
+        level_width, level_height = int(np.ceil(width / factor)), int(np.ceil(height / factor))
+
+        x_range, y_range = (0, level_width), (0, level_height)
+        view = self.getViewBox()
+        view_rect = self.mapRectFromView(view.viewRect()) if view is not None else None
+        if view_rect is not None:
+            view_rect = view_rect.normalized()
+            x_range = self._get_tile_range(view_rect.left(), view_rect.right(), factor, level_width)
+            y_range = self._get_tile_range(view_rect.top(), view_rect.bottom(), factor, level_height)
+        return level, max(1, xds // factor), max(1, yds // factor), x_range, y_range
+
+    def _get_tile_range(self, start, stop, factor, size):
+        start = int(max(0, start) / factor) // self.tile_size * self.tile_size
+        stop = int(np.ceil(max(0, stop) / factor / self.tile_size)) * self.tile_size
+        return min(start, size), min(stop, size)
+
+    def render(self):
+        if self.image is None or self.image.size == 0:
+            return
+        if self.image.ndim != 2:
+            self._render_region = None
+            self._render_rect = QtCore.QRectF(0, 0, *self._get_xy_shape())
+            return super(LODImageItem, self).render()
+
+        self._render_region = level, x_factor, y_factor, x_range, y_range = self._get_render_region()
+        if x_range[0] >= x_range[1] or y_range[0] >= y_range[1]:  # image is not visible
+            self.qimage = None
+            return
+
+        x_axis, y_axis = (0, 1) if self.axisOrder == 'col-major' else (1, 0)
+        region = [None, None]
+        region[x_axis] = slice(*x_range)
+        region[y_axis] = slice(*y_range)
+        img_data = self.get_pyramid_level(level)[tuple(region)]
+        img_data = downsample(img_data, x_factor, x_axis, self.reduction)
+        img_data = downsample(img_data, y_factor, y_axis, self.reduction)
+
+        factor = 2 ** level
+        self._render_rect = QtCore.QRectF(x_range[0] * factor, y_range[0] * factor,
+                                          (x_range[1] - x_range[0]) * factor, (y_range[1] - y_range[0]) * factor)
+
+        # ImageItem.render converts self.image with the current levels and lookup table, so the visible part of the
+        # image is temporarily handed over to it
+        full_image = self.image
+        self.image = img_data
+        try:
+            super(LODImageItem, self).render()
+        finally:
+            self.image = full_image
+
+    def paint(self, p, *args):
+        if self.image is None:
+            return
+        if self.qimage is None:
+            self.render()
+            if self.qimage is None:
+                return
+        if self.paintMode is not None:
+            p.setCompositionMode(self.paintMode)
+
+        p.drawImage(self._render_rect, self.qimage)
+        if self.border is not None:
+            p.setPen(self.border)
+            p.drawRect(self.boundingRect())
+
+    def viewRangeChanged(self):
+        self._update_render_region()
+
+    def viewTransformChanged(self):
+        self._update_render_region()
+
+    def _update_render_region(self):
+        if self._render_region is not None and self._get_render_region() != self._render_region:
+            self.qimage = None
+            self.update()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray diffraction data
+# Principal author: Clemens Prescher (clemens.prescher@gmail.com)
+# Copyright (C) 2014-2019 GSECARS, University of Chicago, USA
+# Copyright (C) 2015-2018 Institute for Geology and Mineralogy, University of Cologne, Germany
+# Copyright (C) 2019-2020 DESY, Hamburg, Germany
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from qtpy import QtWidgets
+from pyqtgraph import GraphicsLayoutWidget
+from pyqtgraph.opengl import GLSurfacePlotItem
+from pyqtgraph.opengl import GLViewWidget, GLGridItem
+
+from .HistogramLUTItem import HistogramLUTItem
+from .LODImageItem import downsample
+from .Custom3DAxis import Custom3DAxis
+
+
+class SurfWidget(QtWidgets.QWidget):
+    iteration_name = ''
+    max_vertices = 500000  # larger surfaces are decimated before plotting
+
+    def __init__(self):
+        super(SurfWidget, self).__init__()
+
+        self.lut_pg_layout = GraphicsLayoutWidget()
+        self.pg_layout = GLViewWidget()
+        self.surf_view_item = None
+        self.pressed_key = None
+        self.show_range = np.array([0.0, 1.0])
+        self.show_scale = np.array([2., 2., 1.])
+        self.g_translate = 0
+        self.g_pos = 0
+        self.marker = 0
+        self.marker_color = [1, 0, 0]
+        self.marker_size = 5
+        self.data = None
+        self.decimation = (1, 1)
+
+        self.create_graphics()
+
+        self._lut_lo = QtWidgets.QVBoxLayout()
+        self._lut_lo.setContentsMargins(0, 0, 0, 0)
+        self._lut_lo.addWidget(self.lut_pg_layout)
+
+        self._lut_w = QtWidgets.QWidget()
+        self._lut_w.setMaximumHeight(80)
+        self._lut_w.setLayout(self._lut_lo)
+
+        self._layout = QtWidgets.QVBoxLayout()
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._layout.setSpacing(0)
+        self._layout.addWidget(self._lut_w)
+        self._layout.addWidget(self.pg_layout)
+
+        self.img_histogram_LUT_horizontal = HistogramLUTItem()
+        self.img_histogram_LUT_horizontal.gradient.loadPreset('jet')
+
+        self.img_histogram_LUT_horizontal.sigLevelsChanged.connect(self.update_color)
+        self.img_histogram_LUT_horizontal.sigLevelChangeFinished.connect(self.update_color)
+        self.img_histogram_LUT_horizontal.sigLookupTableChanged.connect(self.update_color)
+
+        self.lut_pg_layout.addItem(self.img_histogram_LUT_horizontal, 0, 1)
+
+        self.setLayout(self._layout)
+
+    def create_graphics(self):
+        self.g = GLGridItem()
+        self.g.rotate(90, 0, 1, 0)
+        self.g.setSize(1, 1, 0)
+        self.g.setSpacing(1, 0.1, 1)
+        self.g.setDepthValue(10)  # draw grid after surfaces since they may be translucent
+        self.pg_layout.addItem(self.g)
+
+        self.gx = GLGridItem()
+        self.gx.setSize(26, 4000, 0)
+        self.gx.setSpacing(1, 100, 1)
+        self.gx.setDepthValue(10)  # draw grid after surfaces since they may be translucent
+        self.pg_layout.addItem(self.gx)
+
+        self.axis = Custom3DAxis(self.pg_layout, color=(0.9, 0.9, 0.9, .6), axis=[False, True, False])
+        self.axis.add_labels(y_label=u'2θ')
+
+        self.surf_view_item = GLSurfacePlotItem(z=np.array([[0]]),
+                                                colors=np.array([[0, 0, 0, 0]]),
+                                                smooth=False, computeNormals=False)
+        self.surf_view_item.setGLOptions('translucent')
+        self.pg_layout.addItem(self.surf_view_item)
+
+    def update_color(self):
+        if self.data is not None:
+            colors = self.get_colors(self.data).reshape(-1, 4)
+            # only the vertex colors change, the geometry of the surface is kept
+            self.surf_view_item.setData(colors=colors)
+            self.surf_view_item.meshDataChanged()
+
+    def plot_surf(self, data, start, step):
+        self.decimation = self.get_decimation(data.shape)
+        data = downsample(data, self.decimation[0], 0)
+        data = downsample(data, self.decimation[1], 1)
+
+        self.g_pos = int((self.g_translate - start) / step) // self.decimation[0]
+        colors = self.get_colors(data).reshape(-1, 4)
+
+        data_min, data_max = np.nanmin(data), np.nanmax(data)
+        abs_range = self.show_range * (data_max - data_min) + data_min
+        self.data = np.clip(data, abs_range[0], abs_range[1])
+
+        self.surf_view_item.setData(z=self.data, colors=colors)
+
+        self.img_histogram_LUT_horizontal.imageChanged(img_data=self.data)
+        self.img_histogram_LUT_horizontal.setLevels(*abs_range)  # clipped data spans exactly abs_range
+
+        self.g.setSize(data_max, self.data.shape[1], 0)
+        self.gx.setSize(self.data.shape[0], self.data.shape[1], 0)
+        self.axis.setSize(*self.show_scale)
+
+        self.update_scale(data, data_max)
+
+    def update_scale(self, data, data_max=None):
+        if data_max is None:
+            data_max = np.nanmax(data)
+        self.surf_view_item.resetTransform()
+
+        scale = [self.show_scale[0] / data.shape[0],
+                 self.show_scale[1] / data.shape[1],
+                 self.show_scale[2] / data_max]
+
+        self.surf_view_item.scale(*scale, local=False)
+
+        self.g.resetTransform()
+        self.g.rotate(90, 0, 1, 0)
+        self.g.translate(self.g_pos, data.shape[1] / 2., data_max / 2.)
+        self.g.scale(*scale, local=False)
+
+        self.gx.resetTransform()
+        self.gx.translate(data.shape[0] / 2., data.shape[1] / 2., 0)
+        self.gx.scale(*scale, local=False)
+
+        self.axis.setSize(*self.show_scale)
+        self.axis.diff = [self.show_scale[0] * self.g_pos / data.shape[0], 0, 0]
+
+    def get_decimation(self, shape):
+        """
+        Calculates the reduction factors for both axes of the surface data, so that the surface has not more than
+        max_vertices vertices. The currently longer axis is always reduced further.
+        :param shape: shape of the surface data
+        :return: tuple of reduction factors
+        """
+        factors = [1, 1]
+        sizes = list(shape)
+        while sizes[0] * sizes[1] > self.max_vertices:
+            axis = 0 if sizes[0] >= sizes[1] else 1
+            factors[axis] += 1
+            sizes[axis] = int(np.ceil(shape[axis] / factors[axis]))
+        return tuple(factors)
+
+    def get_lut_index(self, data):
+        """
+        Maps the data onto the 256 entries of the color lookup table, according to the current levels.
+        :return: uint8 array with the shape of data
+        """
+        level = self.img_histogram_LUT_horizontal.getExpLevels()
+        min_level = np.nanmin(data)
+        if level[0] > 1:
+            min_level = level[0]
+        lut_index = (data - min_level) * (255. / (level[1] - min_level))
+        lut_index = np.nan_to_num(lut_index, copy=False)
+        np.clip(lut_index, 0, 255, out=lut_index)
+        return lut_index.astype(np.uint8)
+
+    def get_colors(self, data):
+        lut = np.ones((256, 4), dtype=np.float32)
+        lut[:, :3] = self.img_histogram_LUT_horizontal.gradient.getLookupTable(256)[:, :3] / 256.
+        colors = lut[self.get_lut_index(data)]
+
+        marker = int(self.marker) // self.decimation[1]
+        marker_size = max(1, self.marker_size // self.decimation[1])
+        colors[:, marker:marker + marker_size, :3] = self.marker_color
+        colors[self.g_pos, :, :3] = self.marker_color
+        return colors
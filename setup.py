@@ -28,6 +28,7 @@ setup(
     author_email="clemens.prescher@gmail.com",
     url='https://github.com/Dioptas/Dioptas/',
     install_requires=['numpy', 'cython'],
+    extras_require={'eiger': ['hdf5plugin', 'lz4', 'bitshuffle']},
     description='GUI program for reduction and exploration of 2D X-ray diffraction data',
     classifiers=['Intended Audience :: Science/Research',
                  'Operating System :: OS Independent',